@@ -1,4 +1,10 @@
+import json
+from typing import Optional
 from admin_cursor_paginator import CursorPaginatorAdmin
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from public_admin.admin import PublicModelAdmin
@@ -28,6 +34,94 @@ class ChainAdmin(PublicModelAdmin):
 
 isccr_admin.register(Chain, ChainAdmin)
 
+# Query parameter requesting exact changelist counts
+EXACT_COUNT_VAR = "exact"
+
+
+def estimate_count(queryset) -> Optional[int]:
+    """Planner row estimate of a queryset (None if not on PostgreSQL)"""
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # Negative or missing for tables that were never analyzed
+            return int(row[0]) if row and row[0] >= 0 else None
+        try:
+            sql, params = queryset.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting large results with planner estimates instead of COUNT(*)
+
+    Results estimated below `exact_threshold` rows (or all if `exact`) are counted
+    exactly. `approximate` is set if `count` is an estimate. Pages beyond an
+    estimate (the planner may underestimate) are validated with an exact count.
+    """
+
+    def __init__(self, *args, exact=False, exact_threshold=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+        self.exact_threshold = exact_threshold
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        estimate = None if self.exact else estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_threshold:
+            return super().count
+        self.approximate = True
+        return estimate
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.approximate:
+                raise
+        self.exact = True
+        self.approximate = False
+        for name in ("count", "num_pages"):
+            self.__dict__.pop(name, None)
+        return super().validate_number(number)
+
+
+class EstimatedCountChangeList(ChangeList):
+    """Changelist with estimated result and total counts (exact on request)"""
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(EXACT_COUNT_VAR, None)
+        return params
+
+    def get_results(self, request):
+        # Total count of the unfiltered list, estimated like the result count
+        super().get_results(request)
+        # Exact if the requested page was beyond the estimate
+        self.result_count = self.paginator.count
+        self.full_count_approximate = self.paginator.approximate
+        if self.get_filters_params() or self.query:
+            full = self.model_admin.get_paginator(
+                request, self.root_queryset, self.list_per_page
+            )
+            self.full_result_count = full.count
+            self.full_count_approximate = full.approximate
+        else:
+            self.full_result_count = self.result_count
+        self.show_full_result_count = True
+        self.exact_count_url = self.get_query_string({EXACT_COUNT_VAR: 1})
+
 
 class IsccIDAdmin(PublicModelAdmin):
 
@@ -45,6 +139,8 @@ class IsccIDAdmin(PublicModelAdmin):
     ]
     list_select_related = ["src_chain"]
     ordering = ("-src_time",)
+    # Counted by EstimatedCountChangeList instead of an exact COUNT(*)
+    show_full_result_count = False
 
     fieldsets = (
         (
@@ -114,21 +210,17 @@ class IsccIDAdmin(PublicModelAdmin):
 
         return queryset, False
 
-    @cached_property
-    def count(self):
-        query = self.object_list.query
-        if not query.where:
-            try:
-                cursor = connection.cursor()
-                cursor.execute(
-                    "SELECT reltuples FROM pg_class WHERE relname = %s",
-                    [query.model._meta.db_table],
-                )
-                return int(cursor.fetchone()[0])
-            except Exception as e:  # noqa
-                pass
-
-        return super().count
+    def get_changelist(self, request, **kwargs):
+        return EstimatedCountChangeList
+
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        return EstimatedCountPaginator(
+            queryset,
+            per_page,
+            exact=EXACT_COUNT_VAR in request.GET,
+            exact_threshold=settings.RESOLVER_BROWSE_EXACT_COUNT,
+            **kwargs,
+        )
 
 
 isccr_admin.register(IsccID, IsccIDAdmin)
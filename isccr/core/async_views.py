@@ -0,0 +1,68 @@
+"""Async variants of the resolver views for ASGI deployments.
+
+Database and shared cache access runs in a thread pool (Django 3.1 has no async
+ORM) so a slow query does not block other requests. Local cache hits and Bloom
+filter misses are answered directly on the event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect
+from django.utils.cache import patch_vary_headers
+
+from isccr.core import bloom, views
+from isccr.core.profiling import timed_queries
+from isccr.core.cache import MISSING, get_resolver_cache, lookup_key, resolve_key
+
+
+def database_sync_to_async(func):
+    """Run blocking database code in a worker thread with managed connections"""
+
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            with timed_queries():
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def cached_record(iscc_id):
+    if not bloom.might_exist(iscc_id):
+        return None
+    record = get_resolver_cache().get_local(resolve_key(iscc_id))
+    if record is MISSING:
+        record = await database_sync_to_async(views.cached_record)(iscc_id)
+    return record
+
+
+async def index(request):
+    return views.index(request)
+
+
+async def resolve(request, iscc_id):
+    as_json = iscc_id.endswith(".json")
+    if as_json:
+        iscc_id = iscc_id[: -len(".json")]
+    record = await cached_record(iscc_id)
+    if as_json or views.accepts_json(request):
+        if record is None:
+            response = JsonResponse({"detail": "ISCC-ID not found"}, status=404)
+        else:
+            response = JsonResponse(record)
+    else:
+        if record is None:
+            raise Http404("No ISCC-ID matches the given query.")
+        response = redirect(views.admin_url(iscc_id))
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+async def lookup(request, iscc_code, actor):
+    iscc_id = get_resolver_cache().get_local(lookup_key(iscc_code, actor))
+    if iscc_id is MISSING:
+        response = await database_sync_to_async(views.lookup)(request, iscc_code, actor)
+        return response
+    return JsonResponse({"iscc_id": iscc_id})
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Negative lookups for unknown ISCC-IDs without touching the database.
+
+Each worker keeps a Bloom filter of all known ISCC-IDs. It is built in a background
+thread from a streamed scan of the IsccID table and then refreshed periodically with
+newly created rows. Bulk loads keep the original `created` time of their rows, so the
+filter is rebuilt after each new `BulkLoad`. Until the first build completes every
+ISCC-ID passes.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from loguru import logger as log
+from isccr import metrics
+from isccr.core.models import BulkLoad, IsccID
+
+
+bloom_rejections = metrics.counter(
+    "isccr_bloom_rejections_total",
+    "ISCC-IDs rejected as unknown by the Bloom filter",
+)
+bloom_items = metrics.gauge(
+    "isccr_bloom_items", "ISCC-IDs added to the Bloom filter of this worker"
+)
+bloom_bytes = metrics.gauge(
+    "isccr_bloom_bytes", "Memory used by the Bloom filter of this worker"
+)
+
+
+class BloomFilter:
+    """Bloom filter for strings sized for a capacity and false positive rate"""
+
+    def __init__(self, capacity: int, error_rate: float, max_bytes: int = 0):
+        capacity = max(capacity, 1)
+        n_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if max_bytes and n_bits > max_bytes * 8:
+            n_bits = max_bytes * 8
+        self.capacity = capacity
+        self.n_bits = n_bits
+        self.n_hashes = max(1, round(n_bits / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(n_bits / 8))
+        self.count = 0
+
+    def positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.n_bits for i in range(self.n_hashes))
+
+    def add(self, key: str):
+        for pos in self.positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(key))
+
+    @property
+    def error_rate(self) -> float:
+        """Expected false positive rate at the current fill"""
+        k, m, n = self.n_hashes, self.n_bits, self.count
+        return (1 - math.exp(-k * n / m)) ** k
+
+    def __len__(self):
+        return len(self.bits)
+
+
+class KnownIsccIDs:
+    """Per worker Bloom filter of all known ISCC-IDs"""
+
+    def __init__(
+        self,
+        error_rate: float,
+        max_bytes: int,
+        refresh_interval: float,
+        refresh_overlap: float,
+    ):
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        self.bloom = None  # type: Optional[BloomFilter]
+        self.mark = None
+        self.bulk_load = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def might_exist(self, iscc_id: str) -> bool:
+        """False only if the ISCC-ID is definitely unknown"""
+        if self.thread is None:
+            self.start()
+        bloom = self.bloom
+        if bloom is None or iscc_id in bloom:
+            return True
+        bloom_rejections.inc()
+        return False
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                if (
+                    self.bloom is None
+                    or self.bloom.count > self.bloom.capacity
+                    or last_bulk_load() != self.bulk_load
+                ):
+                    self.build()
+                else:
+                    self.refresh()
+            except Exception as e:
+                log.warning(f"Bloom filter update failed: {e!r}")
+            finally:
+                connection.close()
+            time.sleep(self.refresh_interval)
+
+    def build(self):
+        """Build a new filter from a streamed scan of all ISCC-IDs"""
+        start = time.monotonic()
+        mark = timezone.now()
+        bulk_load = last_bulk_load()
+        # Headroom for growth, rebuilt once capacity is exceeded
+        capacity = max(IsccID.objects.count() * 2, 100000)
+        bloom = BloomFilter(capacity, self.error_rate, self.max_bytes)
+        qs = IsccID.objects.values_list("iscc_id", flat=True)
+        for iscc_id in qs.iterator(chunk_size=10000):
+            bloom.add(iscc_id)
+        self.bloom, self.mark, self.bulk_load = bloom, mark, bulk_load
+        self.refresh()
+        bloom_bytes.set(len(bloom))
+        log.info(
+            f"Built Bloom filter: {bloom.count} ISCC-IDs, {len(bloom)} bytes, "
+            f"error rate {bloom.error_rate:.4f} in {time.monotonic() - start:.1f}s"
+        )
+
+    def refresh(self):
+        """Add ISCC-IDs created since last refresh (with overlap for slow commits)"""
+        mark = timezone.now()
+        qs = IsccID.objects.filter(created__gte=self.mark - self.refresh_overlap)
+        for iscc_id in qs.values_list("iscc_id", flat=True).iterator(chunk_size=10000):
+            if iscc_id not in self.bloom:
+                self.bloom.add(iscc_id)
+        self.mark = mark
+        bloom_items.set(self.bloom.count)
+
+
+def last_bulk_load() -> Optional[int]:
+    """Id of the latest bulk load (None if there was none)"""
+    return BulkLoad.objects.aggregate(last=Max("id"))["last"]
+
+
+_known_iscc_ids = None  # type: Optional[KnownIsccIDs]
+
+
+def might_exist(iscc_id: str) -> bool:
+    """False if the ISCC-ID is definitely unknown (always True if disabled)"""
+    global _known_iscc_ids
+    if not settings.RESOLVER_BLOOM:
+        return True
+    if _known_iscc_ids is None:
+        _known_iscc_ids = KnownIsccIDs(
+            error_rate=settings.RESOLVER_BLOOM_ERROR_RATE,
+            max_bytes=settings.RESOLVER_BLOOM_MAX_BYTES,
+            refresh_interval=settings.RESOLVER_BLOOM_REFRESH_INTERVAL,
+            refresh_overlap=settings.RESOLVER_BLOOM_REFRESH_OVERLAP,
+        )
+    return _known_iscc_ids.might_exist(iscc_id)
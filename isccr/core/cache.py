@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Caching of resolved records with write-through invalidation from observers.
+
+Resolved records live in a per-worker LRU with TTL and optionally in a shared cache
+backend (any Django cache). Observers invalidate the keys of ingested ISCC-IDs in
+the shared cache and in the local LRU of all workers.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+from django.conf import settings
+from django.core.cache import caches
+from isccr import metrics
+
+
+SEQ_KEY = "resolver:invalidations"
+INVALIDATION_LOG_SIZE = 100  # Batches a worker may fall behind before clearing its LRU
+INVALIDATION_LOG_TTL = 300
+MISSING = object()
+
+cache_requests = metrics.counter(
+    "isccr_resolver_cache_requests_total",
+    "Resolver cache lookups by cache level and result",
+    ("level", "result"),
+)
+cache_invalidations = metrics.counter(
+    "isccr_resolver_cache_invalidations_total",
+    "Resolver cache keys invalidated by observers",
+)
+
+
+class LRUCache:
+    """Thread safe LRU cache with a time to live for each entry"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.data[key]
+                return MISSING
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class ResolverCache:
+    """Two level cache: per worker LRU backed by an optional shared cache
+
+    Shared entries are tagged with the version of their key at read time.
+    Invalidations replace the versions, so values loaded before an invalidation but
+    written after it are never served. Invalidated keys are also appended to a
+    short lived log which workers poll to drop them from their local LRU.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        shared=None,
+        shared_ttl: float = 3600,
+        epoch_interval: float = 1.0,
+    ):
+        self.local = LRUCache(maxsize, ttl)
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.epoch_interval = epoch_interval
+        self.seq = None  # Last seen invalidation sequence number
+        self.syncs = 0  # Number of applied invalidation log updates
+        self.seq_checked = 0.0
+
+    def sync_invalidations(self):
+        """Drop local entries invalidated by other processes"""
+        now = time.monotonic()
+        if self.shared is None or now - self.seq_checked < self.epoch_interval:
+            return
+        self.seq_checked = now
+        seq = self.shared.get(SEQ_KEY, 0)
+        if seq == self.seq:
+            return
+        stale = None
+        if self.seq is not None and 0 < seq - self.seq <= INVALIDATION_LOG_SIZE:
+            log_keys = [log_key(n) for n in range(self.seq + 1, seq + 1)]
+            entries = self.shared.get_many(log_keys)
+            if len(entries) == len(log_keys):
+                stale = [key for keys in entries.values() for key in keys]
+        if stale is None:
+            # Fell behind the log (or the sequence was reset)
+            self.local.clear()
+        else:
+            for key in stale:
+                self.local.delete(key)
+        self.seq = seq
+        self.syncs += 1
+
+    def get(self, key):
+        return self.get_versioned(key)[0]
+
+    def get_versioned(self, key):
+        """Return cached value (or MISSING) and the shared version of the key"""
+        self.sync_invalidations()
+        value = self.local.get(key)
+        if value is not MISSING:
+            cache_requests.inc(level="local", result="hit")
+            return value, None
+        cache_requests.inc(level="local", result="miss")
+        if self.shared is None:
+            return MISSING, None
+        entries = self.shared.get_many([key, version_key(key)])
+        version = entries.get(version_key(key), 0)
+        entry = entries.get(key)
+        if entry is None or entry[0] != version:
+            cache_requests.inc(level="shared", result="miss")
+            return MISSING, version
+        cache_requests.inc(level="shared", result="hit")
+        self.local.set(key, entry[1])
+        return entry[1], version
+
+    def get_local(self, key):
+        """Local lookup without I/O (MISSING if invalidations are due for a check)"""
+        if self.shared is not None:
+            if time.monotonic() - self.seq_checked >= self.epoch_interval:
+                return MISSING
+        value = self.local.get(key)
+        if value is not MISSING:
+            cache_requests.inc(level="local", result="hit")
+        return value
+
+    def set(self, key, value, version=None, local=True):
+        """Cache value, tagged with the version of the key read before loading it"""
+        if local:
+            self.local.set(key, value)
+        if self.shared is not None:
+            if version is None:
+                version = self.shared.get(version_key(key), 0)
+            self.shared.set(key, (version, value), self.shared_ttl)
+
+    def get_or_load(self, key, loader: Callable):
+        """Return cached value or load and cache it (None results are not cached)"""
+        value, version = self.get_versioned(key)
+        if value is MISSING:
+            syncs = self.syncs
+            value = loader()
+            if value is not None:
+                # Skip the local entry if invalidations arrived while loading
+                self.set(key, value, version, local=syncs == self.syncs)
+        return value
+
+    def invalidate(self, keys: Iterable[str]):
+        """Remove keys locally and from the shared cache and log them for workers"""
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None:
+            version = uuid.uuid4().hex
+            versions = {version_key(key): version for key in keys}
+            # Outlive shared entries tagged with the previous version
+            self.shared.set_many(versions, self.shared_ttl * 2)
+            self.shared.delete_many(keys)
+            self.shared.add(SEQ_KEY, 0, None)
+            try:
+                seq = self.shared.incr(SEQ_KEY)
+            except ValueError:
+                # Sequence evicted between add and incr, workers clear their LRU
+                seq = 1
+                self.shared.set(SEQ_KEY, seq, None)
+            self.shared.set(log_key(seq), keys, INVALIDATION_LOG_TTL)
+        cache_invalidations.inc(len(keys))
+
+
+def resolve_key(iscc_id: str) -> str:
+    if not (iscc_id.isascii() and iscc_id.isalnum() and len(iscc_id) <= 32):
+        # Keep arbitrary user input from producing invalid (memcached) keys
+        iscc_id = hashlib.sha1(iscc_id.encode("utf-8")).hexdigest()
+    return f"resolve:{iscc_id}"
+
+
+def version_key(key: str) -> str:
+    return f"{key}:version"
+
+
+def log_key(seq: int) -> str:
+    return f"resolver:invalidation:{seq}"
+
+
+def lookup_key(iscc_code: str, actor: str) -> str:
+    digest = hashlib.sha1(f"{iscc_code}\n{actor}".encode("utf-8")).hexdigest()
+    return f"lookup:{digest}"
+
+
+_resolver_cache = None  # type: Optional[ResolverCache]
+
+
+def get_resolver_cache() -> ResolverCache:
+    """Return the resolver cache of this process as configured in settings"""
+    global _resolver_cache
+    if _resolver_cache is None:
+        alias = settings.RESOLVER_CACHE_SHARED
+        _resolver_cache = ResolverCache(
+            maxsize=settings.RESOLVER_CACHE_SIZE,
+            ttl=settings.RESOLVER_CACHE_TTL,
+            shared=caches[alias] if alias else None,
+            shared_ttl=settings.RESOLVER_CACHE_SHARED_TTL,
+            epoch_interval=settings.RESOLVER_CACHE_EPOCH_INTERVAL,
+        )
+    return _resolver_cache
+
+
+def invalidate(iscc_id_objs: Iterable):
+    """Publish invalidations for created or updated IsccID instances"""
+    keys = []
+    for obj in iscc_id_objs:
+        keys.append(resolve_key(obj.iscc_id))
+        keys.append(lookup_key(obj.iscc_code, obj.actor))
+    if keys:
+        get_resolver_cache().invalidate(keys)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Streaming export of the full registry with a resumable keyset cursor.
+
+Rows are ordered by (src_time, iscc_id). An export can be resumed after the last
+received row by passing its cursor `<src_time>,<iscc_id>` as `after`.
+"""
+import csv
+import gzip
+import json
+import queue
+import threading
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from isccr.core.models import IsccID
+
+
+EXPORT_FIELDS = (
+    "iscc_id",
+    "iscc_code",
+    "iscc_tophash",
+    "actor",
+    "iscc_seed_title",
+    "iscc_seed_extra",
+    "iscc_mutable_metadata",
+    "src_chain__slug",
+    "src_chain_idx",
+    "src_block_hash",
+    "src_tx_hash",
+    "src_tx_out_idx",
+    "src_time",
+    "revision",
+)
+EXPORT_COLUMNS = tuple(f.replace("src_chain__slug", "src_chain") for f in EXPORT_FIELDS)
+FORMATS = ("ndjson", "csv")
+
+Cursor = Tuple[datetime, str]
+# Uncompressed bytes per gzip member of file exports (lost at most on interruption)
+GZIP_MEMBER_BYTES = 1024 * 1024
+
+
+def parse_cursor(value: str) -> Cursor:
+    """Parse `<src_time>,<iscc_id>` cursor (raises ValueError if invalid)"""
+    src_time, _, iscc_id = value.rpartition(",")
+    # Unescaped "+" of the UTC offset arrives as space in query strings
+    src_time = src_time.replace(" ", "+")
+    parsed = parse_datetime(src_time)
+    if parsed is None or not iscc_id:
+        raise ValueError(f"Invalid export cursor {value}")
+    return parsed, iscc_id
+
+
+def format_cursor(cursor: Cursor) -> str:
+    src_time, iscc_id = cursor
+    return f"{src_time.isoformat()},{iscc_id}"
+
+
+def export_rows(after: Optional[Cursor] = None, chunk_size: int = 2000):
+    """Yield all IsccID rows as dicts in cursor order using a server-side cursor"""
+    qs = IsccID.objects.order_by("src_time", "iscc_id")
+    if after is not None:
+        src_time, iscc_id = after
+        qs = qs.filter(
+            Q(src_time__gt=src_time) | Q(src_time=src_time, iscc_id__gt=iscc_id)
+        )
+    for row in qs.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        row["src_chain"] = row.pop("src_chain__slug")
+        yield row
+
+
+def encode_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        # Full precision src_time (DjangoJSONEncoder truncates to milliseconds)
+        row["src_time"] = row["src_time"].isoformat()
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Line:
+    """File-like target for csv.writer that returns the written line"""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(rows: Iterable[dict], header=True) -> Iterator[str]:
+    writer = csv.writer(_Line())
+    if header:
+        yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        meta = row["iscc_mutable_metadata"]
+        if meta is not None:
+            row["iscc_mutable_metadata"] = json.dumps(meta)
+        row["src_time"] = row["src_time"].isoformat()
+        yield writer.writerow([row[col] for col in EXPORT_COLUMNS])
+
+
+def last_row(infile, fmt: str) -> Optional[dict]:
+    """Parse the last data row of an exported text file (None if there is none)"""
+    if fmt == "ndjson":
+        last = None
+        for line in infile:
+            if line.strip():
+                last = line
+        row = json.loads(last) if last else None
+    else:
+        last = None
+        for values in csv.reader(infile):
+            if values and values[0] != EXPORT_COLUMNS[0]:
+                last = values
+        row = dict(zip(EXPORT_COLUMNS, last)) if last else None
+    if row is not None:
+        row["src_time"] = parse_datetime(row["src_time"])
+    return row
+
+
+def gzip_stream(chunks: Iterable[str], batch_bytes: int = 65536) -> Iterator[bytes]:
+    """Gzip compress a stream of text chunks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    buffer, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= batch_bytes:
+            yield compressor.compress(b"".join(buffer))
+            buffer, size = [], 0
+    yield compressor.compress(b"".join(buffer)) + compressor.flush()
+
+
+def gzip_members(chunks: Iterable[str], member_bytes: int) -> Iterator[bytes]:
+    """Gzip compress a stream of text chunks into independently decodable members.
+
+    Members end at chunk boundaries after `member_bytes` of input, so a file cut
+    off while writing decodes up to the end of its last complete member.
+    """
+    buffer, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= member_bytes:
+            yield gzip.compress(b"".join(buffer), compresslevel=6)
+            buffer, size = [], 0
+    if buffer:
+        yield gzip.compress(b"".join(buffer), compresslevel=6)
+
+
+def complete_gzip_members(infile, block_size: int = 65536) -> int:
+    """Byte offset after the last complete gzip member of a file"""
+    end = offset = 0
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    while True:
+        data = infile.read(block_size)
+        if not data:
+            return end
+        while data:
+            try:
+                decompressor.decompress(data)
+            except zlib.error:
+                return end
+            if not decompressor.eof:
+                offset += len(data)
+                break
+            offset += len(data) - len(decompressor.unused_data)
+            end = offset
+            data = decompressor.unused_data
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+
+def threaded(chunks: Iterable, maxsize: int = 64) -> Iterator:
+    """Produce chunks in a worker thread with a bounded queue.
+
+    Keeps database access out of the response iteration (which runs on the event
+    loop under ASGI) and overlaps fetching rows with sending the response.
+    """
+    buffer = queue.Queue(maxsize)
+    done = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if cancelled.is_set():
+                    break
+                buffer.put(chunk)
+        except Exception as e:  # re-raised in consumer
+            buffer.put(e)
+        finally:
+            buffer.put(done)
+            connection.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            chunk = buffer.get()
+            if chunk is done:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
+        # Unblock a producer waiting on a full queue
+        while not buffer.empty():
+            buffer.get_nowait()
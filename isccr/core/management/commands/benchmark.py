@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import mcrpc
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from loguru import logger as log
+from isccr.core import views
+from isccr.core.models import Chain, Checkpoint, IsccID
+from isccr.core.profiling import QueryTimer
+from isccr.synthetic import synthetic_isccids
+
+
+SYNTHETIC_CHAIN_ID = 0
+SYNTHETIC_HEADER = b"\x40"
+
+
+class Command(BaseCommand):
+    help = "Benchmark resolver hot paths against the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "target", choices=["resolve", "lookup", "coblo", "bloxberg", "ingest"]
+        )
+        parser.add_argument(
+            "--sample", type=int, default=100, help="Number of ISCC-IDs to use"
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=5, help="Passes over the sample"
+        )
+        parser.add_argument(
+            "--steps",
+            default="1000,10000,100000",
+            help="Comma separated numbers of synthetic rows to grow the table to",
+        )
+        parser.add_argument(
+            "--items", type=int, default=20000, help="Declarations on the fake node"
+        )
+        parser.add_argument(
+            "--latency", type=float, default=20, help="Fake node latency in ms"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            default="1,4",
+            help="Comma separated bloxberg worker counts to compare",
+        )
+        parser.add_argument(
+            "--chain",
+            choices=["coblo", "bloxberg"],
+            default="coblo",
+            help="Chain to replay for ingest (ignored with --fixture)",
+        )
+        parser.add_argument(
+            "--fixture", help="Recorded chain fixture to replay (see record_fixture)"
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, f"bench_{options['target']}")(options)
+
+    def bench_resolve(self, options):
+        """Compare redirect + admin page with the JSON resolver"""
+        iscc_ids = list(
+            IsccID.objects.values_list("iscc_id", flat=True)[: options["sample"]]
+        )
+        if not iscc_ids:
+            raise CommandError("No ISCC-IDs in database to resolve")
+
+        client = Client()
+        flows = {
+            "redirect": lambda i: client.get(f"/{i}", follow=True),
+            "json (Accept)": lambda i: client.get(
+                f"/{i}", HTTP_ACCEPT="application/json"
+            ),
+            "json (.json)": lambda i: client.get(f"/{i}.json"),
+        }
+        for name, flow in flows.items():
+            response = flow(iscc_ids[0])
+            if response.status_code != 200:
+                raise CommandError(f"{name}: HTTP {response.status_code}")
+            self.report(name, self.measure(flow, iscc_ids, options["iterations"]))
+
+    def bench_lookup(self, options):
+        """Lookup latency while the table grows (synthetic rows are rolled back)"""
+        steps = sorted(int(step) for step in options["steps"].split(","))
+        rnd = random.Random(0)
+        factory = RequestFactory()
+        with transaction.atomic():
+            chain, _ = Chain.objects.get_or_create(
+                id=SYNTHETIC_CHAIN_ID, defaults=dict(slug="synthetic")
+            )
+            inserted = 0
+            for step in steps:
+                while inserted < step:
+                    n = min(10000, step - inserted)
+                    rows = list(
+                        synthetic_isccids(n, chain, SYNTHETIC_HEADER, rnd, inserted)
+                    )
+                    IsccID.objects.bulk_create(rows, batch_size=2000)
+                    inserted += n
+                if connection.vendor == "postgresql":
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"ANALYZE {IsccID._meta.db_table}")
+
+                sample = rnd.sample(rows, min(len(rows), options["sample"]))
+                pairs = [[row.iscc_code, row.actor] for row in sample]
+                body = json.dumps(pairs)
+                total = IsccID.objects.count()
+
+                def single(pair):
+                    return views.lookup(factory.get("/lookup"), *pair)
+
+                def bulk(_):
+                    request = factory.post(
+                        "/lookup", body, content_type="application/json"
+                    )
+                    return views.lookup_batch(request)
+
+                timings = self.measure(single, pairs, options["iterations"])
+                self.report(f"lookup rows={total}", timings)
+                timings = self.measure(bulk, range(1), options["iterations"])
+                self.report(f"lookup x{len(pairs)} rows={total}", timings)
+            transaction.set_rollback(True)
+
+    def bench_coblo(self, options):
+        """Coblo observer throughput against a local fake MultiChain node"""
+        from isccr.observers import coblo
+        from isccr.observers.adaptive import AdaptiveBatcher
+        from isccr.observers.testing import FakeMultiChain
+
+        log.remove()
+        log.add(sys.stderr, level="WARNING")
+        node = FakeMultiChain(options["items"], options["latency"] / 1000).start()
+        items, batch_size = options["items"], options["batch_size"]
+
+        def client(cls):
+            return cls("127.0.0.1", node.port, "user", "pwd")
+
+        def sequential(chain):
+            # Previous behaviour: new client per update, fetch and ingest in turn
+            while coblo.next_height() < items:
+                stream = coblo.LazyStream("iscc", api=client(mcrpc.RpcClient))
+                coblo.update(chain, batch_size, stream=stream)
+
+        def pipelined(chain):
+            batcher = AdaptiveBatcher("coblo", batch_size, batch_size, batch_size)
+            stream = coblo.LazyStream("iscc", api=client(coblo.SessionRpcClient))
+            coblo.follow(chain, batcher, stream=stream, stop_height=items)
+
+        def adaptive(chain):
+            batcher = AdaptiveBatcher(
+                "coblo", batch_size, coblo.BATCH_SIZE_MIN, coblo.BATCH_SIZE_MAX
+            )
+            stream = coblo.LazyStream("iscc", api=client(coblo.SessionRpcClient))
+            coblo.follow(chain, batcher, stream=stream, stop_height=items)
+            self.stdout.write(f"adaptive batch size: {batcher.size}")
+
+        runs = [sequential, pipelined, adaptive]
+        for func in runs:
+            name = func.__name__
+            with transaction.atomic():
+                chain, _ = Chain.objects.get_or_create(
+                    id=coblo.CHAIN_ID_COBLO, defaults=dict(slug="coblo")
+                )
+                start = time.perf_counter()
+                func(chain)
+                seconds = time.perf_counter() - start
+                assert IsccID.objects.filter(src_chain=chain).count() >= items
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"coblo {name:<22} items={items} seconds={seconds:.2f} "
+                f"({items / seconds:.0f} items/s)"
+            )
+        node.shutdown()
+
+    def bench_bloxberg(self, options):
+        """Bloxberg catch-up throughput against a local fake Ethereum node"""
+        try:
+            from isccr.observers import bloxberg
+        except ImportError as e:
+            raise CommandError(f"bloxberg benchmark requires web3 ({e})")
+        from concurrent.futures import ThreadPoolExecutor
+        from isccr.observers.adaptive import AdaptiveBatcher
+        from isccr.observers.testing import FakeEthereumNode
+
+        log.remove()
+        log.add(sys.stderr, level="WARNING")
+        n_blocks, batch_size = options["items"], options["batch_size"]
+        node = FakeEthereumNode(
+            n_blocks, bloxberg.W3_CONTRACT, latency=options["latency"] / 1000
+        ).start()
+        bloxberg.W3_URL = node.url
+        for workers in (int(w) for w in options["workers"].split(",")):
+            bloxberg.BLOCK_TIMESTAMPS = bloxberg.BlockTimestamps()
+            batcher = AdaptiveBatcher("bloxberg", batch_size, batch_size, batch_size)
+            with transaction.atomic(), ThreadPoolExecutor(workers) as pool:
+                chain, _ = Chain.objects.get_or_create(
+                    id=bloxberg.CHAIN_ID_BLOXBERG, defaults=dict(slug="bloxberg")
+                )
+                start = time.perf_counter()
+                bloxberg.update(chain, batcher, (0, 0), pool, in_flight=workers)
+                seconds = time.perf_counter() - start
+                assert IsccID.objects.filter(src_chain=chain).count() == len(node.logs)
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"bloxberg workers={workers:<14} blocks={n_blocks} "
+                f"events={len(node.logs)} seconds={seconds:.2f} "
+                f"({n_blocks / seconds:.0f} blocks/s)"
+            )
+        node.shutdown()
+
+    def bench_ingest(self, options):
+        """Observer ingest from a replayed node into the local database"""
+        try:
+            from isccr.observers import replay
+        except ImportError as e:
+            raise CommandError(f"ingest benchmark requires web3 ({e})")
+        from concurrent.futures import ThreadPoolExecutor
+        from isccr.observers.adaptive import AdaptiveBatcher
+        from isccr.observers.testing import FakeEthereumNode, FakeMultiChain
+
+        log.remove()
+        log.add(sys.stderr, level="WARNING")
+        latency, batch_size = options["latency"] / 1000, options["batch_size"]
+        if options["fixture"]:
+            fixture = replay.load_fixture(options["fixture"])
+            name, node = fixture["chain"], replay.load_node(fixture)
+            from_block = fixture.get("from_block", 0)
+        else:
+            name, from_block = options["chain"], 0
+            if name == "coblo":
+                node = FakeMultiChain(options["items"])
+            else:
+                from isccr.observers.bloxberg import W3_CONTRACT
+
+                node = FakeEthereumNode(options["items"], W3_CONTRACT)
+
+        if name == "coblo":
+            from isccr.observers import coblo
+
+            chain_id, runs = coblo.CHAIN_ID_COBLO, [None]
+
+            def run(chain, workers):
+                api = replay.ReplayRpcClient(node, latency)
+                batcher = AdaptiveBatcher(
+                    "coblo", batch_size, coblo.BATCH_SIZE_MIN, coblo.BATCH_SIZE_MAX
+                )
+                stream = coblo.LazyStream("iscc", api=api)
+                coblo.follow(chain, batcher, stream=stream, stop_height=len(node.items))
+                return len(node.items)
+
+        else:
+            from isccr.observers import bloxberg
+
+            chain_id = bloxberg.CHAIN_ID_BLOXBERG
+            runs = [int(w) for w in options["workers"].split(",")]
+            bloxberg.W3_PROVIDER = replay.ReplayProvider(node, latency)
+
+            def run(chain, workers):
+                bloxberg.reset_clients()
+                bloxberg.BLOCK_TIMESTAMPS = bloxberg.BlockTimestamps()
+                batcher = AdaptiveBatcher(
+                    "bloxberg", batch_size, bloxberg.BLOCK_WINDOW_MIN, batch_size
+                )
+                with ThreadPoolExecutor(workers) as pool:
+                    bloxberg.update(
+                        chain,
+                        batcher,
+                        (from_block, 0),
+                        pool,
+                        in_flight=workers,
+                        to_block=node.height,
+                    )
+                return len(node.logs)
+
+        def measure(workers, trace):
+            # Replays from scratch and rolls back (existing rows get updated)
+            with transaction.atomic():
+                chain, _ = Chain.objects.get_or_create(
+                    id=chain_id, defaults=dict(slug=name)
+                )
+                Checkpoint.objects.filter(chain=chain).delete()
+                timer = QueryTimer()
+                if trace:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                with connection.execute_wrapper(timer):
+                    items = run(chain, workers)
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] if trace else 0
+                tracemalloc.stop()
+                transaction.set_rollback(True)
+            return items, seconds, timer.queries, peak
+
+        for workers in runs:
+            items, seconds, queries, _ = measure(workers, trace=False)
+            # Separate pass as tracing allocations slows down the observer
+            _, _, _, peak = measure(workers, trace=True)
+            label = f"{name} workers={workers}" if workers else name
+            self.stdout.write(
+                f"ingest {label:<20} items={items} seconds={seconds:.2f} "
+                f"({items / seconds:.0f} items/s) "
+                f"queries/item={queries / max(items, 1):.2f} "
+                f"peak={peak / 2 ** 20:.1f}MiB"
+            )
+        node.server_close()
+
+    def measure(self, func, args, iterations):
+        """Return per call wall times in seconds"""
+        timings = []
+        for _ in range(iterations):
+            for arg in args:
+                start = time.perf_counter()
+                func(arg)
+                timings.append(time.perf_counter() - start)
+        return timings
+
+    def report(self, name, timings):
+        ms = sorted(t * 1000 for t in timings)
+        self.stdout.write(
+            f"{name:<28} n={len(ms):<6} mean={statistics.mean(ms):.2f}ms "
+            f"p50={ms[len(ms) // 2]:.2f}ms p95={ms[int(len(ms) * 0.95)]:.2f}ms "
+            f"max={ms[-1]:.2f}ms ({len(ms) / sum(timings):.0f} req/s)"
+        )
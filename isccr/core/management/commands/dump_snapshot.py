@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import time
+from django.core.management.base import BaseCommand
+from isccr.core import snapshot
+
+
+class Command(BaseCommand):
+    help = "Write a snapshot of the registry for bootstrapping new replicas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Snapshot directory")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        meta = snapshot.dump(options["path"])
+        seconds = time.monotonic() - start
+        self.stdout.write(
+            f"Dumped {meta['rows']} ISCC-IDs to {options['path']} in {seconds:.1f}s"
+        )
+        for chain in meta["chains"]:
+            self.stdout.write(f"  {chain['slug']}: checkpoint {chain['checkpoint']}")
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from isccr.core import export
+
+
+class Command(BaseCommand):
+    help = "Export all ISCC-IDs as NDJSON or CSV (resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file (.gz suffix for gzip)")
+        parser.add_argument("--format", choices=export.FORMATS, default="ndjson")
+        parser.add_argument(
+            "--after", help="Export rows after cursor <src_time>,<iscc_id>"
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Append to existing output after its last complete row",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=settings.RESOLVER_EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        path, fmt = options["path"], options["format"]
+        gzipped = path.endswith(".gz")
+        after = options["after"]
+        try:
+            after = export.parse_cursor(after) if after else None
+        except ValueError as e:
+            raise CommandError(e)
+        resume = options["resume"] and os.path.exists(path)
+        if resume:
+            after = self.resume_cursor(path, fmt, gzipped)
+            if after is not None:
+                self.stdout.write(f"Resuming after {export.format_cursor(after)}")
+            # Nothing complete to append to (e.g. CSV header is missing)
+            resume = os.path.getsize(path) > 0
+
+        rows = export.export_rows(after, chunk_size=options["chunk_size"])
+        if fmt == "ndjson":
+            lines = export.encode_ndjson(rows)
+        else:
+            lines = export.encode_csv(rows, header=not resume)
+
+        start, count = time.monotonic(), 0
+        if gzipped:
+            # Flushed members, an interrupted export keeps all complete members
+            with open(path, "ab" if resume else "wb") as outfile:
+                for member in export.gzip_members(
+                    self.counted(lines), export.GZIP_MEMBER_BYTES
+                ):
+                    outfile.write(member)
+                    outfile.flush()
+            count = self.count
+        else:
+            mode = "at" if resume else "wt"
+            with open(path, mode, encoding="utf-8", newline="") as outfile:
+                for line in lines:
+                    outfile.write(line)
+                    count += 1
+        if fmt == "csv" and not resume:
+            count -= 1
+        seconds = time.monotonic() - start
+        self.stdout.write(
+            f"Exported {count} ISCC-IDs to {path} in {seconds:.1f}s "
+            f"({count / max(seconds, 1e-9):.0f} rows/s)"
+        )
+
+    def counted(self, lines):
+        self.count = 0
+        for line in lines:
+            self.count += 1
+            yield line
+
+    def resume_cursor(self, path, fmt, gzipped):
+        """Cursor of the last complete row (drops a partial trailing line)"""
+        if gzipped:
+            self.truncate_partial_member(path)
+            with gzip.open(path, "rt", encoding="utf-8", newline="") as infile:
+                row = export.last_row(infile, fmt)
+        else:
+            if fmt == "csv":
+                self.truncate_partial_record(path)
+            else:
+                self.truncate_partial_line(path)
+            with open(path, "rt", encoding="utf-8", newline="") as infile:
+                row = export.last_row(infile, fmt)
+        return None if row is None else (row["src_time"], row["iscc_id"])
+
+    @staticmethod
+    def truncate_partial_member(path):
+        """Cut off an incomplete last gzip member of an interrupted export"""
+        with open(path, "rb+") as infile:
+            end = export.complete_gzip_members(infile)
+            if end < infile.seek(0, os.SEEK_END):
+                infile.truncate(end)
+
+    @staticmethod
+    def truncate_partial_line(path, block_size=65536):
+        """Cut off an incomplete last line of an interrupted export"""
+        with open(path, "rb+") as infile:
+            size = pos = infile.seek(0, os.SEEK_END)
+            while pos > 0:
+                step = min(pos, block_size)
+                infile.seek(pos - step)
+                idx = infile.read(step).rfind(b"\n")
+                if idx != -1:
+                    pos = pos - step + idx + 1
+                    break
+                pos -= step
+            if pos < size:
+                infile.truncate(pos)
+
+    @staticmethod
+    def truncate_partial_record(path, block_size=65536):
+        """Cut off an incomplete last CSV record of an interrupted export.
+
+        Quoted fields may contain newlines, so records end at the last newline
+        outside of quotes (escaped quotes are doubled and keep the parity).
+        """
+        with open(path, "rb+") as infile:
+            end = offset = 0
+            quoted = False
+            while True:
+                block = infile.read(block_size)
+                if not block:
+                    break
+                parts = block.split(b'"')
+                pos = len(block)
+                # Part i is quoted if an odd number of quotes precedes it
+                for i in range(len(parts) - 1, -1, -1):
+                    pos -= len(parts[i])
+                    if quoted == (i % 2 == 1):
+                        idx = parts[i].rfind(b"\n")
+                        if idx != -1:
+                            end = offset + pos + idx + 1
+                            break
+                    pos -= 1
+                quoted ^= (len(parts) - 1) % 2 == 1
+                offset += len(block)
+            if end < offset:
+                infile.truncate(end)
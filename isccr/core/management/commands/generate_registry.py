@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import time
+from typing import Dict, Set
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from loguru import logger as log
+from more_itertools import chunked
+from isccr.core import snapshot
+from isccr.core.models import BulkLoad, Chain, IsccID
+from isccr.observers.ingest import BULK_BATCH_SIZE
+from isccr.synthetic import REGISTRY_CHAINS, synthetic_registry
+from isccr.utils import encode_iscc_id
+
+
+def next_counters(bodies: Set[str]) -> Dict[str, int]:
+    """Next free ISCC-ID counter of already registered ISCC-ID bodies.
+
+    Probes ISCC-IDs by primary key (secondary indexes may be dropped during load).
+    """
+    result = {}
+    pending = set(bodies)
+    counter = 0
+    # Single byte counters only, 128 if all are taken
+    while pending and counter < 128:
+        candidates = {encode_iscc_id(bytes.fromhex(b), counter): b for b in pending}
+        pending = set()
+        for chunk in chunked(candidates, BULK_BATCH_SIZE):
+            for iscc_id in IsccID.objects.filter(pk__in=chunk).values_list(
+                "pk", flat=True
+            ):
+                pending.add(candidates[iscc_id])
+        counter += 1
+        result.update(dict.fromkeys(pending, counter))
+    return result
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic registry at scale for performance testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000)
+        parser.add_argument(
+            "--chains",
+            default="coblo=0.2,bloxberg=0.8",
+            help="Comma separated chain=share of declarations",
+        )
+        parser.add_argument("--actors", type=int, default=100000)
+        parser.add_argument(
+            "--skew", type=float, default=1.1, help="Zipf exponent of actor activity"
+        )
+        parser.add_argument(
+            "--duplicates",
+            type=float,
+            default=0.05,
+            help="Share of re-declared ISCC-CODEs (ISCC-ID counter collisions)",
+        )
+        parser.add_argument("--batch-size", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--method",
+            choices=["copy", "orm"],
+            help="COPY with index rebuild (default on PostgreSQL) or bulk_create",
+        )
+
+    def handle(self, *args, **options):
+        method = options["method"] or ("copy" if snapshot.is_postgres() else "orm")
+        if method == "copy" and not snapshot.is_postgres():
+            raise CommandError("COPY requires PostgreSQL (use --method orm)")
+        shares = {}
+        for item in options["chains"].split(","):
+            slug, share = item.split("=")
+            shares[slug] = float(share)
+        chains = []
+        for chain_id, slug, header in REGISTRY_CHAINS:
+            if shares.get(slug):
+                chain, _ = Chain.objects.get_or_create(
+                    id=chain_id, defaults=dict(slug=slug)
+                )
+                chains.append((chain, header, shares[slug]))
+        if not chains:
+            raise CommandError(f"No known chains in {options['chains']}")
+        # Append after existing declarations
+        starts = {
+            chain_id: idx + 1
+            for chain_id, idx in IsccID.objects.values_list("src_chain")
+            .annotate(Max("src_chain_idx"))
+            .order_by()
+        }
+        batches = synthetic_registry(
+            options["rows"],
+            chains,
+            seed=options["seed"],
+            actors=options["actors"],
+            skew=options["skew"],
+            duplicates=options["duplicates"],
+            batch_size=options["batch_size"],
+            starts=starts,
+            next_counters=next_counters,
+        )
+
+        start = time.monotonic()
+        rows, index_seconds = 0, 0.0
+        with transaction.atomic():
+            indexes = snapshot.secondary_indexes() if method == "copy" else []
+            with connection.cursor() as cursor:
+                for name, _ in indexes:
+                    cursor.execute(f'DROP INDEX "{name}"')
+            for batch in batches:
+                if method == "copy":
+                    self.copy(batch)
+                else:
+                    objs = [IsccID(**row) for row in batch]
+                    IsccID.objects.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+                rows += len(batch)
+                seconds = time.monotonic() - start
+                self.stdout.write(f"{rows} rows ({rows / seconds:.0f} rows/s)")
+
+            index_start = time.monotonic()
+            with connection.cursor() as cursor:
+                for name, definition in indexes:
+                    log.info(f"Rebuilding index {name}")
+                    cursor.execute(definition)
+                if snapshot.is_postgres():
+                    cursor.execute(f"ANALYZE {IsccID._meta.db_table}")
+            index_seconds = time.monotonic() - index_start
+            BulkLoad.objects.create(source="generate_registry", rows=rows)
+        self.stdout.write(
+            f"Generated {rows} ISCC-IDs in {time.monotonic() - start:.1f}s "
+            f"({len(indexes)} indexes rebuilt in {index_seconds:.1f}s)"
+        )
+
+    def copy(self, batch):
+        """COPY a batch of rows in CSV format"""
+        fields = IsccID._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow(snapshot.csv_value(f, row[f.attname]) for f in fields)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {IsccID._meta.db_table} "
+                f"({', '.join(f.column for f in fields)}) FROM STDIN "
+                f"(FORMAT csv, NULL '{snapshot.NULL}')",
+                buffer,
+            )
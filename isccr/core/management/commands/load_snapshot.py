@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from isccr.core import snapshot
+
+
+class Command(BaseCommand):
+    help = "Load a registry snapshot into an empty database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Snapshot directory (see dump_snapshot)")
+        parser.add_argument(
+            "--method",
+            choices=["copy", "orm"],
+            default="copy",
+            help="PostgreSQL COPY with index rebuild or ORM bulk inserts",
+        )
+        parser.add_argument(
+            "--maintenance-work-mem",
+            default="1GB",
+            help="PostgreSQL maintenance_work_mem for rebuilding indexes",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stats = snapshot.load(
+                options["path"],
+                options["method"],
+                maintenance_work_mem=options["maintenance_work_mem"],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        rows, seconds = stats["rows"], stats["load_seconds"]
+        total = seconds + stats["index_seconds"]
+        self.stdout.write(
+            f"Loaded {rows} ISCC-IDs with {options['method']} in {seconds:.1f}s "
+            f"({rows / max(seconds, 1e-9):.0f} rows/s)"
+        )
+        if stats["indexes"]:
+            self.stdout.write(
+                f"Rebuilt {stats['indexes']} indexes in {stats['index_seconds']:.1f}s"
+            )
+        self.stdout.write(f"Total {total:.1f}s ({rows / max(total, 1e-9):.0f} rows/s)")
+        for slug, (height, log_index) in sorted(snapshot.checkpoints().items()):
+            self.stdout.write(
+                f"  {slug} observer resumes at height {height} (log index {log_index})"
+            )
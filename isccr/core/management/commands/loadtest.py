@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import http.client
+import random
+import threading
+import time
+from urllib.parse import quote, urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from isccr.core.admin import IsccIDAdmin
+from isccr.core.models import Chain, IsccID
+
+
+class Command(BaseCommand):
+    help = "HTTP load test of resolver endpoints (pass several --url to compare)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            action="append",
+            required=True,
+            help="Base URL of a resolver deployment (repeatable)",
+        )
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=10, help="Seconds")
+        parser.add_argument(
+            "--sample", type=int, default=1000, help="Number of ISCC-IDs to request"
+        )
+        parser.add_argument(
+            "--unknown", type=float, default=0.1, help="Share of unknown ISCC-IDs"
+        )
+        parser.add_argument(
+            "--mix",
+            default="resolve=1,lookup=1",
+            help="Request profile as comma separated endpoint=weight "
+            "(endpoints: resolve, lookup, browse)",
+        )
+
+    def handle(self, *args, **options):
+        rows = list(
+            IsccID.objects.values_list("iscc_id", "iscc_code", "actor")[
+                : options["sample"]
+            ]
+        )
+        if not rows:
+            raise CommandError("No ISCC-IDs in database to request")
+        mix = {}
+        for item in options["mix"].split(","):
+            endpoint, weight = item.split("=")
+            if endpoint not in ("resolve", "lookup", "browse"):
+                raise CommandError(f"Unknown endpoint {endpoint} in --mix")
+            if float(weight) > 0:
+                mix[endpoint] = float(weight)
+        rnd = random.Random(0)
+        paths = dict(resolve=[], lookup=[], browse=[])
+        for iscc_id, iscc_code, actor in rows:
+            paths["resolve"].append(f"/{iscc_id}.json")
+            paths["lookup"].append(f"/lookup/{quote(iscc_code)}/{quote(actor)}")
+        n_unknown = int(len(rows) * options["unknown"])
+        paths["resolve"] += [
+            f"/28{rnd.getrandbits(64):x}.json" for _ in range(n_unknown)
+        ]
+        if "browse" in mix:
+            paths["browse"] = self.browse_paths(rows, rnd)
+        paths = {endpoint: paths[endpoint] for endpoint in mix}
+
+        self.stdout.write(
+            f"{'url':<32} {'requests':>9} {'req/s':>8} {'p50':>8} {'p95':>8} "
+            f"{'p99':>8} {'errors':>7}"
+        )
+        for url in options["url"]:
+            timings, errors = self.run(
+                url, paths, mix, options["concurrency"], options["duration"]
+            )
+            self.report(url, sum(timings.values(), []), errors, options["duration"])
+            if len(mix) > 1:
+                for endpoint, endpoint_timings in timings.items():
+                    self.report(
+                        f"  {endpoint}", endpoint_timings, None, options["duration"]
+                    )
+
+    def browse_paths(self, rows, rnd):
+        """Admin changelist pages, filters, searches and detail pages"""
+        base = "/browse/core/isccid/"
+        pages = min(IsccID.objects.count() // IsccIDAdmin.list_per_page, 1000)
+        paths = [base]
+        paths += [f"{base}?p={rnd.randint(1, max(pages, 1))}" for _ in range(100)]
+        for chain_id in Chain.objects.values_list("id", flat=True):
+            paths.append(f"{base}?src_chain__id__exact={chain_id}")
+        for iscc_id, iscc_code, _ in rows:
+            paths.append(f"{base}?q={quote(iscc_code)}")
+            paths.append(f"{base}?q={iscc_id}")
+            paths.append(f"{base}{iscc_id}/change/")
+        return paths
+
+    def report(self, name, timings, errors, duration):
+        ms = sorted(t * 1000 for t in timings) or [0.0]
+        errors = "" if errors is None else errors
+        self.stdout.write(
+            f"{name:<32} {len(timings):>9} {len(timings) / duration:>8.0f} "
+            f"{ms[len(ms) // 2]:>6.1f}ms {ms[int(len(ms) * 0.95)]:>6.1f}ms "
+            f"{ms[int(len(ms) * 0.99)]:>6.1f}ms {errors:>7}"
+        )
+
+    def run(self, url, paths, mix, concurrency, duration):
+        """Request random paths of the weighted endpoints from keep-alive clients"""
+        parts = urlsplit(url)
+        deadline = time.monotonic() + duration
+        timings, errors = {endpoint: [] for endpoint in paths}, [0]
+        endpoints, weights = list(mix), list(mix.values())
+        lock = threading.Lock()
+
+        def client(seed):
+            rnd = random.Random(seed)
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            local_timings, local_errors = {endpoint: [] for endpoint in paths}, 0
+            while time.monotonic() < deadline:
+                endpoint = rnd.choices(endpoints, weights)[0]
+                path = parts.path.rstrip("/") + rnd.choice(paths[endpoint])
+                start = time.perf_counter()
+                try:
+                    conn.request("GET", path)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    local_errors += 1
+                    conn.close()
+                    continue
+                if response.status in (200, 404):
+                    local_timings[endpoint].append(time.perf_counter() - start)
+                else:
+                    local_errors += 1
+            conn.close()
+            with lock:
+                for endpoint, endpoint_timings in local_timings.items():
+                    timings[endpoint].extend(endpoint_timings)
+                errors[0] += local_errors
+
+        threads = [
+            threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings, errors[0]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Record chain node responses as fixture for `benchmark ingest --fixture`"
+
+    def add_arguments(self, parser):
+        parser.add_argument("chain", choices=["coblo", "bloxberg"])
+        parser.add_argument("path", help="Fixture file (gzipped if ending with .gz)")
+        parser.add_argument(
+            "--start", type=int, default=0, help="First stream item or block"
+        )
+        parser.add_argument(
+            "--count", type=int, default=10000, help="Stream items or blocks"
+        )
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Write a synthetic fixture instead of recording a node",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from isccr.observers import replay
+        except ImportError as e:
+            raise CommandError(f"Recording requires web3 ({e})")
+        chain, start, count = options["chain"], options["start"], options["count"]
+        begin = time.monotonic()
+        if options["synthetic"]:
+            from isccr.observers.testing import FakeEthereumNode, FakeMultiChain
+
+            if chain == "coblo":
+                node = FakeMultiChain(count)
+            else:
+                from isccr.observers.bloxberg import W3_CONTRACT
+
+                node = FakeEthereumNode(count, W3_CONTRACT)
+            fixture = replay.node_fixture(node)
+            node.server_close()
+        elif chain == "coblo":
+            from isccr.observers import coblo
+
+            fixture = replay.record_coblo(coblo.rpc_client(), start, count)
+        else:
+            from isccr.observers import bloxberg
+
+            fixture = replay.record_bloxberg(
+                bloxberg.w3_client(), bloxberg.W3_CONTRACT, start, start + count - 1
+            )
+        replay.save_fixture(fixture, options["path"])
+        n = len(fixture["items"] if chain == "coblo" else fixture["logs"])
+        seconds = time.monotonic() - begin
+        self.stdout.write(
+            f"Recorded {n} {chain} declarations to {options['path']} in {seconds:.1f}s"
+        )
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.1 on 2026-10-18 12:00
+
+import iscc
+from django.db import migrations, models
+
+
+def backfill_iscc_id_body(apps, schema_editor):
+    """ISCC-IDs with a single byte counter decode to body (8 bytes) + counter"""
+    IsccID = apps.get_model('core', 'IsccID')
+    batch = []
+    for obj in IsccID.objects.only('iscc_id').iterator(chunk_size=2000):
+        obj.iscc_id_body = iscc.decode(obj.iscc_id)[:8].hex()
+        batch.append(obj)
+        if len(batch) >= 2000:
+            IsccID.objects.bulk_update(batch, ['iscc_id_body'])
+            batch = []
+    IsccID.objects.bulk_update(batch, ['iscc_id_body'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20210904_1647'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='isccid',
+            name='iscc_id_body',
+            field=models.CharField(default='', editable=False, help_text='Hex encoded ISCC-ID without counter (ledger header + similarity hash)', max_length=16, verbose_name='ISCC-ID body'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_iscc_id_body, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='isccid',
+            name='iscc_id_body',
+            field=models.CharField(db_index=True, editable=False, help_text='Hex encoded ISCC-ID without counter (ledger header + similarity hash)', max_length=16, verbose_name='ISCC-ID body'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_isccid_iscc_id_body'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='isccid',
+            index=models.Index(fields=['iscc_code', 'actor'], name='core_isccid_iscc_co_3c6fa0_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_isccid_lookup_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='isccid',
+            index=models.Index(fields=['created'], name='core_isccid_created_0bd560_idx'),
+        ),
+    ]
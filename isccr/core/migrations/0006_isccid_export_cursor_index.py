@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_isccid_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='isccid',
+            index=models.Index(fields=['src_time', 'iscc_id'], name='core_isccid_src_tim_5a9bf9_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='isccid',
+            name='core_isccid_src_tim_fc0642_idx',
+        ),
+    ]
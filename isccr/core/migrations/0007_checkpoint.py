@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max
+
+CHAIN_ID_COBLO = 1
+
+
+def backfill_checkpoints(apps, schema_editor):
+    """Resume after the last stream item (coblo) or rescan the last block (bloxberg).
+
+    Block based chains restart at the last seen block because it may have been
+    interrupted, transactions that were already ingested are skipped.
+    """
+    Checkpoint = apps.get_model('core', 'Checkpoint')
+    IsccID = apps.get_model('core', 'IsccID')
+    heights = IsccID.objects.values('src_chain').annotate(height=Max('src_chain_idx'))
+    for entry in heights:
+        height = entry['height']
+        if entry['src_chain'] == CHAIN_ID_COBLO:
+            height += 1
+        Checkpoint.objects.create(chain_id=entry['src_chain'], height=height)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_isccid_export_cursor_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('chain', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.chain')),
+                ('height', models.PositiveBigIntegerField(default=0, help_text='Next stream item (coblo) or block (bloxberg) to process')),
+                ('log_index', models.PositiveIntegerField(default=0, help_text='Next log index to process within block `height` (bloxberg)')),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint',
+                'verbose_name_plural': 'Checkpoints',
+            },
+        ),
+        migrations.RunPython(backfill_checkpoints, migrations.RunPython.noop),
+    ]
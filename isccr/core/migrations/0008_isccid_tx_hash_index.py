@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='isccid',
+            index=models.Index(fields=['src_chain', 'src_tx_hash'], name='core_isccid_src_cha_57b4bd_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.1.14 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_isccid_tx_hash_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkLoad',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Command that loaded the rows', max_length=64)),
+                ('rows', models.PositiveBigIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Bulk load',
+                'verbose_name_plural': 'Bulk loads',
+            },
+        ),
+    ]
@@ -21,6 +21,50 @@ class Chain(models.Model):
         verbose_name_plural = "Chains"
 
 
+class Checkpoint(models.Model):
+    """Resume position of a chain observer (advanced by ingested batches)"""
+
+    chain = models.OneToOneField(Chain, on_delete=models.CASCADE, primary_key=True)
+    height = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Next stream item (coblo) or block (bloxberg) to process",
+    )
+    log_index = models.PositiveIntegerField(
+        default=0,
+        help_text="Next log index to process within block `height` (bloxberg)",
+    )
+    modified = models.DateTimeField(auto_now=True)
+
+    def __repr__(self):
+        return (
+            f"Checkpoint(chain={self.chain_id}, height={self.height}, "
+            f"log_index={self.log_index})"
+        )
+
+    @property
+    def position(self):
+        return self.height, self.log_index
+
+    class Meta:
+        verbose_name = "Checkpoint"
+        verbose_name_plural = "Checkpoints"
+
+
+class BulkLoad(models.Model):
+    """ISCC-IDs loaded outside of the observers (snapshots, synthetic registries)"""
+
+    source = models.CharField(max_length=64, help_text="Command that loaded the rows")
+    rows = models.PositiveBigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __repr__(self):
+        return f"BulkLoad(id={self.id}, source={self.source!r}, rows={self.rows})"
+
+    class Meta:
+        verbose_name = "Bulk load"
+        verbose_name_plural = "Bulk loads"
+
+
 class IsccID(TimeStampedModel):
     """An ISCC-ID minted from a declaration."""
 
@@ -32,6 +76,13 @@ class IsccID(TimeStampedModel):
         primary_key=True,
         help_text="ISCC-ID - digital asset identifier",
     )
+    iscc_id_body = models.CharField(
+        verbose_name="ISCC-ID body",
+        max_length=16,
+        db_index=True,
+        editable=False,
+        help_text="Hex encoded ISCC-ID without counter (ledger header + similarity hash)",
+    )
     iscc_code = models.CharField(
         verbose_name="ISCC-CODE",
         max_length=256,
@@ -110,7 +161,10 @@ class IsccID(TimeStampedModel):
         verbose_name = "ISCC-ID"
         verbose_name_plural = "ISCC-IDs"
         indexes = [
-            models.Index(fields=['src_time'])
+            models.Index(fields=['src_time', 'iscc_id']),
+            models.Index(fields=['iscc_code', 'actor']),
+            models.Index(fields=['created']),
+            models.Index(fields=['src_chain', 'src_tx_hash']),
         ]
 
     def __str__(self):
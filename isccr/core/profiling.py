@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Opt-in per request profiling (enabled with RESOLVER_PROFILE=1).
+
+Records wall time, number and duration of database queries (count queries of
+paginated changelists separately) and template rendering time per request. The
+timings are added as `Server-Timing` header and logged for a sample of requests.
+Queries of async views run in worker threads and are timed there (`timed_queries`).
+A sample of requests runs under a profiler, profiles of the slowest of them are
+kept in RESOLVER_PROFILE_DIR.
+"""
+import contextvars
+import heapq
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from loguru import logger as log
+
+
+REQUEST_TIMER = contextvars.ContextVar("isccr_request_timer", default=None)
+
+
+class QueryTimer:
+    """Database execute wrapper that sums up query count and time"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.count_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.queries += 1
+                self.seconds += seconds
+                if "COUNT(" in sql.upper() or "reltuples" in sql:
+                    self.count_seconds += seconds
+
+
+@contextmanager
+def timed_queries():
+    """Time queries on this thread's connections for the current profiled request.
+
+    The middleware only wraps the connections of its own thread, database code that
+    runs in other threads (async views) has to be wrapped with this.
+    """
+    timer = REQUEST_TIMER.get()
+    with ExitStack() as stack:
+        if timer is not None:
+            for conn in connections.all():
+                if timer not in conn.execute_wrappers:
+                    stack.enter_context(conn.execute_wrapper(timer))
+        yield
+
+
+class Profiler:
+    """cProfile or pyinstrument profiler with a common interface"""
+
+    def __init__(self, name: str):
+        self.name = name
+        if name == "pyinstrument":
+            try:
+                from pyinstrument import Profiler as PyinstrumentProfiler
+            except ImportError:
+                raise ImproperlyConfigured("RESOLVER_PROFILER requires pyinstrument")
+            self.profiler = PyinstrumentProfiler()
+        elif name == "cprofile":
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+        else:
+            raise ImproperlyConfigured(f"Unknown RESOLVER_PROFILER {name}")
+
+    def __enter__(self):
+        if self.name == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.name == "pyinstrument":
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def dump(self, path: str) -> str:
+        if self.name == "pyinstrument":
+            path += ".html"
+            with open(path, "wt", encoding="utf-8") as outf:
+                outf.write(self.profiler.output_html())
+        else:
+            path += ".prof"
+            self.profiler.dump_stats(path)
+        return path
+
+
+class SlowestProfiles:
+    """Keeps profile dumps of the `keep` slowest sampled requests"""
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+        self.heap = []  # (seconds, path) of kept dumps
+        self.lock = threading.Lock()
+
+    def offer(self, profiler: Profiler, seconds: float, request) -> str:
+        """Dump profile if among the slowest, return path or empty string"""
+        with self.lock:
+            if len(self.heap) >= self.keep and seconds <= self.heap[0][0]:
+                return ""
+            os.makedirs(self.directory, exist_ok=True)
+            slug = re.sub(r"[^\w]+", "_", request.path).strip("_")[:64] or "index"
+            millis = f"{seconds * 1000:09.1f}ms"
+            name = f"{millis}-{request.method}-{slug}-{time.time_ns()}"
+            path = profiler.dump(os.path.join(self.directory, name))
+            heapq.heappush(self.heap, (seconds, path))
+            if len(self.heap) > self.keep:
+                _, dropped = heapq.heappop(self.heap)
+                try:
+                    os.remove(dropped)
+                except OSError:
+                    pass
+            return path
+
+
+class ProfilingMiddleware:
+    """Server-Timing headers, sampled log records and profiles of slow requests"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log_rate = settings.RESOLVER_PROFILE_LOG_RATE
+        self.sample_rate = settings.RESOLVER_PROFILE_SAMPLE_RATE
+        self.profiler = settings.RESOLVER_PROFILER
+        self.slowest = SlowestProfiles(
+            settings.RESOLVER_PROFILE_DIR, settings.RESOLVER_PROFILE_KEEP
+        )
+        if self.sample_rate:
+            Profiler(self.profiler)  # Fail early if misconfigured
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        request._profile_render = [0.0, 0.0]  # render start, render seconds
+        profiler = None
+        if self.sample_rate and random.random() < self.sample_rate:
+            profiler = Profiler(self.profiler)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            stack.callback(REQUEST_TIMER.reset, REQUEST_TIMER.set(timer))
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timer))
+            if profiler is not None:
+                stack.enter_context(profiler)
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+
+        render = request._profile_render[1]
+        timings = [
+            ("total", seconds, None),
+            ("db", timer.seconds, f"{timer.queries} queries"),
+            ("count", timer.count_seconds, None),
+            ("render", render, None),
+        ]
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={value * 1000:.1f}" + (f';desc="{desc}"' if desc else "")
+            for name, value, desc in timings
+        )
+
+        dump = ""
+        if profiler is not None:
+            dump = self.slowest.offer(profiler, seconds, request)
+        if dump or random.random() < self.log_rate:
+            record = dict(
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+                ms=round(seconds * 1000, 1),
+                queries=timer.queries,
+                db_ms=round(timer.seconds * 1000, 1),
+                count_ms=round(timer.count_seconds * 1000, 1),
+                render_ms=round(render * 1000, 1),
+            )
+            if dump:
+                record["profile"] = dump
+            log.info(f"request profile {json.dumps(record)}")
+        return response
+
+    def process_template_response(self, request, response):
+        """Measure template rendering (runs right before the response is rendered)"""
+        request._profile_render[0] = time.perf_counter()
+
+        def rendered(response):
+            request._profile_render[1] = (
+                time.perf_counter() - request._profile_render[0]
+            )
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Registry snapshots for bootstrapping new resolver replicas.
+
+A snapshot is a directory with `meta.json` (chains, observer checkpoints, row count)
+and `isccid.csv.gz` (all IsccID rows in PostgreSQL COPY CSV format). Chains without a
+persisted checkpoint get one derived from their last `src_chain_idx`. On PostgreSQL
+snapshots are written and loaded with COPY, secondary indexes are dropped during
+the load and rebuilt afterwards.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from typing import List, Tuple
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from loguru import logger as log
+from isccr.core.models import BulkLoad, Chain, Checkpoint, IsccID
+from isccr.observers.ingest import BULK_BATCH_SIZE
+
+
+META_FILE = "meta.json"
+ISCCID_FILE = "isccid.csv.gz"
+NULL = r"\N"
+COPY_OPTIONS = f"FORMAT csv, HEADER true, NULL '{NULL}'"
+
+
+def columns() -> List[str]:
+    return [f.column for f in IsccID._meta.concrete_fields]
+
+
+def is_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def dump(path: str) -> dict:
+    """Write a consistent snapshot of the registry to directory `path`"""
+    os.makedirs(path, exist_ok=True)
+    cols = columns()
+    with transaction.atomic():
+        if is_postgres():
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SET LOCAL TimeZone = 'UTC'")
+        chains = list(Chain.objects.order_by("id").values())
+        rows = IsccID.objects.values("src_chain").annotate(
+            rows=Count("pk"), last_idx=Max("src_chain_idx")
+        )
+        for chain in chains:
+            chain.update(rows=0, checkpoint=None)
+        by_id = {chain["id"]: chain for chain in chains}
+        for entry in rows:
+            chain = by_id[entry["src_chain"]]
+            chain["rows"] = entry["rows"]
+            chain["checkpoint"] = derived_checkpoint(chain["slug"], entry["last_idx"])
+        for checkpoint in Checkpoint.objects.all():
+            by_id[checkpoint.chain_id]["checkpoint"] = dict(
+                height=checkpoint.height, log_index=checkpoint.log_index
+            )
+
+        with gzip.open(os.path.join(path, ISCCID_FILE), "wb", compresslevel=6) as outf:
+            if is_postgres():
+                query = f"SELECT {', '.join(cols)} FROM core_isccid ORDER BY iscc_id"
+                with connection.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY ({query}) TO STDOUT ({COPY_OPTIONS})", outf
+                    )
+            else:
+                write_csv(outf, cols)
+
+    meta = dict(
+        created=timezone.now().isoformat(),
+        columns=cols,
+        rows=sum(chain["rows"] for chain in chains),
+        chains=chains,
+    )
+    with open(os.path.join(path, META_FILE), "wt", encoding="utf-8") as outf:
+        json.dump(meta, outf, indent=2)
+    return meta
+
+
+def write_csv(outf, cols: List[str]):
+    """Write IsccID rows in COPY CSV format without COPY (other databases)"""
+    text = io.TextIOWrapper(outf, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(cols)
+    fields = IsccID._meta.concrete_fields
+    attnames = [f.attname for f in fields]
+    for row in IsccID.objects.order_by("iscc_id").values_list(*attnames).iterator():
+        writer.writerow(csv_value(f, v) for f, v in zip(fields, row))
+    text.detach()
+
+
+def csv_value(field, value):
+    if value is None:
+        return NULL
+    if field.get_internal_type() == "JSONField":
+        return json.dumps(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, META_FILE), "rt", encoding="utf-8") as infile:
+        return json.load(infile)
+
+
+def secondary_indexes() -> List[Tuple[str, str]]:
+    """(name, definition) of IsccID indexes not backing a constraint (PostgreSQL)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE tablename = 'core_isccid' AND indexname NOT IN (
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = 'core_isccid'::regclass
+            )
+            ORDER BY indexname
+            """
+        )
+        return cursor.fetchall()
+
+
+def load(path: str, method: str = "copy", maintenance_work_mem="1GB") -> dict:
+    """Load snapshot into an empty registry and return timings"""
+    meta = read_meta(path)
+    if IsccID.objects.exists():
+        raise ValueError("Registry is not empty, snapshots load into a fresh database")
+    if method == "copy" and not is_postgres():
+        raise ValueError("COPY requires PostgreSQL (use the orm method)")
+
+    stats = dict(rows=0, load_seconds=0.0, index_seconds=0.0, indexes=0)
+    with transaction.atomic():
+        for chain in meta["chains"]:
+            Chain.objects.update_or_create(
+                id=chain["id"],
+                defaults=dict(slug=chain["slug"], url_template=chain["url_template"]),
+            )
+            checkpoint = chain.get("checkpoint")
+            if checkpoint is None and chain["rows"]:
+                raise ValueError(
+                    f"Snapshot has no checkpoint for {chain['slug']}, dump it again"
+                )
+            if checkpoint is not None:
+                Checkpoint.objects.update_or_create(
+                    chain_id=chain["id"], defaults=checkpoint
+                )
+        indexes = []
+        if method == "copy":
+            indexes = secondary_indexes()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET LOCAL maintenance_work_mem = %s", [maintenance_work_mem]
+                )
+                for name, _ in indexes:
+                    cursor.execute(f'DROP INDEX "{name}"')
+
+        start = time.monotonic()
+        with gzip.open(os.path.join(path, ISCCID_FILE), "rb") as infile:
+            if method == "copy":
+                # Column list from header, COPY reads the remaining lines
+                cols = next(csv.reader([infile.readline().decode("utf-8")]))
+                with connection.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY core_isccid ({', '.join(cols)}) FROM STDIN "
+                        f"(FORMAT csv, NULL '{NULL}')",
+                        infile,
+                    )
+                    cursor.execute("SELECT count(*) FROM core_isccid")
+                    stats["rows"] = cursor.fetchone()[0]
+            else:
+                stats["rows"] = load_orm(infile)
+        stats["load_seconds"] = time.monotonic() - start
+
+        start = time.monotonic()
+        with connection.cursor() as cursor:
+            for name, definition in indexes:
+                log.info(f"Rebuilding index {name}")
+                cursor.execute(definition)
+            if is_postgres():
+                cursor.execute("ANALYZE core_isccid")
+        stats["index_seconds"] = time.monotonic() - start
+        stats["indexes"] = len(indexes)
+
+        if stats["rows"] != meta["rows"]:
+            raise ValueError(f"Loaded {stats['rows']} rows, expected {meta['rows']}")
+        BulkLoad.objects.create(source="load_snapshot", rows=stats["rows"])
+    return stats
+
+
+def load_orm(infile) -> int:
+    """Load snapshot rows with bulk_create (reference for the COPY path)"""
+    text = io.TextIOWrapper(infile, encoding="utf-8", newline="")
+    reader = csv.reader(text)
+    fields = {f.column: f for f in IsccID._meta.concrete_fields}
+    header = [fields[col] for col in next(reader)]
+    count, batch = 0, []
+    for row in reader:
+        values = {}
+        for field, value in zip(header, row):
+            if value == NULL:
+                value = None
+            elif field.get_internal_type() == "JSONField":
+                value = json.loads(value)
+            else:
+                value = field.to_python(value)
+            values[field.attname] = value
+        batch.append(IsccID(**values))
+        if len(batch) == BULK_BATCH_SIZE:
+            IsccID.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    IsccID.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def derived_checkpoint(slug: str, last_idx: int) -> dict:
+    """Checkpoint after the last ingested `src_chain_idx` of a chain.
+
+    Bloxberg indexes blocks, its last block is scanned again (the observer skips
+    ingested transactions). Coblo indexes stream items and resumes after the last.
+    """
+    if slug == "bloxberg":
+        return dict(height=last_idx, log_index=0)
+    return dict(height=last_idx + 1, log_index=0)
+
+
+def checkpoints() -> dict:
+    """Observer resume position (height, log_index) per chain slug"""
+    return {
+        checkpoint.chain.slug: checkpoint.position
+        for checkpoint in Checkpoint.objects.select_related("chain")
+    }
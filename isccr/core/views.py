@@ -1,9 +1,42 @@
+import json
+from django.conf import settings
 from django.core import serializers
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.views.generic.base import RedirectView
+from more_itertools import chunked
 
+from isccr import metrics as isccr_metrics
+from isccr.core import bloom, export
+from isccr.core.cache import get_resolver_cache, lookup_key, resolve_key
 from isccr.core.models import IsccID
+from isccr.observers import instrument
+
+
+# Fields of a resolved ISCC-ID record (as served by the JSON resolver)
+RESOLVER_FIELDS = (
+    "iscc_id",
+    "iscc_code",
+    "iscc_tophash",
+    "actor",
+    "iscc_seed_title",
+    "iscc_seed_extra",
+    "iscc_mutable_metadata",
+    "src_chain__slug",
+    "src_chain_idx",
+    "src_block_hash",
+    "src_tx_hash",
+    "src_tx_out_idx",
+    "src_time",
+    "revision",
+)
 
 
 def index(request):
@@ -33,19 +66,189 @@ def index(request):
     return HttpResponse(html)
 
 
+def accepts_json(request):
+    """Check if client prefers JSON over HTML (explicit Accept header only)"""
+    accept = [
+        m.split(";")[0].strip() for m in request.headers.get("Accept", "").split(",")
+    ]
+    if "application/json" not in accept:
+        return False
+    if "text/html" not in accept:
+        return True
+    return accept.index("application/json") < accept.index("text/html")
+
+
+def resolve_record(iscc_id):
+    """Return resolved ISCC-ID record as dict or None if not found"""
+    record = IsccID.objects.filter(pk=iscc_id).values(*RESOLVER_FIELDS).first()
+    if record is not None:
+        record["src_chain"] = record.pop("src_chain__slug")
+    return record
+
+
+def cached_record(iscc_id):
+    """Return resolved ISCC-ID record from cache or database"""
+    if not bloom.might_exist(iscc_id):
+        return None
+    return get_resolver_cache().get_or_load(
+        resolve_key(iscc_id), lambda: resolve_record(iscc_id)
+    )
+
+
+def admin_url(iscc_id):
+    return reverse("admin:core_isccid_change", args=(iscc_id,))
+
+
+def resolve_records(iscc_ids):
+    """Yield resolved records for many ISCC-IDs from a single query"""
+    iscc_ids = [iscc_id for iscc_id in iscc_ids if bloom.might_exist(iscc_id)]
+    qs = IsccID.objects.filter(pk__in=iscc_ids).values(*RESOLVER_FIELDS)
+    for record in qs.iterator(chunk_size=2000):
+        record["src_chain"] = record.pop("src_chain__slug")
+        yield record
+
+
 def resovle(request, iscc_id):
-    iscc_id_obj = get_object_or_404(IsccID, pk=iscc_id)
+    as_json = iscc_id.endswith(".json")
+    if as_json:
+        iscc_id = iscc_id[: -len(".json")]
+    record = cached_record(iscc_id)
+    if as_json or accepts_json(request):
+        if record is None:
+            response = JsonResponse({"detail": "ISCC-ID not found"}, status=404)
+        else:
+            response = JsonResponse(record)
+    else:
+        if record is None:
+            raise Http404("No ISCC-ID matches the given query.")
+        response = redirect(admin_url(iscc_id))
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def stream_records(iscc_ids):
+    """Stream JSON map of ISCC-ID -> record with null for missing ISCC-IDs"""
+    missing = set(iscc_ids)
+    sep = "{"
+    for record in resolve_records(iscc_ids):
+        missing.discard(record["iscc_id"])
+        yield f"{sep}{json.dumps(record['iscc_id'])}: "
+        yield json.dumps(record, cls=DjangoJSONEncoder)
+        sep = ", "
+    for iscc_id in iscc_ids:
+        if iscc_id in missing:
+            yield f"{sep}{json.dumps(iscc_id)}: null"
+            sep = ", "
+    yield "{}" if sep == "{" else "}"
 
-    return redirect(iscc_id_obj.get_admin_url())
+
+@csrf_exempt
+@require_POST
+def resolve_batch(request):
+    """Resolve a JSON list of ISCC-IDs to a JSON map of records (null if missing)"""
+    try:
+        iscc_ids = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+    if not isinstance(iscc_ids, list) or not all(isinstance(i, str) for i in iscc_ids):
+        return JsonResponse({"detail": "Expected a list of ISCC-IDs"}, status=400)
+    if len(iscc_ids) > settings.RESOLVER_BATCH_MAX:
+        msg = f"Too many ISCC-IDs (max {settings.RESOLVER_BATCH_MAX})"
+        return JsonResponse({"detail": msg}, status=413)
+
+    iscc_ids = list(dict.fromkeys(iscc_ids))
+    if len(iscc_ids) > settings.RESOLVER_BATCH_STREAM:
+        return StreamingHttpResponse(
+            export.threaded(stream_records(iscc_ids)), content_type="application/json"
+        )
+    result = dict.fromkeys(iscc_ids)
+    for record in resolve_records(iscc_ids):
+        result[record["iscc_id"]] = record
+    return JsonResponse(result)
 
 
 def lookup(request, iscc_code, actor):
-    iscc_id_obj = get_object_or_404(IsccID, iscc_code=iscc_code, actor=actor)
+    def load():
+        qs = IsccID.objects.filter(iscc_code=iscc_code, actor=actor)
+        return qs.values_list("iscc_id", flat=True).first()
+
+    iscc_id = get_resolver_cache().get_or_load(lookup_key(iscc_code, actor), load)
+    if iscc_id is None:
+        raise Http404("No ISCC-ID matches the given query.")
     return JsonResponse(
-        {"iscc_id": iscc_id_obj.iscc_id},
+        {"iscc_id": iscc_id},
     )
 
 
+def lookup_iscc_ids(pairs):
+    """Map (iscc_code, actor) pairs to ISCC-IDs (single query unless on SQLite)"""
+    pairs = list(dict.fromkeys(pairs))
+    found = {}
+    # SQLite limits the number of query parameters
+    chunk_size = connection.ops.bulk_batch_size(["iscc_code", "actor"], pairs)
+    for chunk in chunked(pairs, max(chunk_size, 1)):
+        match = Q(*(Q(iscc_code=c, actor=a) for c, a in chunk), _connector=Q.OR)
+        qs = IsccID.objects.filter(match).values_list("iscc_code", "actor", "iscc_id")
+        for iscc_code, actor, iscc_id in qs:
+            found.setdefault((iscc_code, actor), iscc_id)
+    return found
+
+
+@csrf_exempt
+@require_POST
+def lookup_batch(request):
+    """Lookup a JSON list of [iscc_code, actor] pairs (ISCC-ID or null per pair)"""
+    try:
+        pairs = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+    if not isinstance(pairs, list) or not all(
+        isinstance(p, list) and len(p) == 2 and all(isinstance(v, str) for v in p)
+        for p in pairs
+    ):
+        msg = "Expected a list of [iscc_code, actor] pairs"
+        return JsonResponse({"detail": msg}, status=400)
+    if len(pairs) > settings.RESOLVER_BATCH_MAX:
+        msg = f"Too many pairs (max {settings.RESOLVER_BATCH_MAX})"
+        return JsonResponse({"detail": msg}, status=413)
+
+    pairs = [tuple(p) for p in pairs]
+    found = lookup_iscc_ids(pairs)
+    result = [
+        {"iscc_code": code, "actor": actor, "iscc_id": found.get((code, actor))}
+        for code, actor in pairs
+    ]
+    return JsonResponse(result, safe=False)
+
+
+def export_registry(request):
+    """Stream all ISCC-IDs ordered by (src_time, iscc_id) as NDJSON or CSV"""
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in export.FORMATS:
+        msg = f"Unsupported format (one of {', '.join(export.FORMATS)})"
+        return JsonResponse({"detail": msg}, status=400)
+    after = request.GET.get("after")
+    try:
+        after = export.parse_cursor(after) if after else None
+    except ValueError:
+        msg = "Invalid cursor (expected <src_time>,<iscc_id> of last received row)"
+        return JsonResponse({"detail": msg}, status=400)
+
+    rows = export.export_rows(after, chunk_size=settings.RESOLVER_EXPORT_CHUNK_SIZE)
+    if fmt == "ndjson":
+        chunks, content_type = export.encode_ndjson(rows), "application/x-ndjson"
+    else:
+        chunks, content_type = export.encode_csv(rows), "text/csv"
+    gzipped = request.GET.get("gzip") in ("1", "true")
+    if gzipped:
+        # Served as a .gz file (not Content-Encoding) so clients keep it compressed
+        chunks, content_type = export.gzip_stream(chunks), "application/gzip"
+    response = StreamingHttpResponse(export.threaded(chunks), content_type=content_type)
+    filename = f"iscc-registry.{fmt}{'.gz' if gzipped else ''}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 class IsccRedirectView(RedirectView):
 
     permanent = False
@@ -53,5 +256,17 @@ class IsccRedirectView(RedirectView):
     pattern_name = "admin:core_isccid_change"
 
     def get_redirect_url(self, *args, **kwargs):
-        article = get_object_or_404(IsccID, pk=kwargs["pk"])
+        if cached_record(kwargs["pk"]) is None:
+            raise Http404("No ISCC-ID matches the given query.")
         return super().get_redirect_url(*args, **kwargs)
+
+
+def metrics(request):
+    """Metrics of this worker process and observer checkpoints (Prometheus text)
+
+    Counters are not aggregated across worker processes.
+    """
+    instrument.record_checkpoints()
+    return HttpResponse(
+        isccr_metrics.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Minimal in-process metrics with Prometheus text exposition."""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+REGISTRY = {}  # type: Dict[str, Metric]
+
+
+class Metric:
+    """A named metric with optional labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # type: Dict[Tuple[str, ...], float]
+        self.lock = threading.Lock()
+
+    def key(self, labels) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels) -> float:
+        return self.values.get(self.key(labels), 0)
+
+    def samples(self):
+        """Yield (name, labels, value) tuples for exposition"""
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram(Metric):
+    """Cumulative histogram of observed values (e.g. latencies in seconds)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # Counts per bucket (last is +Inf) and sum of observed values
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels) -> float:
+        """Number of observations"""
+        entry = self.values.get(self.key(labels))
+        return 0 if entry is None else sum(entry[0])
+
+    def samples(self):
+        with self.lock:
+            items = [
+                (key, list(counts), total)
+                for key, (counts, total) in self.values.items()
+            ]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=bound), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+def register(cls, name, help, labelnames=(), **kwargs):
+    """Return metric `name` from the registry (created on first use)"""
+    metric = REGISTRY.get(name)
+    if metric is None:
+        metric = REGISTRY.setdefault(name, cls(name, help, labelnames, **kwargs))
+    return metric
+
+
+def counter(name, help, labelnames=()) -> Counter:
+    return register(Counter, name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()) -> Gauge:
+    return register(Gauge, name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return register(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def render() -> str:
+    """Render all registered metrics in Prometheus text format"""
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        data = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve metrics of this process over HTTP from a background thread"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
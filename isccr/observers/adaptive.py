@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Adaptive batch sizing and catch-up/tail mode switching for observers.
+
+Batch sizes grow while the projected RPC and DB latency of a batch stays within a
+latency budget and shrink on slow batches and timeouts. While the backlog exceeds
+one batch the observer is in catch-up mode and fetches without pausing, otherwise it
+is in tail mode and polls the chain at a short interval.
+"""
+from django.conf import settings
+from isccr import metrics
+
+
+CATCHUP = "catchup"
+TAIL = "tail"
+MODES = (CATCHUP, TAIL)
+
+batch_size_gauge = metrics.gauge(
+    "isccr_observer_batch_size", "Current observer batch size", ("chain",)
+)
+backlog_gauge = metrics.gauge(
+    "isccr_observer_backlog", "Items or blocks the observer is behind", ("chain",)
+)
+mode_gauge = metrics.gauge(
+    "isccr_observer_mode", "Current observer mode (1 if active)", ("chain", "mode")
+)
+timeouts = metrics.counter(
+    "isccr_observer_timeouts_total", "Observer RPC timeouts", ("chain",)
+)
+
+
+class AdaptiveBatcher:
+    """Batch size controller against a per batch latency budget"""
+
+    def __init__(
+        self,
+        chain: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        budget: float = None,
+        tail_interval: float = None,
+    ):
+        self.chain = chain
+        self.minimum = minimum
+        self.maximum = maximum
+        self.budget = settings.OBSERVER_LATENCY_BUDGET if budget is None else budget
+        self.tail_interval = (
+            settings.OBSERVER_TAIL_INTERVAL if tail_interval is None else tail_interval
+        )
+        self.size = min(max(initial, minimum), maximum)
+        self.costs = {}  # Seconds per item by stage (rpc, db)
+        self.mode = CATCHUP
+        self.set_mode(CATCHUP)
+        batch_size_gauge.set(self.size, chain=chain)
+
+    @property
+    def poll_interval(self) -> float:
+        """Pause before the next fetch (none while catching up)"""
+        return 0.0 if self.mode == CATCHUP else self.tail_interval
+
+    def record(self, stage: str, seconds: float, items: int):
+        """Record latency of a full batch and adapt batch size"""
+        if items <= 0:
+            return
+        self.costs[stage] = seconds / items
+        projected = max(self.costs.values()) * self.size
+        if projected > self.budget:
+            self.resize(int(self.budget / max(self.costs.values())))
+        elif projected < self.budget / 2:
+            self.resize(self.size * 2)
+
+    def timeout(self):
+        """Halve batch size after a timeout or oversized response"""
+        timeouts.inc(chain=self.chain)
+        self.resize(self.size // 2)
+
+    def resize(self, size: int):
+        self.size = min(max(size, self.minimum), self.maximum)
+        batch_size_gauge.set(self.size, chain=self.chain)
+
+    def update_backlog(self, backlog: int) -> str:
+        """Switch mode based on the measured backlog and return current mode"""
+        backlog_gauge.set(max(backlog, 0), chain=self.chain)
+        self.set_mode(CATCHUP if backlog > self.size else TAIL)
+        return self.mode
+
+    def set_mode(self, mode: str):
+        self.mode = mode
+        for name in MODES:
+            mode_gauge.set(int(name == mode), chain=self.chain, mode=name)
@@ -1,24 +1,55 @@
 # -*- coding: utf-8 -*-
 from isccr import standalone
+import asyncio
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from django.db import InterfaceError, OperationalError, connection
 from datetime import datetime
 import pytz
 import sys
 import iscc
+import websockets
 from more_itertools import chunked
 from loguru import logger as log
-from isccr.core.models import Chain, IsccID
-from web3 import Web3
+from isccr.core.models import Chain, Checkpoint, IsccID
+from web3 import HTTPProvider, Web3, WebsocketProvider
+from web3 import __version__ as web3_version
 import json
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
 
-from isccr.utils import build_iscc_id
+from isccr import metrics
+from isccr.core.cache import MISSING, LRUCache
+from isccr.observers.adaptive import AdaptiveBatcher
+from isccr.observers.ingest import ingest
+from isccr.observers import instrument, notify
+
+# web3 internals (batch requests, closing websockets) are only used with web3 5.x,
+# other versions fall back to single calls and dropping connections unclosed
+WEB3_INTERNALS = web3_version.split(".")[0] == "5"
+try:
+    from web3._utils.request import make_post_request
+except ImportError:  # pragma: no cover
+    make_post_request = None
 
 
 CHAIN_ID_BLOXBERG = 2
 ISCC_ID_HEADER_BLOXBERG = 0b0100_0010 .to_bytes(1, "big", signed=False)
+BLOCK_WINDOW = 10000
+BLOCK_WINDOW_MIN = 100
+BLOCK_WINDOW_MAX = 200000
+BLOCK_CACHE_SIZE = 10000
+BLOCK_BATCH_SIZE = 100
+DEDUPE_BATCH_SIZE = 500
 W3_CLIENT = None
-W3_URL = "wss://websockets.bloxberg.org"
+W3_URL = settings.CHAIN_BLOXBERG_URL
+W3_PROVIDER = None  # Provider used instead of W3_URL (e.g. replay.ReplayProvider)
+WORKER_CLIENTS = threading.local()
+# Cached connections of the main thread and workers, closed by reset_clients
+CLIENTS = []  # type: List[Web3]
+CLIENTS_LOCK = threading.Lock()
 W3_CONTRACT = "0x4945d63B509e137b0293Bd958cf97B61996c0fB9"
 W3_ABI = json.loads(
     '[{"type":"event","name":"ISCC","inputs":[{"type":"address","name":"actor",'
@@ -30,74 +61,384 @@ W3_ABI = json.loads(
     '"internalType":"bytes"}]}]'
 )
 EXPLORER_TPL = "https://blockexplorer.bloxberg.org/tx/{}/internal_transactions/"
+RECONNECT_INTERVAL = 10
+
+
+def connect(url: str) -> Web3:
+    """Return new web3 connection (websocket or HTTP depending on url)."""
+    if W3_PROVIDER is not None:
+        return Web3(W3_PROVIDER)
+    if url.startswith("ws"):
+        w3 = Web3(Web3.WebsocketProvider(url))
+    else:
+        w3 = Web3(Web3.HTTPProvider(url))
+    if w3.isConnected():
+        log.debug(f"Connected to {url}")
+    else:
+        msg = f"Connection failed to {url}."
+        log.error(msg)
+        raise ConnectionError(msg)
+    return w3
+
+
+def cached_client() -> Web3:
+    """Return new web3 connection registered for `reset_clients`."""
+    w3 = connect(W3_URL)
+    with CLIENTS_LOCK:
+        CLIENTS.append(w3)
+    return w3
 
 
 def w3_client():
     """Return cached web3 connection."""
     global W3_CLIENT
     if not W3_CLIENT:
-        W3_CLIENT = Web3(Web3.WebsocketProvider(W3_URL))
-        if W3_CLIENT.isConnected():
-            log.debug(f"Connected to {W3_URL}")
-        else:
-            msg = f"Connection failed to {W3_URL}."
-            log.error(msg)
-            raise ConnectionError(msg)
+        W3_CLIENT = cached_client()
     return W3_CLIENT
 
 
-def update(chain_obj: Chain):
+def worker_client():
+    """Return web3 connection of the current worker thread."""
+    if getattr(WORKER_CLIENTS, "w3", None) is None:
+        WORKER_CLIENTS.w3 = cached_client()
+    return WORKER_CLIENTS.w3
+
+
+def close_client(w3: Web3):
+    """Close the websocket of a web3 connection (HTTP sessions are shared by web3)"""
+    provider = w3.provider
+    if not (WEB3_INTERNALS and isinstance(provider, WebsocketProvider)):
+        return
+    conn = getattr(provider, "conn", None)
+    ws = getattr(conn, "ws", None)
+    if ws is None:
+        return
+    conn.ws = None
+    future = asyncio.run_coroutine_threadsafe(ws.close(), WebsocketProvider._loop)
+    try:
+        future.result(timeout=RECONNECT_INTERVAL)
+    except Exception as e:
+        log.debug(f"Closing {provider} failed: {e!r}")
+
+
+def reset_clients():
+    """Close and drop all cached web3 connections (reconnect on next use)"""
+    global W3_CLIENT, WORKER_CLIENTS
+    with CLIENTS_LOCK:
+        clients = CLIENTS[:]
+        CLIENTS.clear()
+    W3_CLIENT = None
+    WORKER_CLIENTS = threading.local()
+    for w3 in clients:
+        close_client(w3)
+
+
+block_requests = metrics.counter(
+    "isccr_observer_block_requests_total",
+    "Block timestamp lookups of the bloxberg observer by cache result",
+    ("result",),
+)
+
+
+def rpc_batch(w3: Web3, calls: List[Tuple[str, list]]) -> list:
+    """Send JSON-RPC calls as one batch request and return results in order"""
+    payload = [
+        {"jsonrpc": "2.0", "id": idx, "method": method, "params": params}
+        for idx, (method, params) in enumerate(calls)
+    ]
+    data = json.dumps(payload).encode("utf-8")
+    provider = w3.provider
+    batch_request = getattr(provider, "make_batch_request", None)
+    if batch_request is None:
+        batch_request = raw_batch_request(provider)
+    if batch_request is None or getattr(provider, "isccr_no_batch", False):
+        raise NotImplementedError(f"No batch requests with {provider!r}")
+    with instrument.rpc_seconds.time(chain="bloxberg", method=calls[0][0]):
+        responses = batch_request(data)
+    if not isinstance(responses, list):
+        # Nodes without batch support answer with a single error object
+        log.warning(f"Batch requests rejected by node ({responses}), sending single")
+        provider.isccr_no_batch = True
+        raise NotImplementedError(f"Batch request rejected: {responses}")
+    by_id = {response["id"]: response for response in responses}
+    results = []
+    for idx in range(len(calls)):
+        response = by_id[idx]
+        if response.get("error"):
+            raise ValueError(response["error"])
+        results.append(response["result"])
+    return results
+
 
-    last = (
-        IsccID.objects.filter(src_chain__id=CHAIN_ID_BLOXBERG)
-        .order_by("-src_chain_idx")
-        .first()
+def raw_batch_request(provider):
+    """Return function sending raw batch payloads with a web3 provider (or None)
+
+    Relies on web3 internals, only used with web3 5.x and checked before use.
+    """
+    if not WEB3_INTERNALS:
+        return None
+    if isinstance(provider, WebsocketProvider):
+        loop = getattr(WebsocketProvider, "_loop", None)
+        coro_make_request = getattr(provider, "coro_make_request", None)
+        if loop is None or coro_make_request is None:
+            return None
+        return lambda data: asyncio.run_coroutine_threadsafe(
+            coro_make_request(data), loop
+        ).result()
+    if isinstance(provider, HTTPProvider) and make_post_request is not None:
+        return lambda data: json.loads(
+            make_post_request(
+                provider.endpoint_uri, data, **provider.get_request_kwargs()
+            )
+        )
+    return None
+
+
+class BlockTimestamps:
+    """LRU cache of block number -> timestamp filled with batched block requests"""
+
+    def __init__(self, maxsize=BLOCK_CACHE_SIZE, batch_size=BLOCK_BATCH_SIZE):
+        self.cache = LRUCache(maxsize, ttl=float("inf"))
+        self.batch_size = batch_size
+
+    def get_many(self, w3: Web3, numbers: Iterable[int]) -> Dict[int, int]:
+        """Timestamps of blocks with at most one request per uncached block"""
+        result, missing = {}, []
+        for number in sorted(set(numbers)):
+            timestamp = self.cache.get(number)
+            if timestamp is MISSING:
+                missing.append(number)
+            else:
+                result[number] = timestamp
+        block_requests.inc(len(result), result="hit")
+        block_requests.inc(len(missing), result="miss")
+        for chunk in chunked(missing, self.batch_size):
+            for number, timestamp in zip(chunk, self.fetch(w3, chunk)):
+                self.cache.set(number, timestamp)
+                result[number] = timestamp
+        return result
+
+    def fetch(self, w3: Web3, numbers: List[int]) -> List[int]:
+        try:
+            calls = [("eth_getBlockByNumber", [hex(n), False]) for n in numbers]
+            return [int(block["timestamp"], 16) for block in rpc_batch(w3, calls)]
+        except NotImplementedError:
+            return [w3.eth.getBlock(n)["timestamp"] for n in numbers]
+
+
+BLOCK_TIMESTAMPS = BlockTimestamps()
+
+
+def build_declaration(chain_obj: Chain, event, timestamp: int) -> dict:
+    """Build declaration from a decoded ISCC event log"""
+    iscc_code = "-".join([iscc.encode(co) for co in chunked(event.args.iscc, 9)])
+    return dict(
+        iscc_code=iscc_code,
+        actor=event.args.actor,
+        src_chain=chain_obj,
+        src_chain_idx=event.blockNumber,
+        src_block_hash=event.blockHash.hex(),
+        src_tx_hash=event.transactionHash.hex(),
+        src_time=datetime.fromtimestamp(timestamp, tz=pytz.utc),
     )
-    if last is None:
-        start_height = 0
-    else:
-        start_height = last.src_chain_idx + 1
 
-    w3 = w3_client()
-    co = w3.eth.contract(W3_CONTRACT, abi=W3_ABI)
-    event_filter = co.events.ISCC.createFilter(fromBlock=start_height)
-    log.info(f"Observing bloxberg: start_height={start_height}")
-    for event in event_filter.get_all_entries():
+
+class LogSubscription(threading.Thread):
+    """Wake the observer on new ISCC contract logs (`eth_subscribe` over websocket).
+
+    Reconnects after errors. While disconnected the observer polls at its tail
+    interval.
+    """
+
+    def __init__(self, url: str, wakeup: notify.Wakeup, reconnect=RECONNECT_INTERVAL):
+        super().__init__(daemon=True)
+        self.url = url
+        self.wakeup = wakeup
+        self.reconnect = reconnect
+
+    def run(self):
+        asyncio.run(self.listen_forever())
+
+    async def listen_forever(self):
+        while True:
+            try:
+                await self.listen()
+            except Exception as e:
+                log.warning(f"Log subscription failed: {e!r}")
+                instrument.reconnects.inc(chain="bloxberg", target="subscription")
+            self.wakeup.connected = False
+            await asyncio.sleep(self.reconnect)
+
+    async def listen(self):
+        async with websockets.connect(self.url) as ws:
+            params = ["logs", {"address": W3_CONTRACT}]
+            await ws.send(
+                json.dumps(
+                    dict(jsonrpc="2.0", id=1, method="eth_subscribe", params=params)
+                )
+            )
+            response = json.loads(await ws.recv())
+            if response.get("error"):
+                raise ValueError(response["error"])
+            log.info(f"Subscribed to ISCC logs at {self.url}")
+            self.wakeup.connected = True
+            # Catch up on logs missed while disconnected
+            self.wakeup.notify()
+            async for _ in ws:
+                self.wakeup.notify()
+
+
+Position = Tuple[int, int]  # (block number, log index) of the next event
+
+
+def next_position() -> Position:
+    """Next event position to process (from the persisted checkpoint)"""
+    checkpoint = Checkpoint.objects.filter(chain_id=CHAIN_ID_BLOXBERG).first()
+    return (0, 0) if checkpoint is None else checkpoint.position
+
+
+def fetch_logs(from_block: int, to_block: int) -> Tuple[list, float, int]:
+    """Fetch ISCC events of a block range with the connection of this thread.
+
+    Ranges rejected by the node (too many results) or timing out are split in
+    halves. Returns events, seconds and number of splits.
+    """
+    co = worker_client().eth.contract(W3_CONTRACT, abi=W3_ABI)
+    start = time.perf_counter()
+    try:
+        events = co.events.ISCC().getLogs(fromBlock=from_block, toBlock=to_block)
+        seconds = time.perf_counter() - start
+        instrument.rpc_seconds.observe(seconds, chain="bloxberg", method="eth_getLogs")
+        return list(events), seconds, 0
+    except (ValueError, asyncio.TimeoutError) as e:
+        if from_block == to_block:
+            raise
+        log.warning(f"Fetching logs of blocks {from_block}-{to_block} failed: {e!r}")
+    mid = (from_block + to_block) // 2
+    head, head_seconds, head_splits = fetch_logs(from_block, mid)
+    tail, tail_seconds, tail_splits = fetch_logs(mid + 1, to_block)
+    return head + tail, head_seconds + tail_seconds, head_splits + tail_splits + 1
+
+
+def scan(
+    from_block: int,
+    to_block: int,
+    batcher: AdaptiveBatcher,
+    pool: ThreadPoolExecutor,
+    in_flight: int,
+) -> Iterator[Tuple[int, int, list]]:
+    """Fetch block windows concurrently and yield (first, last, events) in order.
+
+    At most `in_flight` windows are fetched or waiting to be processed at a time.
+    """
+    pending = deque()
+    position = from_block
+    while pending or position <= to_block:
+        while position <= to_block and len(pending) < in_flight:
+            size = batcher.size
+            last = min(position + size - 1, to_block)
+            future = pool.submit(fetch_logs, position, last)
+            pending.append((position, last, size, future))
+            position = last + 1
+        first, last, size, future = pending.popleft()
+        events, seconds, splits = future.result()
+        if splits:
+            batcher.timeout()
+        elif last - first + 1 == size:
+            batcher.record("rpc", seconds, size)
+        yield first, last, events
+
+
+def processed_tx_hashes(chain_obj: Chain, tx_hashes: Iterable[str]) -> Set[str]:
+    """Subset of transaction hashes that are already ingested"""
+    found = set()
+    for chunk in chunked(tx_hashes, DEDUPE_BATCH_SIZE):
+        found.update(
+            IsccID.objects.filter(
+                src_chain=chain_obj, src_tx_hash__in=chunk
+            ).values_list("src_tx_hash", flat=True)
+        )
+    return found
+
+
+def process(chain_obj: Chain, events: list, position: Position) -> dict:
+    """Ingest ISCC events that have not been processed before.
+
+    The checkpoint is advanced to `position` in the same transaction.
+    """
+    seen = processed_tx_hashes(chain_obj, {e.transactionHash.hex() for e in events})
+    new_events = []
+    for event in events:
         txhash = event.transactionHash.hex()
-        if IsccID.objects.filter(src_tx_hash=txhash).exists():
+        if txhash in seen:
             log.warning(f"Already processed: {txhash}")
             continue
+        new_events.append(event)
+        seen.add(txhash)
+
+    blocks = [event.blockNumber for event in new_events]
+    timestamps = BLOCK_TIMESTAMPS.get_many(w3_client(), blocks)
+    declarations = [
+        build_declaration(chain_obj, event, timestamps[event.blockNumber])
+        for event in new_events
+    ]
+    height, log_index = position
+    checkpoint = Checkpoint(chain=chain_obj, height=height, log_index=log_index)
+    ingest_start = time.perf_counter()
+    stats = ingest(ISCC_ID_HEADER_BLOXBERG, declarations, checkpoint=checkpoint)
+    instrument.record_batch("bloxberg", stats, time.perf_counter() - ingest_start)
+    return stats
+
+
+def record_lag(last: int, to_block: int):
+    """Record blocks and seconds behind `to_block` after processing `last`"""
+    last_time = None
+    if last < to_block:
+        timestamp = BLOCK_TIMESTAMPS.get_many(w3_client(), [last])[last]
+        last_time = datetime.fromtimestamp(timestamp, tz=pytz.utc)
+    instrument.record_lag("bloxberg", to_block - last, last_time)
 
-        iscc_code = "-".join([iscc.encode(co) for co in chunked(event.args.iscc, 9)])
-        actor = event.args.actor
-        ts = w3.eth.getBlock(event.blockNumber)["timestamp"]
-        declaration = dict(
-            iscc_code=iscc_code,
-            actor=actor,
-            src_chain=chain_obj,
-            src_chain_idx=event.blockNumber,
-            src_block_hash=event.blockHash.hex(),
-            src_tx_hash=txhash,
-            src_time=datetime.fromtimestamp(ts, tz=pytz.utc),
-        )
-        counter = 0
-        while True:
-            iscc_id = build_iscc_id(ISCC_ID_HEADER_BLOXBERG, iscc_code, counter)
-            try:
-                iscc_id_obj = IsccID.objects.get(iscc_id=iscc_id)
-            except IsccID.DoesNotExist:
-                iscc_id_obj = IsccID.objects.create(iscc_id=iscc_id, **declaration)
-                log.debug(f"created {iscc_id_obj}")
-                break
-            # Update exsting ISCC-ID if from same actor for same ISCC-CODE
-            if iscc_id_obj.actor == actor and iscc_id_obj.iscc_code == iscc_code:
-                for key in declaration:
-                    setattr(iscc_id_obj, key, declaration[key])
-                iscc_id_obj.revision += 1
-                iscc_id_obj.save()
-                log.info(f"updated {iscc_id}")
-                break
-            counter += 1
+
+def update(
+    chain_obj: Chain,
+    batcher: AdaptiveBatcher,
+    position: Position,
+    pool: ThreadPoolExecutor,
+    in_flight: int = settings.OBSERVER_WORKERS,
+    to_block: int = None,
+) -> Position:
+    """Process ISCC events up to the latest block, return next position.
+
+    Block windows are fetched by the worker pool and committed strictly in block
+    order, so the returned position never skips unprocessed blocks. Events before
+    `position` in its first block are skipped. The checkpoint of a window with events
+    points right after its last log (blocks after it are scanned again on restart).
+    """
+    from_block = position[0]
+    if to_block is None:
+        with instrument.rpc_seconds.time(chain="bloxberg", method="eth_blockNumber"):
+            to_block = w3_client().eth.blockNumber
+    batcher.update_backlog(to_block - from_block + 1)
+    if from_block > to_block:
+        instrument.record_lag("bloxberg", 0)
+        return position
+    log.info(f"Observing bloxberg: blocks {from_block}-{to_block}")
+    for first, last, events in scan(from_block, to_block, batcher, pool, in_flight):
+        events = [e for e in events if (e.blockNumber, e.logIndex) >= position]
+        position = (last + 1, 0)
+        checkpoint = position
+        if events:
+            block, log_index = max((e.blockNumber, e.logIndex) for e in events)
+            checkpoint = (block, log_index + 1)
+        ingest_start = time.perf_counter()
+        stats = process(chain_obj, events, checkpoint)
+        n_blocks = last - first + 1
+        if n_blocks == batcher.size:
+            batcher.record("db", time.perf_counter() - ingest_start, n_blocks)
+        log.info(f"Ingested bloxberg blocks {first}-{last}: {stats}")
+        batcher.update_backlog(to_block - last)
+        record_lag(last, to_block)
+    return position
 
 
 def observe():
@@ -114,24 +455,41 @@ def observe():
     else:
         log.info(f"Using {repr(chain_obj)}")
 
+    if settings.OBSERVER_METRICS_PORT:
+        metrics.serve(settings.OBSERVER_METRICS_PORT)
+
+    batcher = AdaptiveBatcher(
+        "bloxberg", BLOCK_WINDOW, BLOCK_WINDOW_MIN, BLOCK_WINDOW_MAX
+    )
+    pool = ThreadPoolExecutor(settings.OBSERVER_WORKERS)
+    wakeup = notify.Wakeup("bloxberg")
+    if settings.OBSERVER_SUBSCRIBE and W3_URL.startswith("ws"):
+        LogSubscription(W3_URL, wakeup).start()
+    position = None
     while True:
         try:
-            update(chain_obj)
+            if position is None:
+                position = next_position()
+            position = update(chain_obj, batcher, position, pool)
         except (InterfaceError, OperationalError) as e:
             log.warning(repr(e))
             log.info("Trying to gracefully reconnect to DB")
+            instrument.reconnects.inc(chain="bloxberg", target="db")
+            position = None
             try:
                 connection.connect()
                 log.info("Reconnection success")
             except Exception as e:
                 log.warning("Reconnection failed")
                 time.sleep(10)
-        except Exception:
-            # Reset websocket client
-            global W3_CLIENT
-            W3_CLIENT = None
+        except Exception as e:
+            log.warning(f"Observing bloxberg failed: {e!r}")
+            instrument.reconnects.inc(chain="bloxberg", target="node")
+            # Close clients of the main thread and workers (reconnect on next use)
+            reset_clients()
+            position = None
             time.sleep(10)
-        time.sleep(5)
+        wakeup.pause(batcher.poll_interval)
 
 
 if __name__ == "__main__":
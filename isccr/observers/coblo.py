@@ -1,34 +1,78 @@
 # -*- coding: utf-8 -*-
 from isccr import standalone
 from django.conf import settings
+import json
+import queue
 import sys
+import threading
 import time
+from decimal import Decimal
+from typing import Optional
 from loguru import logger as log
 from datetime import datetime
 import pytz
+import requests
 from django.db import InterfaceError, OperationalError, connection
 from mcrpc.exceptions import RpcError
-from isccr.core.models import Chain, IsccID
-from isccr.utils import build_iscc_id
+from isccr.core.models import Chain, Checkpoint
+from isccr import metrics
+from isccr.observers.adaptive import AdaptiveBatcher
+from isccr.observers.ingest import ingest
+from isccr.observers import instrument, notify
 import mcrpc
 
 
 CHAIN_ID_COBLO = 1
 ISCC_ID_HEADER_COBLO = 0b0100_0001 .to_bytes(1, "big", signed=False)
+BATCH_SIZE = 1000
+BATCH_SIZE_MIN = 100
+BATCH_SIZE_MAX = 10000
+RPC_TIMEOUT = 30
+PREFETCH_WINDOWS = 2
+RPC_CLIENT = None
 
 
-class LazyStream:
-    """A 'paginatable' wrapper for MultiChain Streams"""
+class SessionRpcClient(mcrpc.RpcClient):
+    """MultiChain RPC client reusing a keep-alive HTTP connection"""
 
-    def __init__(self, name, descending=False):
-        self.name = name
-        self.descending = descending
-        self.api = mcrpc.RpcClient(
+    def __init__(self, *args, timeout=RPC_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def _call(self, method, *args):
+        args = [arg for arg in args if arg is not None]
+        payload = json.dumps({"method": method, "params": args})
+        with instrument.rpc_seconds.time(chain="coblo", method=method):
+            response = self.session.post(
+                self._url, data=payload, verify=False, timeout=self.timeout
+            )
+        data = response.json(parse_float=Decimal)
+        if data["error"] is not None:
+            raise RpcError(data["error"].get("message"))
+        return data["result"]
+
+
+def rpc_client():
+    """Return cached MultiChain RPC client."""
+    global RPC_CLIENT
+    if RPC_CLIENT is None:
+        RPC_CLIENT = SessionRpcClient(
             settings.CHAIN_COBLO_HOST,
             settings.CHAIN_COBLO_PORT,
             settings.CHAIN_COBLO_USER,
             settings.CHAIN_COBLO_PWD,
         )
+    return RPC_CLIENT
+
+
+class LazyStream:
+    """A 'paginatable' wrapper for MultiChain Streams"""
+
+    def __init__(self, name, descending=False, api=None):
+        self.name = name
+        self.descending = descending
+        self.api = api or rpc_client()
 
     def __len__(self):
         try:
@@ -101,71 +145,174 @@ class LazyStream:
             return result
 
 
-def update(chain_obj: Chain, batch_size: int = 1000):
-    """Process next 'batch_size' ISCC declerations"""
-    iscc_stream = LazyStream("iscc")
-    last = (
-        IsccID.objects.filter(src_chain__id=CHAIN_ID_COBLO)
-        .order_by("-src_chain_idx")
-        .first()
+class Prefetcher(threading.Thread):
+    """Prefetch stream windows into a bounded queue (polls only when caught up)
+
+    With a `wakeup` the pause between polls ends as soon as the node notifies.
+    """
+
+    def __init__(
+        self,
+        stream: LazyStream,
+        start: int,
+        batcher: AdaptiveBatcher,
+        maxsize: int = PREFETCH_WINDOWS,
+        wakeup: Optional[notify.Wakeup] = None,
+    ):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.position = start
+        self.batcher = batcher
+        self.queue = queue.Queue(maxsize)
+        self.stopped = threading.Event()
+        self.wakeup = wakeup
+        self.tip = start  # Stream length at the last measurement
+
+    def run(self):
+        while not self.stopped.is_set():
+            start, size = self.position, self.batcher.size
+            fetch_start = time.perf_counter()
+            try:
+                entries = self.stream[start : start + size]
+            except requests.Timeout as e:
+                log.warning(f"Fetching {size} coblo items timed out: {e!r}")
+                self.batcher.timeout()
+                continue
+            except requests.RequestException as e:
+                log.warning(f"Fetching coblo items failed: {e!r}")
+                instrument.reconnects.inc(chain="coblo", target="node")
+                self.stopped.wait(self.batcher.tail_interval)
+                continue
+            except Exception as e:
+                self.put((start, e))
+                return
+            if len(entries) == size:
+                self.batcher.record("rpc", time.perf_counter() - fetch_start, size)
+                self.tip = len(self.stream)
+                backlog = self.tip - (start + size)
+            else:
+                self.tip = start + len(entries)
+                backlog = 0
+            self.batcher.update_backlog(backlog)
+            if entries:
+                self.put((start, entries))
+                self.position = start + len(entries)
+                self.pause(self.batcher.poll_interval)
+            else:
+                self.pause(self.batcher.tail_interval)
+
+    def pause(self, interval: float):
+        if self.wakeup is None:
+            self.stopped.wait(interval)
+        else:
+            self.wakeup.pause(interval)
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self):
+        """Return next (start_height, entries) window"""
+        start, entries = self.queue.get()
+        if isinstance(entries, Exception):
+            raise entries
+        return start, entries
+
+    def stop(self):
+        self.stopped.set()
+        if self.wakeup is not None:
+            self.wakeup.event.set()
+
+
+def next_height() -> int:
+    """Next stream index to process (from the persisted checkpoint)"""
+    checkpoint = Checkpoint.objects.filter(chain_id=CHAIN_ID_COBLO).first()
+    return 0 if checkpoint is None else checkpoint.height
+
+
+def build_declaration(chain_obj: Chain, entry: dict, idx: int) -> dict:
+    """Build declaration from a verbose `iscc` stream item"""
+    iscc_code = "-".join(entry["keys"])
+    actor = entry["publishers"][0]
+    declaration = dict(
+        iscc_code=iscc_code,
+        actor=actor,
+        src_chain=chain_obj,
+        src_chain_idx=idx,
+        src_block_hash=entry["blockhash"],
+        src_tx_hash=entry["txid"],
+        src_tx_out_idx=entry["vout"],
+        src_time=datetime.fromtimestamp(entry["time"], tz=pytz.utc),
     )
-    if last is None:
-        start_height = 0
-    else:
-        start_height = last.src_chain_idx + 1
-    log.info(f"Updateing coblo: start_height={start_height}, batch_size={batch_size}")
 
-    for lidx, entry in enumerate(iscc_stream[start_height : start_height + batch_size]):
+    data = entry["data"].get("json")
+    if data:
+        if data.get("tophash"):
+            declaration["iscc_tophash"] = data["tophash"]
+        if data.get("title"):
+            declaration["iscc_seed_title"] = data["title"]
+        if data.get("extra"):
+            declaration["iscc_seed_extra"] = data["extra"]
+        if data.get("meta"):
+            declaration["iscc_mutable_metadata"] = data["meta"]
+    return declaration
+
+
+def process(chain_obj: Chain, start_height: int, entries: list) -> dict:
+    """Ingest a window of stream items starting at `start_height`"""
+    declarations = []
+    for lidx, entry in enumerate(entries):
         log.debug(entry)
-        iscc_code = "-".join(entry["keys"])
-        actor = entry["publishers"][0]
-        declaration = dict(
-            iscc_code=iscc_code,
-            actor=actor,
-            src_chain=chain_obj,
-            src_chain_idx=start_height + lidx,
-            src_block_hash=entry["blockhash"],
-            src_tx_hash=entry["txid"],
-            src_tx_out_idx=entry["vout"],
-            src_time=datetime.fromtimestamp(entry["time"], tz=pytz.utc),
-        )
+        declarations.append(build_declaration(chain_obj, entry, start_height + lidx))
+    checkpoint = Checkpoint(chain=chain_obj, height=start_height + len(entries))
+    ingest_start = time.perf_counter()
+    stats = ingest(ISCC_ID_HEADER_COBLO, declarations, checkpoint=checkpoint)
+    instrument.record_batch("coblo", stats, time.perf_counter() - ingest_start)
+    log.info(f"Ingested coblo: start_height={start_height} {stats}")
+    return stats
 
-        data = entry["data"].get("json")
-        if data:
-            if data.get("tophash"):
-                declaration["iscc_tophash"] = data["tophash"]
-            if data.get("title"):
-                declaration["iscc_seed_title"] = data["title"]
-            if data.get("extra"):
-                declaration["iscc_seed_extra"] = data["extra"]
-            if data.get("meta"):
-                declaration["iscc_mutable_metadata"] = data["meta"]
 
-        counter = 0
-        while True:
+def update(chain_obj: Chain, batch_size: int = BATCH_SIZE, stream=None):
+    """Process next 'batch_size' ISCC declerations"""
+    iscc_stream = stream if stream is not None else LazyStream("iscc")
+    start_height = next_height()
+    log.info(f"Updateing coblo: start_height={start_height}, batch_size={batch_size}")
+    entries = iscc_stream[start_height : start_height + batch_size]
+    return process(chain_obj, start_height, entries)
 
-            try:
-                iscc_id = build_iscc_id(ISCC_ID_HEADER_COBLO, iscc_code, counter)
-            except Exception:
-                log.error(f"faild to build short-id for {iscc_code}")
-                break
 
-            try:
-                iscc_id_obj = IsccID.objects.get(iscc_id=iscc_id)
-            except IsccID.DoesNotExist:
-                iscc_id_obj = IsccID.objects.create(iscc_id=iscc_id, **declaration)
-                log.debug(f"created {iscc_id_obj}")
-                break
-
-            # Update exsting ISCC-ID if from same actor for same ISCC-CODE
-            if iscc_id_obj.actor == actor and iscc_id_obj.iscc_code == iscc_code:
-                for key in declaration:
-                    setattr(iscc_id_obj, key, declaration[key])
-                iscc_id_obj.revision += 1
-                iscc_id_obj.save()
-                log.info(f"updated {iscc_id}")
-                break
-            counter += 1
+def follow(
+    chain_obj: Chain,
+    batcher: AdaptiveBatcher,
+    stream=None,
+    stop_height: Optional[int] = None,
+    wakeup: Optional[notify.Wakeup] = None,
+):
+    """Process declarations while the next windows are prefetched"""
+    start_height = next_height()
+    log.info(f"Following coblo: start_height={start_height}, batch_size={batcher.size}")
+    if stream is None:
+        stream = LazyStream("iscc")
+    prefetcher = Prefetcher(stream, start_height, batcher, wakeup=wakeup)
+    prefetcher.start()
+    try:
+        while stop_height is None or start_height < stop_height:
+            start_height, entries = prefetcher.get()
+            process_start = time.perf_counter()
+            process(chain_obj, start_height, entries)
+            if len(entries) >= batcher.minimum:
+                seconds = time.perf_counter() - process_start
+                batcher.record("db", seconds, len(entries))
+            start_height += len(entries)
+            if entries:
+                last_time = datetime.fromtimestamp(entries[-1]["time"], tz=pytz.utc)
+                instrument.record_lag("coblo", prefetcher.tip - start_height, last_time)
+    finally:
+        prefetcher.stop()
 
 
 def observe():
@@ -181,13 +328,25 @@ def observe():
         log.info(f"Created {repr(chain_obj)} in DB.")
     else:
         log.info(f"Using {repr(chain_obj)}")
+    if settings.OBSERVER_METRICS_PORT:
+        metrics.serve(settings.OBSERVER_METRICS_PORT)
 
+    batcher = AdaptiveBatcher("coblo", BATCH_SIZE, BATCH_SIZE_MIN, BATCH_SIZE_MAX)
+    wakeup = None
+    if settings.OBSERVER_NOTIFY_PORT:
+        wakeup = notify.Wakeup("coblo")
+        notify.serve(settings.OBSERVER_NOTIFY_PORT, wakeup)
+        log.info(
+            f"Listening for notify hook on {settings.OBSERVER_NOTIFY_HOST}:"
+            f"{settings.OBSERVER_NOTIFY_PORT}"
+        )
     while True:
         try:
-            update(chain_obj)
+            follow(chain_obj, batcher, wakeup=wakeup)
         except (InterfaceError, OperationalError) as e:
             log.warning(repr(e))
             log.info("Trying to gracefully reconnect to DB")
+            instrument.reconnects.inc(chain="coblo", target="db")
             try:
                 connection.connect()
                 log.info("Reconnection success")
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Shared bulk ingestion of decoded ISCC declarations."""
+from typing import List, Optional
+from django.db import transaction
+from django.utils import timezone
+from loguru import logger as log
+from isccr.core import cache
+from isccr.core.models import Checkpoint, IsccID
+from isccr.utils import build_iscc_id_body, encode_iscc_id
+
+
+BULK_BATCH_SIZE = 500
+
+
+def ingest(
+    header: bytes, declarations: List[dict], checkpoint: Optional[Checkpoint] = None
+) -> dict:
+    """Mint or update ISCC-IDs for a batch of declarations in one transaction.
+
+    Declarations are resolved in order with the same semantics as processing them
+    one by one: an existing ISCC-ID from the same actor for the same ISCC-CODE is
+    updated (revision bump), otherwise the counter is incremented until a free
+    ISCC-ID is found. All ISCC-IDs sharing an ISCC-ID body with the batch are
+    fetched with a single query, so counters and collisions (including those with
+    declarations earlier in the same batch) are resolved in memory. New rows are
+    written with a bulk insert and updated rows with a bulk update. The observer
+    `checkpoint` (if given) is saved in the same transaction if it advanced.
+    """
+    stats = dict(created=0, updated=0, failed=0, retries=0)
+    candidates = []
+    for declaration in declarations:
+        try:
+            body = build_iscc_id_body(header, declaration["iscc_code"])
+        except Exception:
+            log.error(f"faild to build short-id for {declaration['iscc_code']}")
+            stats["failed"] += 1
+            continue
+        candidates.append((body, declaration))
+
+    # All ISCC-IDs sharing a body with the batch: ISCC-ID -> IsccID instance
+    bodies = {body.hex() for body, _ in candidates}
+    known = {obj.iscc_id: obj for obj in IsccID.objects.filter(iscc_id_body__in=bodies)}
+
+    created, updated = {}, {}
+    update_fields = {"revision", "modified"}
+    for body, declaration in candidates:
+        iscc_code, actor = declaration["iscc_code"], declaration["actor"]
+        counter = 0
+        while True:
+            try:
+                iscc_id = encode_iscc_id(body, counter)
+            except Exception:
+                log.error(f"faild to build short-id for {iscc_code}")
+                stats["failed"] += 1
+                break
+
+            iscc_id_obj = known.get(iscc_id)
+            if iscc_id_obj is None:
+                iscc_id_obj = IsccID(
+                    iscc_id=iscc_id, iscc_id_body=body.hex(), **declaration
+                )
+                known[iscc_id] = created[iscc_id] = iscc_id_obj
+                log.debug(f"created {iscc_id_obj}")
+                break
+
+            # Update exsting ISCC-ID if from same actor for same ISCC-CODE
+            if iscc_id_obj.actor == actor and iscc_id_obj.iscc_code == iscc_code:
+                for key in declaration:
+                    setattr(iscc_id_obj, key, declaration[key])
+                iscc_id_obj.revision += 1
+                if iscc_id not in created:
+                    updated[iscc_id] = iscc_id_obj
+                    update_fields.update(declaration)
+                log.info(f"updated {iscc_id}")
+                break
+            counter += 1
+            stats["retries"] += 1
+
+    now = timezone.now()
+    for iscc_id_obj in updated.values():
+        iscc_id_obj.modified = now
+
+    with transaction.atomic():
+        IsccID.objects.bulk_create(created.values(), batch_size=BULK_BATCH_SIZE)
+        IsccID.objects.bulk_update(
+            updated.values(), sorted(update_fields), batch_size=BULK_BATCH_SIZE
+        )
+        if checkpoint is not None:
+            save_checkpoint(checkpoint)
+        changed = list(created.values()) + list(updated.values())
+        transaction.on_commit(lambda: cache.invalidate(changed))
+
+    stats["created"] = len(created)
+    stats["updated"] = len(updated)
+    return stats
+
+
+def save_checkpoint(checkpoint: Checkpoint):
+    """Save checkpoint if its position changed (`modified` is the last advance)"""
+    persisted = (
+        Checkpoint.objects.filter(pk=checkpoint.pk)
+        .values_list("height", "log_index")
+        .first()
+    )
+    if persisted != checkpoint.position:
+        checkpoint.save()
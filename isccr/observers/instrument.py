@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Observer metrics: throughput, chain tip lag, RPC and DB latency, retries."""
+import time
+from datetime import datetime
+from typing import Optional
+from django.utils import timezone
+from isccr import metrics
+from isccr.core.models import Checkpoint
+
+
+ingested = metrics.counter(
+    "isccr_observer_ingested_total",
+    "Ingested declarations by result (created, updated, failed)",
+    ("chain", "result"),
+)
+throughput = metrics.gauge(
+    "isccr_observer_items_per_second",
+    "Declarations ingested per second over the last batch",
+    ("chain",),
+)
+retries = metrics.counter(
+    "isccr_observer_collision_retries_total",
+    "ISCC-ID counter increments to resolve collisions",
+    ("chain",),
+)
+lag_blocks = metrics.gauge(
+    "isccr_observer_lag_blocks",
+    "Blocks (bloxberg) or stream items (coblo) behind the chain tip",
+    ("chain",),
+)
+lag_seconds = metrics.gauge(
+    "isccr_observer_lag_seconds",
+    "Age of the last ingested block or item while behind the chain tip",
+    ("chain",),
+)
+rpc_seconds = metrics.histogram(
+    "isccr_observer_rpc_seconds", "Node RPC latency", ("chain", "method")
+)
+db_seconds = metrics.histogram(
+    "isccr_observer_db_seconds", "Database write latency per batch", ("chain",)
+)
+reconnects = metrics.counter(
+    "isccr_observer_reconnects_total",
+    "Reconnects by target (db, node, subscription)",
+    ("chain", "target"),
+)
+checkpoint_height = metrics.gauge(
+    "isccr_observer_checkpoint_height",
+    "Persisted observer checkpoint (next stream item or block)",
+    ("chain",),
+)
+checkpoint_age = metrics.gauge(
+    "isccr_observer_checkpoint_age_seconds",
+    "Seconds since the persisted observer checkpoint last advanced",
+    ("chain",),
+)
+
+_last_batch = {}  # chain -> perf_counter at end of the previous batch
+
+
+def record_batch(chain: str, stats: dict, seconds: float):
+    """Record ingest results and DB latency of a batch"""
+    db_seconds.observe(seconds, chain=chain)
+    for result in ("created", "updated", "failed"):
+        ingested.inc(stats.get(result, 0), chain=chain, result=result)
+    retries.inc(stats.get("retries", 0), chain=chain)
+    now = time.perf_counter()
+    previous = _last_batch.get(chain)
+    _last_batch[chain] = now
+    items = stats.get("created", 0) + stats.get("updated", 0)
+    if previous is not None and now > previous:
+        throughput.set(round(items / (now - previous), 1), chain=chain)
+
+
+def record_lag(chain: str, behind: int, last_time: Optional[datetime] = None):
+    """Record distance to the chain tip after a batch"""
+    lag_blocks.set(max(behind, 0), chain=chain)
+    if behind <= 0:
+        lag_seconds.set(0, chain=chain)
+    elif last_time is not None:
+        age = (timezone.now() - last_time).total_seconds()
+        lag_seconds.set(round(max(age, 0), 3), chain=chain)
+
+
+def record_checkpoints():
+    """Export persisted checkpoints of all observers (e.g. from the web app)"""
+    now = timezone.now()
+    for checkpoint in Checkpoint.objects.select_related("chain"):
+        chain = checkpoint.chain.slug
+        checkpoint_height.set(checkpoint.height, chain=chain)
+        age = (now - checkpoint.modified).total_seconds()
+        checkpoint_age.set(round(age, 3), chain=chain)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Push notifications that wake tail mode observers on new declarations.
+
+Sources (a MultiChain `blocknotify`/`walletnotifynew` hook calling the notify
+listener, a websocket log subscription) call `Wakeup.notify`. While a source is
+connected, observers only poll every `OBSERVER_POLL_FALLBACK` seconds in case a
+notification gets lost. Hook requests count as connected for
+`OBSERVER_NOTIFY_TIMEOUT` seconds, so observers resume regular polling if the hook
+stops calling.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from isccr import metrics
+
+
+notifications = metrics.counter(
+    "isccr_observer_notifications_total", "Push notifications received", ("chain",)
+)
+
+
+class Wakeup:
+    """Wakes an observer pausing between polls"""
+
+    def __init__(self, chain: str, fallback: float = None, timeout: float = None):
+        self.chain = chain
+        self.fallback = (
+            settings.OBSERVER_POLL_FALLBACK if fallback is None else fallback
+        )
+        self.timeout = settings.OBSERVER_NOTIFY_TIMEOUT if timeout is None else timeout
+        self.connected = False
+        self.expires = None  # Connected until (monotonic) without heartbeat
+        self.event = threading.Event()
+
+    def notify(self):
+        notifications.inc(chain=self.chain)
+        self.event.set()
+
+    def heartbeat(self):
+        """Mark source as connected until `timeout` seconds without heartbeat"""
+        self.expires = time.monotonic() + self.timeout
+        self.connected = True
+
+    def check_connected(self) -> bool:
+        if self.expires is not None and time.monotonic() > self.expires:
+            self.connected = False
+            self.expires = None
+        return self.connected
+
+    def pause(self, interval: float) -> bool:
+        """Wait up to `interval` seconds (fallback interval while connected).
+
+        Returns True if woken by a notification.
+        """
+        if interval <= 0:
+            return False
+        if self.check_connected():
+            interval = max(interval, self.fallback)
+        woken = self.event.wait(interval)
+        self.event.clear()
+        return woken
+
+
+class NotifyHandler(BaseHTTPRequestHandler):
+    """Any GET or POST request wakes the observer (e.g. `curl host:port/%s`)"""
+
+    def do_GET(self):
+        self.server.wakeup.heartbeat()
+        self.server.wakeup.notify()
+        self.send_response(204)
+        self.end_headers()
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, wakeup: Wakeup, host: str = None) -> ThreadingHTTPServer:
+    """Listen for notify hook requests from a background thread"""
+    host = settings.OBSERVER_NOTIFY_HOST if host is None else host
+    server = ThreadingHTTPServer((host, port), NotifyHandler)
+    server.daemon_threads = True
+    server.wakeup = wakeup
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Record/replay of chain node responses for measuring observers offline.
+
+`record_coblo` and `record_bloxberg` fetch stream items or ISCC logs (plus the
+headers of their blocks) from a live node into a JSON fixture (gzipped if the
+path ends with `.gz`). `ReplayRpcClient` and `ReplayProvider` stand in for the
+MultiChain RPC client and the Web3 provider in process and answer from a fake
+node, either loaded from a fixture or synthetic, with a latency per request.
+"""
+import gzip
+import json
+import time
+from decimal import Decimal
+from typing import Union
+import mcrpc
+from mcrpc.exceptions import RpcError
+from web3.providers.base import JSONBaseProvider
+from isccr.observers import instrument
+from isccr.observers.testing import FakeEthereumNode, FakeMultiChain, rpc_response
+
+
+BLOCK_FIELDS = ("number", "hash", "parentHash", "timestamp")
+
+
+def wire(obj, **kwargs):
+    """Serialize and parse `obj` like a network round trip"""
+    return json.loads(json.dumps(obj), **kwargs)
+
+
+class ReplayRpcClient(mcrpc.RpcClient):
+    """MultiChain RPC client answering from a FakeMultiChain in process"""
+
+    def __init__(self, node: FakeMultiChain, latency: float = 0.0):
+        super().__init__("replay", node.port, "user", "pwd")
+        self.node = node
+        self.latency = latency
+
+    def _call(self, method, *args):
+        args = [arg for arg in args if arg is not None]
+        request = dict(method=method, params=args, id=None)
+        with instrument.rpc_seconds.time(chain="coblo", method=method):
+            if self.latency:
+                time.sleep(self.latency)
+            data = wire(rpc_response(self.node, request), parse_float=Decimal)
+        if data["error"] is not None:
+            raise RpcError(data["error"].get("message"))
+        return data["result"]
+
+
+class ReplayProvider(JSONBaseProvider):
+    """Web3 provider answering from a FakeEthereumNode in process.
+
+    Supports batch requests (`make_batch_request`) like the HTTP and websocket
+    providers, the latency is paid once per request or batch.
+    """
+
+    def __init__(self, node: FakeEthereumNode, latency: float = 0.0):
+        super().__init__()
+        self.node = node
+        self.latency = latency
+
+    def make_request(self, method, params):
+        request = json.loads(self.encode_rpc_request(method, params))
+        if self.latency:
+            time.sleep(self.latency)
+        return wire(rpc_response(self.node, request))
+
+    def make_batch_request(self, data: bytes) -> list:
+        if self.latency:
+            time.sleep(self.latency)
+        return wire([rpc_response(self.node, r) for r in json.loads(data)])
+
+    def isConnected(self):
+        return True
+
+
+def record_coblo(api: mcrpc.RpcClient, start: int, count: int, window=1000) -> dict:
+    """Fetch `count` items of the iscc stream from position `start`"""
+    items = []
+    while len(items) < count:
+        n = min(window, count - len(items))
+        batch = api.liststreamitems(
+            "iscc", verbose=True, count=n, start=start + len(items)
+        )
+        if not batch:
+            break
+        items.extend(batch)
+    return dict(chain="coblo", start=start, items=items)
+
+
+def record_bloxberg(w3, contract: str, from_block: int, to_block: int, window=10000):
+    """Fetch ISCC logs of a block range and the headers of blocks with logs"""
+    from isccr.observers.bloxberg import BLOCK_BATCH_SIZE, rpc_batch
+
+    def call(method, params):
+        response = w3.provider.make_request(method, params)
+        if response.get("error"):
+            raise ValueError(response["error"])
+        return response["result"]
+
+    logs = []
+    for first in range(from_block, to_block + 1, window):
+        query = dict(
+            address=contract,
+            fromBlock=hex(first),
+            toBlock=hex(min(first + window - 1, to_block)),
+        )
+        logs.extend(call("eth_getLogs", [query]))
+    numbers = sorted({int(log["blockNumber"], 16) for log in logs} | {to_block})
+    blocks = []
+    for idx in range(0, len(numbers), BLOCK_BATCH_SIZE):
+        calls = [
+            ("eth_getBlockByNumber", [hex(n), False])
+            for n in numbers[idx : idx + BLOCK_BATCH_SIZE]
+        ]
+        for block in rpc_batch(w3, calls):
+            blocks.append({key: block[key] for key in BLOCK_FIELDS})
+    return dict(
+        chain="bloxberg",
+        contract=contract,
+        from_block=from_block,
+        to_block=to_block,
+        blocks=blocks,
+        logs=logs,
+    )
+
+
+def node_fixture(node: Union[FakeMultiChain, FakeEthereumNode]) -> dict:
+    """Fixture of a (synthetic) fake node"""
+    if isinstance(node, FakeMultiChain):
+        return dict(chain="coblo", start=0, items=node.items)
+    return dict(
+        chain="bloxberg",
+        contract=node.contract,
+        from_block=0,
+        to_block=node.height,
+        blocks=[{key: b[key] for key in BLOCK_FIELDS} for b in node.blocks.values()],
+        logs=node.logs,
+    )
+
+
+def load_node(fixture: dict) -> Union[FakeMultiChain, FakeEthereumNode]:
+    """Fake node serving a fixture (coblo stream items are served from 0)"""
+    if fixture["chain"] == "coblo":
+        node = FakeMultiChain()
+        node.items = fixture["items"]
+        return node
+    node = FakeEthereumNode(0, fixture["contract"])
+    for block in fixture["blocks"]:
+        node.blocks[int(block["number"], 16)] = dict(block, transactions=[])
+    node.block_numbers = sorted(node.blocks)
+    node.height = fixture["to_block"]
+    node.logs = sorted(
+        fixture["logs"],
+        key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)),
+    )
+    node.log_blocks = [int(log["blockNumber"], 16) for log in node.logs]
+    return node
+
+
+def save_fixture(fixture: dict, path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as outf:
+        json.dump(fixture, outf, default=float)
+
+
+def load_fixture(path: str) -> dict:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as inf:
+        return json.load(inf)
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in nodes for measuring observers without a blockchain."""
+import asyncio
+import bisect
+import json
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+import iscc
+from isccr.synthetic import EPOCH, random_actor, random_iscc_code
+
+
+BLOCK_TIME = 5  # Seconds between bloxberg blocks
+
+
+def fake_stream_item(rnd: random.Random, idx: int) -> dict:
+    """A random verbose `liststreamitems` entry of the iscc stream"""
+    return dict(
+        publishers=[random_actor(rnd)],
+        keys=random_iscc_code(rnd).split("-"),
+        offchain=False,
+        available=True,
+        data={
+            "json": {
+                "title": f"Title {idx}",
+                "tophash": rnd.getrandbits(256).to_bytes(32, "big").hex(),
+            }
+        },
+        confirmations=1,
+        blockhash=rnd.getrandbits(256).to_bytes(32, "big").hex(),
+        blockindex=idx % 10,
+        blocktime=int(EPOCH.timestamp()) + idx * 10,
+        txid=rnd.getrandbits(256).to_bytes(32, "big").hex(),
+        vout=0,
+        valid=True,
+        time=int(EPOCH.timestamp()) + idx * 10,
+        timereceived=int(EPOCH.timestamp()) + idx * 10,
+    )
+
+
+class FakeMultiChain(ThreadingHTTPServer):
+    """MultiChain JSON-RPC server serving a synthetic `iscc` stream.
+
+    Implements `liststreams` and `liststreamitems` with an optional per request
+    latency to simulate a remote node. If `notify_url` is set it is requested
+    after new items are published (like a `walletnotifynew` hook).
+    """
+
+    daemon_threads = True
+    null_error = True
+
+    def __init__(self, n_items=0, latency=0.0, host="127.0.0.1", port=0, seed=0):
+        super().__init__((host, port), JsonRpcHandler)
+        self.rnd = random.Random(seed)
+        self.items = []  # type: List[dict]
+        self.latency = latency
+        self.requests = 0
+        self.notify_url = None
+        self.append(n_items)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def append(self, n: int):
+        """Publish `n` new items to the stream"""
+        start = len(self.items)
+        self.items.extend(
+            fake_stream_item(self.rnd, i) for i in range(start, start + n)
+        )
+        if self.notify_url and n:
+            urllib.request.urlopen(self.notify_url, timeout=5).close()
+
+    def rpc(self, method, params):
+        self.requests += 1
+        if method == "liststreams":
+            return [dict(name="iscc", items=len(self.items))]
+        if method == "liststreamitems":
+            name, verbose, count, start = (list(params) + [None] * 4)[:4]
+            count = 10 if count is None else count
+            start = -count if start is None else start
+            if start < 0:
+                start = max(len(self.items) + start, 0)
+            return self.items[start : start + count]
+        raise ValueError(f"Method not found: {method}")
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+class FakeEthereumNode(ThreadingHTTPServer):
+    """Ethereum JSON-RPC node serving synthetic ISCC contract events.
+
+    Implements `eth_blockNumber`, `eth_getBlockByNumber` and `eth_getLogs` (for
+    HTTPProvider) and counts calls per method. Blocks may be sparse (replayed
+    fixtures only hold blocks with events), missing headers are derived from the
+    closest lower block. `max_logs` makes `eth_getLogs` fail
+    like public nodes do for ranges with too many results, `batch=False` rejects
+    batch requests with a single error object. `serve_websocket` adds
+    a websocket endpoint with `eth_subscribe` for new logs (open connections in
+    `ws_clients`). Requires web3.
+    """
+
+    daemon_threads = True
+    null_error = False
+
+    def __init__(
+        self,
+        n_blocks: int,
+        contract: str,
+        events_per_block: float = 0.5,
+        latency: float = 0.0,
+        max_logs: int = 0,
+        host="127.0.0.1",
+        port=0,
+        seed=0,
+        batch=True,
+    ):
+        from eth_abi import encode_abi
+        from eth_utils import event_signature_to_log_topic
+
+        super().__init__((host, port), JsonRpcHandler)
+        self.encode_abi = encode_abi
+        self.topic = (
+            "0x" + event_signature_to_log_topic("ISCC(address,bytes,bytes)").hex()
+        )
+        self.contract = contract
+        self.events_per_block = events_per_block
+        self.latency = latency
+        self.max_logs = max_logs
+        self.batch = batch
+        self.rnd = random.Random(seed)
+        self.blocks = {}  # type: Dict[int, dict]
+        self.block_numbers = []  # type: List[int]
+        self.height = -1
+        self.logs = []  # type: List[dict]
+        self.log_blocks = []  # type: List[int]
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.subscriptions = {}  # subscription id -> websocket
+        self.ws_clients = set()  # open websocket connections
+        self.ws_loop = None
+        self.ws_port = None
+        self.mine(n_blocks)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def ws_url(self):
+        return f"ws://127.0.0.1:{self.ws_port}"
+
+    def mine(self, n: int):
+        """Append `n` blocks with a random number of ISCC events each"""
+        rnd = self.rnd
+        for _ in range(n):
+            number = self.height + 1
+            block_hash = "0x" + rnd.getrandbits(256).to_bytes(32, "big").hex()
+            self.blocks[number] = dict(
+                number=hex(number),
+                hash=block_hash,
+                parentHash=self.blocks[number - 1]["hash"]
+                if number
+                else "0x" + "00" * 32,
+                timestamp=hex(int(EPOCH.timestamp()) + number * BLOCK_TIME),
+                transactions=[],
+            )
+            self.block_numbers.append(number)
+            self.height = number
+            n_events = int(self.events_per_block) + (
+                rnd.random() < self.events_per_block % 1
+            )
+            for idx in range(n_events):
+                self.logs.append(self.fake_log(number, block_hash, idx))
+                self.log_blocks.append(number)
+                self.publish(self.logs[-1])
+
+    def fake_log(self, number: int, block_hash: str, idx: int) -> dict:
+        rnd = self.rnd
+        code = random_iscc_code(rnd)
+        iscc_bytes = b"".join(iscc.decode(c) for c in code.split("-"))
+        tophash = rnd.getrandbits(256).to_bytes(32, "big")
+        actor = random_actor(rnd)
+        return dict(
+            address=self.contract,
+            topics=[self.topic, "0x" + "00" * 12 + actor[2:]],
+            data="0x"
+            + self.encode_abi(["bytes", "bytes"], [iscc_bytes, tophash]).hex(),
+            blockNumber=hex(number),
+            blockHash=block_hash,
+            transactionHash="0x" + rnd.getrandbits(256).to_bytes(32, "big").hex(),
+            transactionIndex=hex(idx),
+            logIndex=hex(idx),
+            removed=False,
+        )
+
+    def block_number(self, value) -> int:
+        if value in (None, "latest", "pending"):
+            return self.height
+        if value == "earliest":
+            return 0
+        return int(value, 16)
+
+    def block(self, number: int) -> Optional[dict]:
+        if number > self.height:
+            return None
+        if number in self.blocks:
+            return self.blocks[number]
+        idx = bisect.bisect_right(self.block_numbers, number) - 1
+        base = self.block_numbers[idx] if idx >= 0 else None
+        if base is None:
+            timestamp = int(EPOCH.timestamp()) + number * BLOCK_TIME
+        else:
+            timestamp = int(self.blocks[base]["timestamp"], 16)
+            timestamp += (number - base) * BLOCK_TIME
+        return dict(
+            number=hex(number),
+            hash="0x" + number.to_bytes(32, "big").hex(),
+            parentHash="0x" + max(number - 1, 0).to_bytes(32, "big").hex(),
+            timestamp=hex(timestamp),
+            transactions=[],
+        )
+
+    def rpc(self, method, params):
+        with self.lock:
+            self.calls[method] += 1
+        if method == "eth_blockNumber":
+            return hex(self.height)
+        if method == "eth_chainId":
+            return hex(8995)
+        if method == "web3_clientVersion":
+            return "FakeEthereumNode"
+        if method == "eth_getBlockByNumber":
+            return self.block(self.block_number(params[0]))
+        if method == "eth_getLogs":
+            query = params[0]
+            first = self.block_number(query.get("fromBlock", "earliest"))
+            last = self.block_number(query.get("toBlock", "latest"))
+            address = query.get("address", self.contract)
+            addresses = address if isinstance(address, list) else [address]
+            if self.contract.lower() not in {a.lower() for a in addresses}:
+                return []
+            lo = bisect.bisect_left(self.log_blocks, first)
+            hi = bisect.bisect_right(self.log_blocks, last)
+            logs = self.logs[lo:hi]
+            if self.max_logs and len(logs) > self.max_logs:
+                raise ValueError(
+                    f"query returned more than {self.max_logs} results", -32005
+                )
+            return logs
+        raise ValueError(f"the method {method} does not exist/is not available")
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def serve_websocket(self):
+        """Start websocket JSON-RPC endpoint (`ws_url`) in a background thread"""
+        import websockets
+
+        ready = threading.Event()
+
+        def run():
+            self.ws_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.ws_loop)
+            server = self.ws_loop.run_until_complete(
+                websockets.serve(self.ws_handler, "127.0.0.1", 0)
+            )
+            self.ws_port = server.sockets[0].getsockname()[1]
+            ready.set()
+            self.ws_loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self
+
+    async def ws_handler(self, websocket, path=None):
+        self.ws_clients.add(websocket)
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                if request["method"] == "eth_subscribe":
+                    sub_id = hex(len(self.subscriptions) + 1)
+                    self.subscriptions[sub_id] = websocket
+                    response = dict(jsonrpc="2.0", result=sub_id, id=request.get("id"))
+                else:
+                    response = rpc_response(self, request)
+                await websocket.send(json.dumps(response))
+        finally:
+            self.ws_clients.discard(websocket)
+
+    def publish(self, log: dict):
+        """Send a new log to all `eth_subscribe` subscribers"""
+        for sub_id, websocket in list(self.subscriptions.items()):
+            message = dict(
+                jsonrpc="2.0",
+                method="eth_subscription",
+                params=dict(subscription=sub_id, result=log),
+            )
+            asyncio.run_coroutine_threadsafe(
+                websocket.send(json.dumps(message)), self.ws_loop
+            )
+
+
+def rpc_response(server, request: dict) -> dict:
+    """JSON-RPC response of `server.rpc` for a single request"""
+    try:
+        result = server.rpc(request["method"], request.get("params", []))
+        response = dict(jsonrpc="2.0", result=result, id=request.get("id"))
+        if server.null_error:
+            # Bitcoin style responses (MultiChain) always have an error member
+            response["error"] = None
+        return response
+    except ValueError as e:
+        code = e.args[1] if len(e.args) > 1 else -32601
+        error = dict(code=code, message=str(e.args[0]))
+        return dict(jsonrpc="2.0", error=error, id=request.get("id"))
+
+
+class JsonRpcHandler(BaseHTTPRequestHandler):
+    """Dispatches single and batch JSON-RPC requests to `server.rpc`"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.latency:
+            # Network round trip, paid once per HTTP request (also for batches)
+            time.sleep(self.server.latency)
+        if isinstance(payload, list) and not getattr(self.server, "batch", True):
+            error = dict(code=-32600, message="Batch requests are not supported")
+            body = dict(jsonrpc="2.0", error=error, id=None)
+        elif isinstance(payload, list):
+            body = [rpc_response(self.server, request) for request in payload]
+        else:
+            body = rpc_response(self.server, payload)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 import os
 import secrets
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -92,6 +93,7 @@ DATABASES = {
         "PASSWORD": os.getenv("DATABASE_PASSWORD", "postgres"),
         "HOST": os.getenv("DATABASE_HOST", "db"),
         "PORT": os.getenv("DATABASE_PORT", 5432),
+        "CONN_MAX_AGE": int(os.getenv("DATABASE_CONN_MAX_AGE", 0)),
     }
 }
 
@@ -139,3 +141,71 @@ CHAIN_COBLO_HOST = os.getenv("CHAIN_COBLO_HOST", "t2.coblo.net")
 CHAIN_COBLO_PORT = os.getenv("CHAIN_COBLO_PORT", "9718")
 CHAIN_COBLO_USER = os.getenv("CHAIN_COBLO_USER", "public")
 CHAIN_COBLO_PWD = os.getenv("CHAIN_COBLO_PWD", "public")
+CHAIN_BLOXBERG_URL = os.getenv("CHAIN_BLOXBERG_URL", "wss://websockets.bloxberg.org")
+
+# Max number of ISCC-IDs per batch resolve request
+RESOLVER_BATCH_MAX = int(os.getenv("RESOLVER_BATCH_MAX", 10000))
+# Batch resolve responses with more ISCC-IDs are streamed
+RESOLVER_BATCH_STREAM = int(os.getenv("RESOLVER_BATCH_STREAM", 1000))
+# Rows fetched per server-side cursor round trip of registry exports
+RESOLVER_EXPORT_CHUNK_SIZE = int(os.getenv("RESOLVER_EXPORT_CHUNK_SIZE", 5000))
+
+# Caches - a shared cache (e.g. memcached) for resolved records is optional
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+if os.getenv("SHARED_CACHE_BACKEND"):
+    CACHES["shared"] = {
+        "BACKEND": os.getenv("SHARED_CACHE_BACKEND"),
+        "LOCATION": os.getenv("SHARED_CACHE_LOCATION", ""),
+    }
+
+# Resolver cache: per worker LRU (size, TTL in seconds) and shared cache alias
+RESOLVER_CACHE_SIZE = int(os.getenv("RESOLVER_CACHE_SIZE", 10000))
+RESOLVER_CACHE_TTL = float(os.getenv("RESOLVER_CACHE_TTL", 60))
+RESOLVER_CACHE_SHARED = "shared" if "shared" in CACHES else None
+RESOLVER_CACHE_SHARED_TTL = float(os.getenv("RESOLVER_CACHE_SHARED_TTL", 3600))
+# Seconds between checks for invalidations published by observers
+RESOLVER_CACHE_EPOCH_INTERVAL = float(os.getenv("RESOLVER_CACHE_EPOCH_INTERVAL", 1))
+
+# Bloom filter of known ISCC-IDs to reject unknown ISCC-IDs without DB queries
+RESOLVER_BLOOM = os.getenv("RESOLVER_BLOOM", "1") == "1"
+RESOLVER_BLOOM_ERROR_RATE = float(os.getenv("RESOLVER_BLOOM_ERROR_RATE", 0.001))
+RESOLVER_BLOOM_MAX_BYTES = int(os.getenv("RESOLVER_BLOOM_MAX_BYTES", 64 * 1024 * 1024))
+# Seconds between additions of new ISCC-IDs and lookback for late commits
+RESOLVER_BLOOM_REFRESH_INTERVAL = float(os.getenv("RESOLVER_BLOOM_REFRESH_INTERVAL", 5))
+RESOLVER_BLOOM_REFRESH_OVERLAP = float(os.getenv("RESOLVER_BLOOM_REFRESH_OVERLAP", 300))
+
+# Serve index, resolver and lookup with async views (enabled by isccr.asgi)
+RESOLVER_ASYNC = os.getenv("RESOLVER_ASYNC", "0") == "1"
+
+# Browse changelists show planner row estimates, results estimated below this many
+# rows are counted exactly (PostgreSQL)
+RESOLVER_BROWSE_EXACT_COUNT = int(os.getenv("RESOLVER_BROWSE_EXACT_COUNT", 10000))
+
+# Observers: latency budget per batch (seconds) for adaptive batch sizing, poll
+# interval once caught up with the chain tip and port for Prometheus metrics
+OBSERVER_LATENCY_BUDGET = float(os.getenv("OBSERVER_LATENCY_BUDGET", 2))
+OBSERVER_TAIL_INTERVAL = float(os.getenv("OBSERVER_TAIL_INTERVAL", 1))
+OBSERVER_METRICS_PORT = int(os.getenv("OBSERVER_METRICS_PORT", 0))
+# Concurrent log window requests of the bloxberg observer while catching up
+OBSERVER_WORKERS = int(os.getenv("OBSERVER_WORKERS", 4))
+# Push notifications: address of the coblo notify hook listener (port 0 disables),
+# seconds after the last hook request until polling resumes, bloxberg log
+# subscription over websocket and poll interval while notifications arrive
+OBSERVER_NOTIFY_HOST = os.getenv("OBSERVER_NOTIFY_HOST", "127.0.0.1")
+OBSERVER_NOTIFY_PORT = int(os.getenv("OBSERVER_NOTIFY_PORT", 0))
+OBSERVER_NOTIFY_TIMEOUT = float(os.getenv("OBSERVER_NOTIFY_TIMEOUT", 300))
+OBSERVER_SUBSCRIBE = os.getenv("OBSERVER_SUBSCRIBE", "1") == "1"
+OBSERVER_POLL_FALLBACK = float(os.getenv("OBSERVER_POLL_FALLBACK", 30))
+
+# Opt-in request profiling: Server-Timing headers, log records for a sample of
+# requests and profiler dumps (cprofile or pyinstrument) of the slowest sampled
+RESOLVER_PROFILE = os.getenv("RESOLVER_PROFILE", "0") == "1"
+RESOLVER_PROFILE_LOG_RATE = float(os.getenv("RESOLVER_PROFILE_LOG_RATE", 0.01))
+RESOLVER_PROFILE_SAMPLE_RATE = float(os.getenv("RESOLVER_PROFILE_SAMPLE_RATE", 0))
+RESOLVER_PROFILER = os.getenv("RESOLVER_PROFILER", "cprofile")
+RESOLVER_PROFILE_DIR = os.getenv(
+    "RESOLVER_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "isccr-profiles")
+)
+RESOLVER_PROFILE_KEEP = int(os.getenv("RESOLVER_PROFILE_KEEP", 20))
+if RESOLVER_PROFILE:
+    MIDDLEWARE.insert(0, "isccr.core.profiling.ProfilingMiddleware")
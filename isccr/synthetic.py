@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Synthetic ISCC declarations for benchmarks and scale testing."""
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import iscc
+import numpy as np
+import pytz
+from django.utils import timezone
+from isccr.core.models import Chain, IsccID
+from isccr.utils import (
+    build_iscc_id_body,
+    build_iscc_ids,
+    encode_components,
+    encode_iscc_id,
+)
+
+
+# Component headers of typical ISCC-CODEs (Meta, Content, Data, Instance)
+CODE_LAYOUTS = [
+    (b"\x00", b"\x10", b"\x20", b"\x30"),  # text
+    (b"\x00", b"\x12", b"\x20", b"\x30"),  # image
+    (b"\x00", b"\x14", b"\x20", b"\x30"),  # audio
+    (b"\x00", b"\x16", b"\x20", b"\x30"),  # video
+    (b"\x11", b"\x20", b"\x30"),  # partial content, no meta
+    (b"\x20", b"\x30"),  # data only
+]
+
+EPOCH = datetime(2020, 9, 1, tzinfo=pytz.utc)
+
+# Observed chains as in isccr.observers: (id, slug, ISCC-ID header)
+REGISTRY_CHAINS = [(1, "coblo", b"\x41"), (2, "bloxberg", b"\x42")]
+
+# Number of popular ISCC-CODEs that get re-declared by other actors
+POPULAR_CODES = 10000
+
+TITLE_WORDS = (
+    "the a of and blue night city river song light house winter story red "
+    "paper garden music dream black white love road summer ocean letter"
+).split()
+
+
+def random_iscc_code(rnd: random.Random, layout=None) -> str:
+    """Create a random but well-formed ISCC-CODE"""
+    layout = layout or rnd.choice(CODE_LAYOUTS)
+    return "-".join(
+        iscc.encode(header + rnd.getrandbits(64).to_bytes(8, "big"))
+        for header in layout
+    )
+
+
+def random_actor(rnd: random.Random) -> str:
+    return "0x" + rnd.getrandbits(160).to_bytes(20, "big").hex()
+
+
+def synthetic_isccids(
+    n: int, chain: Chain, header: bytes, rnd: random.Random, start: int = 0
+) -> Iterator[IsccID]:
+    """Yield `n` unsaved IsccID instances with random declarations"""
+    for idx in range(start, start + n):
+        iscc_code = random_iscc_code(rnd)
+        body = build_iscc_id_body(header, iscc_code)
+        yield IsccID(
+            iscc_id=encode_iscc_id(body, 0),
+            iscc_id_body=body.hex(),
+            iscc_code=iscc_code,
+            actor=random_actor(rnd),
+            src_chain=chain,
+            src_chain_idx=idx,
+            src_block_hash=rnd.getrandbits(256).to_bytes(32, "big").hex(),
+            src_tx_hash=rnd.getrandbits(256).to_bytes(32, "big").hex(),
+            src_time=EPOCH + timedelta(seconds=idx * 10),
+        )
+
+
+class Zipf:
+    """Zipf distributed ranks in [0, n) (rank 0 is the most frequent)"""
+
+    def __init__(self, n: int, skew: float, rng: np.random.Generator):
+        weights = 1.0 / np.arange(1, n + 1) ** skew
+        self.cdf = np.cumsum(weights) / weights.sum()
+        self.rng = rng
+
+    def sample(self, size: int) -> np.ndarray:
+        ranks = np.searchsorted(self.cdf, self.rng.random(size), side="right")
+        return np.minimum(ranks, len(self.cdf) - 1)
+
+
+def row_body(iscc_id: str) -> str:
+    return iscc.decode(iscc_id)[:8].hex()
+
+
+def build_rows(chains, row_chains, codes, counters) -> List[str]:
+    """ISCC-IDs of rows (codes and counters) declared on chains (by chain index)"""
+    iscc_ids = [""] * len(codes)
+    for idx, (chain, header, _) in enumerate(chains):
+        rows = np.flatnonzero(row_chains == idx)
+        built = build_iscc_ids(header, [codes[r] for r in rows], counters[rows])
+        for row, iscc_id in zip(rows, built):
+            iscc_ids[row] = iscc_id
+    return iscc_ids
+
+
+def synthetic_registry(
+    n: int,
+    chains: Sequence[Tuple[Chain, bytes, float]],
+    seed: int = 0,
+    actors: int = 100000,
+    skew: float = 1.1,
+    duplicates: float = 0.05,
+    batch_size: int = 100000,
+    starts: Optional[Dict[int, int]] = None,
+    end: Optional[datetime] = None,
+    next_counters: Optional[Callable[[Set[str]], Dict[str, int]]] = None,
+) -> Iterator[List[dict]]:
+    """Yield batches of IsccID rows (attname -> value) of a realistic registry.
+
+    `chains` are (chain, ISCC-ID header, share of declarations). ISCC-CODEs are
+    random and well-formed, a share of `duplicates` re-declares a popular earlier
+    ISCC-CODE by another actor on the same chain, which increments the ISCC-ID
+    counter like ingest does. Actor activity and popularity of re-declared codes
+    are Zipf distributed. Declarations are spread from EPOCH to `end` (now) and
+    numbered per chain from `starts` (chain id -> first src_chain_idx).
+    `next_counters` returns the next free counter for ISCC-ID bodies (hex) that are
+    already registered, counters of generated ISCC-IDs continue from there.
+    """
+    rng = np.random.default_rng(seed)
+    rnd = random.Random(seed)
+    actor_hex = rng.bytes(20 * actors).hex()
+    actor_pool = ["0x" + actor_hex[i : i + 40] for i in range(0, actors * 40, 40)]
+    actor_ranks = Zipf(actors, skew, rng)
+    popular_ranks = Zipf(POPULAR_CODES, skew, rng)
+    popular = []  # [chain index, ISCC-CODE, next counter, actors]
+    weights = np.array([share for _, _, share in chains], dtype=float)
+    chain_idx = dict(starts or {})
+    offsets = {}  # type: Dict[str, int]
+    end = end or timezone.now()
+    span = (end - EPOCH).total_seconds()
+    now = timezone.now()
+
+    for offset in range(0, n, batch_size):
+        size = min(batch_size, n - offset)
+        row_chains = rng.choice(len(chains), size=size, p=weights / weights.sum())
+        row_actors = actor_ranks.sample(size)
+        row_popular = popular_ranks.sample(size)
+        redeclared = rng.random(size) < duplicates
+
+        # Fresh ISCC-CODEs, components encoded per layout and position
+        layouts = rng.integers(len(CODE_LAYOUTS), size=size)
+        digests = rng.integers(0, 2 ** 64, size=(size, 4), dtype=np.uint64)
+        codes = [""] * size
+        for layout_idx, layout in enumerate(CODE_LAYOUTS):
+            rows = np.flatnonzero(layouts == layout_idx)
+            columns = [
+                encode_components(header[0], digests[rows, pos])
+                for pos, header in enumerate(layout)
+            ]
+            for row, parts in zip(rows, zip(*columns)):
+                codes[row] = "-".join(parts)
+
+        counters = np.zeros(size, dtype=np.int64)
+        for row in range(size):
+            actor = actor_pool[row_actors[row]]
+            rank = row_popular[row]
+            if redeclared[row] and rank < len(popular):
+                entry = popular[rank]
+                # Single byte counters only (ingest fails on larger ones)
+                if actor not in entry[3] and entry[2] < 128:
+                    row_chains[row], codes[row], counters[row] = entry[:3]
+                    entry[2] += 1
+                    entry[3].add(actor)
+                    continue
+            if len(popular) < POPULAR_CODES:
+                popular.append([row_chains[row], codes[row], 1, {actor}])
+
+        zero = np.zeros(size, dtype=np.int64)
+        bodies = [row_body(i) for i in build_rows(chains, row_chains, codes, zero)]
+        while next_counters is not None:
+            new = set(bodies).difference(offsets)
+            if new:
+                offsets.update(dict.fromkeys(new, 0))
+                offsets.update(next_counters(new))
+            shifted = counters + [offsets[body] for body in bodies]
+            overflow = np.flatnonzero(shifted >= 128)
+            if not len(overflow):
+                counters = shifted
+                break
+            for row in overflow:
+                # Single byte counters only, declare a fresh ISCC-CODE instead
+                codes[row], counters[row] = random_iscc_code(rnd), 0
+                chain_header = chains[row_chains[row]][1]
+                bodies[row] = build_iscc_id_body(chain_header, codes[row]).hex()
+        iscc_ids = build_rows(chains, row_chains, codes, counters)
+
+        hashes = rng.bytes(96 * size).hex()
+        batch = []
+        for row in range(size):
+            chain = chains[row_chains[row]][0]
+            src_chain_idx = chain_idx.get(chain.id, 0)
+            chain_idx[chain.id] = src_chain_idx + 1
+            tophash, block_hash, tx_hash = (
+                hashes[(row * 3 + i) * 64 : (row * 3 + i + 1) * 64] for i in range(3)
+            )
+            utxo = chain.slug == "coblo"
+            batch.append(
+                dict(
+                    iscc_id=iscc_ids[row],
+                    iscc_id_body=bodies[row],
+                    iscc_code=codes[row],
+                    iscc_tophash=tophash,
+                    actor=actor_pool[row_actors[row]],
+                    iscc_seed_title=" ".join(rnd.choices(TITLE_WORDS, k=3)).title(),
+                    iscc_seed_extra="",
+                    iscc_mutable_metadata=None,
+                    src_chain_id=chain.id,
+                    src_chain_idx=src_chain_idx,
+                    src_block_hash=block_hash if utxo else "0x" + block_hash,
+                    src_tx_hash=tx_hash if utxo else "0x" + tx_hash,
+                    src_tx_out_idx=0 if utxo else None,
+                    src_time=EPOCH + timedelta(seconds=span * (offset + row) / n),
+                    revision=0,
+                    created=now,
+                    modified=now,
+                )
+            )
+        yield batch
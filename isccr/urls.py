@@ -13,19 +13,29 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.views.generic import TemplateView
 
-from isccr.core import views
+from isccr.core import async_views, views
 from isccr.core.admin import isccr_admin
 from django.urls import path
 
+if settings.RESOLVER_ASYNC:
+    index, resolve, lookup = async_views.index, async_views.resolve, async_views.lookup
+else:
+    index, resolve, lookup = views.index, views.resovle, views.lookup
+
 urlpatterns = [
     path(
         "robots.txt",
         TemplateView.as_view(template_name="robots.txt", content_type="text/plain"),
     ),
-    path("", views.index, name="index"),
-    path("<str:iscc_id>", views.resovle, name="resolver"),
-    path("lookup/<str:iscc_code>/<str:actor>", views.lookup, name="lookup"),
+    path("", index, name="index"),
+    path("resolve", views.resolve_batch, name="resolver-batch"),
+    path("lookup", views.lookup_batch, name="lookup-batch"),
+    path("metrics", views.metrics, name="metrics"),
+    path("export", views.export_registry, name="export"),
+    path("<str:iscc_id>", resolve, name="resolver"),
+    path("lookup/<str:iscc_code>/<str:actor>", lookup, name="lookup"),
     path("browse/", isccr_admin.urls),
 ]
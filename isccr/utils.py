@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-import textwrap
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Sequence, Tuple, Union
 import iscc
+import numpy as np
 import uvarint
 
 
@@ -20,14 +22,39 @@ ISCC_COMPONENT_CODES = {
     "CR",
 }
 
+ISCC_SYMBOLS = frozenset(iscc.SYMBOLS)
 
-def iscc_verify(i):
-    i = iscc_clean(i)
-    for c in i:
-        if c not in iscc.SYMBOLS:
-            raise ValueError('Illegal character "{}" in ISCC Code'.format(c))
-    for component_code in iscc_split(i):
+# Max number of parsed codes kept by iscc_parse
+PARSE_CACHE_SIZE = 4096
+
+# Lookup tables between ISCC symbols (as ASCII) and their values
+_C2V = np.full(256, 255, dtype=np.uint8)
+_C2V[np.frombuffer(iscc.SYMBOLS.encode("ascii"), dtype=np.uint8)] = np.arange(58)
+_V2C = np.frombuffer(iscc.SYMBOLS.encode("ascii"), dtype=np.uint8)
+
+
+class IsccCode(NamedTuple):
+    """A validated ISCC-CODE split into its components"""
+
+    code: str
+    components: Tuple[str, ...]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def iscc_parse(i) -> IsccCode:
+    """Clean, validate and split an ISCC-CODE (raises ValueError if invalid)"""
+    code = iscc_clean(i)
+    if not ISCC_SYMBOLS.issuperset(code):
+        c = next(c for c in code if c not in ISCC_SYMBOLS)
+        raise ValueError('Illegal character "{}" in ISCC Code'.format(c))
+    components = tuple(code[n : n + 13] for n in range(0, len(code), 13))
+    for component_code in components:
         iscc_verify_component(component_code)
+    return IsccCode(code, components)
+
+
+def iscc_verify(i):
+    iscc_parse(i)
     return True
 
 
@@ -51,17 +78,111 @@ def iscc_clean(i):
 
 
 def iscc_split(i):
-    return textwrap.wrap(iscc_clean(i), 13)
+    i = iscc_clean(i)
+    return [i[n : n + 13] for n in range(0, len(i), 13)]
 
 
 def iscc_decode(code) -> bytes:
     return b"".join(iscc.decode(c) for c in iscc_split(code))
 
 
-def build_iscc_id(ledger_id, iscc_code, counter: int):
-    """Create ISCC-ID from full ISCC for given ledger with a given counter"""
+def build_iscc_id_body(ledger_id, iscc_code) -> bytes:
+    """Create ISCC-ID body (ledger header + similarity hash) without counter"""
     components = iscc_split(iscc_code)
     # First 7 bytes (including header) of all but Instance-ID
     digests = [iscc.decode(c)[:7] for c in components if not c.startswith("CR")]
-    iscc_id_body = iscc.similarity_hash(digests)
-    return iscc.encode(ledger_id + iscc_id_body + uvarint.encode(counter))
+    return ledger_id + iscc.similarity_hash(digests)
+
+
+def encode_iscc_id(iscc_id_body: bytes, counter: int):
+    """Encode ISCC-ID from ISCC-ID body with a given counter"""
+    return iscc.encode(iscc_id_body + uvarint.encode(counter))
+
+
+def build_iscc_id(ledger_id, iscc_code, counter: int):
+    """Create ISCC-ID from full ISCC for given ledger with a given counter"""
+    return encode_iscc_id(build_iscc_id_body(ledger_id, iscc_code), counter)
+
+
+def decode_components(components: Sequence[str]) -> np.ndarray:
+    """Decode ISCC components into a (n, 2) uint64 matrix of header and body"""
+    if any(len(c) != 13 for c in components):
+        raise ValueError("Components must be 13 chars")
+    chars = np.frombuffer("".join(components).encode("ascii"), dtype=np.uint8)
+    values = _C2V[chars].reshape(-1, 13).astype(np.uint64)
+    if np.any(values == 255):
+        raise ValueError("Illegal character in ISCC Code")
+    decoded = np.zeros((len(components), 2), dtype=np.uint64)
+    decoded[:, 0] = values[:, 0] * 58 + values[:, 1]
+    # Horner scheme - wraps modulo 2**64 which is exact for valid 64-bit bodies
+    for col in range(2, 13):
+        decoded[:, 1] = decoded[:, 1] * np.uint64(58) + values[:, col]
+    if np.any(decoded[:, 0] > 255):
+        raise ValueError("Illegal component header in ISCC Code")
+    return decoded
+
+
+def encode_components(
+    headers: Union[int, Sequence[int]], bodies: np.ndarray
+) -> List[str]:
+    """Encode header bytes and uint64 bodies as ISCC components (see iscc.encode)"""
+    headers = np.asarray(headers, dtype=np.uint64)
+    value = np.array(bodies, dtype=np.uint64)
+    chars = np.empty((len(value), 13), dtype=np.uint8)
+    chars[:, 0] = _V2C[headers // np.uint64(58)]
+    chars[:, 1] = _V2C[headers % np.uint64(58)]
+    for col in range(12, 1, -1):
+        chars[:, col] = _V2C[value % np.uint64(58)]
+        value //= np.uint64(58)
+    flat = chars.tobytes().decode("ascii")
+    return [flat[i : i + 13] for i in range(0, len(value) * 13, 13)]
+
+
+def build_iscc_ids(
+    ledger_id, iscc_codes: Iterable[str], counters: Union[int, Sequence[int]]
+) -> List[str]:
+    """Create ISCC-IDs for many ISCC-CODEs at once (same result as build_iscc_id)"""
+    iscc_codes = list(iscc_codes)
+    n = len(iscc_codes)
+    if not n:
+        return []
+    counters = np.broadcast_to(np.asarray(counters, dtype=np.int64), (n,))
+    if counters.max() >= 128:
+        # Multi-byte counters are not encodable, let scalar function raise
+        return [
+            build_iscc_id(ledger_id, c, int(i)) for c, i in zip(iscc_codes, counters)
+        ]
+
+    # Similarity relevant components of all codes, grouped by code
+    components, sizes = [], np.zeros(n, dtype=np.int64)
+    for idx, code in enumerate(iscc_codes):
+        parts = [c for c in iscc_split(code) if not c.startswith("CR")]
+        if not parts:
+            raise ValueError(f"No similarity components in {code}")
+        components.extend(parts)
+        sizes[idx] = len(parts)
+
+    # First 7 bytes (including header) of each component digest as bits
+    decoded = decode_components(components)
+    digests = np.empty((len(components), 7), dtype=np.uint8)
+    digests[:, 0] = decoded[:, 0]
+    digests[:, 1:] = decoded[:, 1].astype(">u8").view(np.uint8).reshape(-1, 8)[:, :6]
+    bits = np.unpackbits(digests, axis=1)
+
+    # Per code bit majority vote (ties set the bit) - see iscc.similarity_hash
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    votes = np.add.reduceat(bits.astype(np.int64), offsets, axis=0)
+    shash = np.packbits(votes * 2 >= sizes[:, None], axis=1)
+
+    # ISCC-ID = ledger_id + 7 byte similarity hash + 1 byte uvarint counter
+    body = np.zeros((n, 8), dtype=np.uint8)
+    body[:, :7] = shash
+    body[:, 7] = counters
+    value = body.view(">u8").ravel().astype(np.uint64)
+    chars = np.empty((n, 11), dtype=np.uint8)
+    for col in range(10, -1, -1):
+        chars[:, col] = _V2C[value % np.uint64(58)]
+        value //= np.uint64(58)
+    prefix = iscc.encode(ledger_id)
+    flat = chars.tobytes().decode("ascii")
+    return [prefix + flat[i : i + 11] for i in range(0, n * 11, 11)]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from isccr import standalone
+import os
+import random
+import pytest
+from isccr.synthetic import random_iscc_code
+
+
+# Stored benchmark baselines (per Python version) and allowed regression of the
+# median against them in percent (medians vary by up to 80% between runs on shared
+# hardware, more than the 99% --benchmark-compare-fail accepts)
+BENCHMARK_STORAGE = os.path.join(os.path.dirname(__file__), "benchmarks")
+BENCHMARK_COMPARE_FAIL = ("median", 100)
+
+
+@pytest.fixture(scope="session")
+def iscc_codes():
+    """A reproducible mix of 1000 ISCC-CODEs in common notations"""
+    rnd = random.Random(42)
+    codes = []
+    for idx in range(1000):
+        code = random_iscc_code(rnd)
+        if idx % 3 == 1:
+            code = "ISCC:" + code.replace("-", "")
+        codes.append(code)
+    return codes
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Skip benchmarks unless requested, compare with stored baselines on request.
+
+    Run them with `--benchmark-only` (or ISCCR_BENCHMARK=1) and add
+    `--benchmark-compare` to fail on regressions against `tests/benchmarks`.
+    """
+    option = config.option
+    if not hasattr(option, "benchmark_skip"):
+        return
+    from pytest_benchmark.utils import PercentageRegressionCheck
+
+    if option.benchmark_storage == "file://./.benchmarks":
+        option.benchmark_storage = f"file://{BENCHMARK_STORAGE}"
+    requested = (
+        option.benchmark_only
+        or option.benchmark_compare
+        or option.benchmark_save
+        or os.getenv("ISCCR_BENCHMARK") == "1"
+    )
+    if not requested:
+        option.benchmark_skip = True
+    if option.benchmark_compare and not option.benchmark_compare_fail:
+        option.benchmark_compare_fail = [
+            PercentageRegressionCheck(*BENCHMARK_COMPARE_FAIL)
+        ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from isccr.observers.adaptive import CATCHUP, TAIL, AdaptiveBatcher, mode_gauge
+
+
+def test_batch_size_follows_latency_budget():
+    batcher = AdaptiveBatcher("test", 1000, 100, 10000, budget=2.0)
+    batcher.record("rpc", 0.1, 1000)
+    assert batcher.size == 2000
+    batcher.record("db", 4.0, 2000)
+    assert batcher.size == 1000
+    batcher.record("rpc", 0.2, 1000)
+    assert batcher.size == 1000
+    batcher.timeout()
+    assert batcher.size == 500
+    for _ in range(10):
+        batcher.timeout()
+    assert batcher.size == 100
+
+
+def test_mode_switches_on_backlog():
+    batcher = AdaptiveBatcher("test", 100, 10, 1000, tail_interval=0.5)
+    assert batcher.update_backlog(5000) == CATCHUP
+    assert batcher.poll_interval == 0
+    assert batcher.update_backlog(50) == TAIL
+    assert batcher.poll_interval == 0.5
+    assert mode_gauge.get(chain="test", mode=TAIL) == 1
+    assert mode_gauge.get(chain="test", mode=CATCHUP) == 0
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+from django.core.paginator import EmptyPage
+from isccr.core import admin
+from isccr.core.models import Chain, IsccID
+from isccr.synthetic import synthetic_isccids
+
+
+def test_estimated_count_paginator(monkeypatch):
+    items = list(range(100))
+    monkeypatch.setattr(admin, "estimate_count", lambda queryset: 50000)
+    paginator = admin.EstimatedCountPaginator(items, 20, exact_threshold=10000)
+    assert paginator.count == 50000
+    assert paginator.approximate
+    paginator = admin.EstimatedCountPaginator(
+        items, 20, exact=True, exact_threshold=10000
+    )
+    assert paginator.count == 100
+    assert not paginator.approximate
+    # Small results are counted exactly
+    monkeypatch.setattr(admin, "estimate_count", lambda queryset: 500)
+    paginator = admin.EstimatedCountPaginator(items, 20, exact_threshold=10000)
+    assert paginator.count == 100
+    assert not paginator.approximate
+
+
+def test_estimated_count_paginator_pages_beyond_estimate(monkeypatch):
+    items = list(range(100))
+    monkeypatch.setattr(admin, "estimate_count", lambda queryset: 50)
+    paginator = admin.EstimatedCountPaginator(items, 20, exact_threshold=10)
+    assert paginator.count == 50
+    assert paginator.approximate
+    # The planner underestimated, the last real page is counted exactly
+    page = paginator.page(5)
+    assert list(page.object_list) == items[80:]
+    assert paginator.count == 100 and paginator.num_pages == 5
+    assert not paginator.approximate
+    with pytest.raises(EmptyPage):
+        paginator.page(6)
+
+
+def test_changelist_page_beyond_estimate(client, db, settings, monkeypatch):
+    settings.RESOLVER_BROWSE_EXACT_COUNT = 1
+    chain = Chain.objects.create(id=1, slug="coblo")
+    IsccID.objects.bulk_create(synthetic_isccids(50, chain, b"\x41", random.Random(3)))
+    monkeypatch.setattr(admin, "estimate_count", lambda queryset: 21)
+    # Third page (0-based) of 20 rows per page, beyond the estimated 2 pages
+    response = client.get("/browse/core/isccid/", {"p": 2})
+    assert response.status_code == 200
+    assert len(response.context["cl"].result_list) == 10
+    assert response.context["cl"].result_count == 50
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import importlib
+import random
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+from django.urls import clear_url_caches, resolve
+import isccr.urls
+from isccr.core import async_views, views
+from isccr.core.models import Chain
+from isccr.core.profiling import ProfilingMiddleware
+from isccr.synthetic import synthetic_isccids
+
+
+@pytest.fixture
+def async_urls(settings):
+    settings.RESOLVER_ASYNC = True
+    settings.RESOLVER_BLOOM = False
+    importlib.reload(isccr.urls)
+    clear_url_caches()
+    yield
+    settings.RESOLVER_ASYNC = False
+    importlib.reload(isccr.urls)
+    clear_url_caches()
+
+
+def test_sync_views_by_default():
+    assert resolve("/MAAAAAAAAAAAAAAA").func is views.resovle
+    assert resolve("/lookup/a/b").func is views.lookup
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views(async_urls):
+    assert resolve("/").func is async_views.index
+    assert resolve("/MAAAAAAAAAAAAAAA").func is async_views.resolve
+    assert resolve("/lookup/a/b").func is async_views.lookup
+
+    chain = Chain.objects.create(id=1, slug="coblo")
+    obj = next(synthetic_isccids(1, chain, b"\x41", random.Random(1)))
+    obj.save()
+    client = AsyncClient()
+    get = async_to_sync(client.get)
+
+    assert get("/").status_code == 200
+    response = get(f"/{obj.iscc_id}.json")
+    assert response.status_code == 200
+    assert response.json()["iscc_code"] == obj.iscc_code
+    response = get(f"/{obj.iscc_id}")
+    assert response.status_code == 302
+    assert get("/MAAAAAAAAAAAAAAA.json").status_code == 404
+    response = get(f"/lookup/{obj.iscc_code}/{obj.actor}")
+    assert response.json() == {"iscc_id": obj.iscc_id}
+    assert get(f"/lookup/{obj.iscc_code}/0x00").status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_profiling_times_queries_in_worker_threads():
+    count = async_views.database_sync_to_async(Chain.objects.count)
+
+    def get_response(request):
+        return HttpResponse(str(async_to_sync(count)()))
+
+    response = ProfilingMiddleware(get_response)(RequestFactory().get("/"))
+    assert response.content == b"0"
+    assert 'desc="1 queries"' in response["Server-Timing"]
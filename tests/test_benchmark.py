@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import textwrap
+import iscc
+import pytest
+from isccr import utils
+from isccr.observers import coblo
+from isccr.observers.testing import FakeEthereumNode, FakeMultiChain
+
+
+HEADER = b"\x41"
+
+
+@pytest.mark.benchmark(group="build_iscc_id")
+def test_bench_build_iscc_id_scalar(benchmark, iscc_codes):
+    benchmark(lambda: [utils.build_iscc_id(HEADER, code, 0) for code in iscc_codes])
+
+
+@pytest.mark.benchmark(group="build_iscc_id")
+def test_bench_build_iscc_ids_batch(benchmark, iscc_codes):
+    benchmark(utils.build_iscc_ids, HEADER, iscc_codes, 0)
+
+
+def legacy_iscc_verify(i):
+    """iscc_verify before single-pass parsing (textwrap split, per char check)"""
+    i = utils.iscc_clean(i)
+    for c in i:
+        if c not in iscc.SYMBOLS:
+            raise ValueError('Illegal character "{}" in ISCC Code'.format(c))
+    for component_code in textwrap.wrap(utils.iscc_clean(i), 13):
+        utils.iscc_verify_component(component_code)
+    return True
+
+
+@pytest.mark.benchmark(group="iscc_verify")
+def test_bench_iscc_verify_legacy(benchmark, iscc_codes):
+    benchmark(lambda: [legacy_iscc_verify(code) for code in iscc_codes])
+
+
+@pytest.mark.benchmark(group="iscc_verify")
+def test_bench_iscc_verify_uncached(benchmark, iscc_codes):
+    parse = utils.iscc_parse.__wrapped__
+    benchmark(lambda: [parse(code) for code in iscc_codes])
+
+
+@pytest.mark.benchmark(group="iscc_verify")
+def test_bench_iscc_verify_cached(benchmark, iscc_codes):
+    benchmark(lambda: [utils.iscc_verify(code) for code in iscc_codes])
+
+
+@pytest.mark.benchmark(group="iscc_parse")
+def test_bench_iscc_clean(benchmark, iscc_codes):
+    benchmark(lambda: [utils.iscc_clean(code) for code in iscc_codes])
+
+
+@pytest.mark.benchmark(group="iscc_parse")
+def test_bench_iscc_split(benchmark, iscc_codes):
+    benchmark(lambda: [utils.iscc_split(code) for code in iscc_codes])
+
+
+@pytest.mark.benchmark(group="iscc_parse")
+def test_bench_iscc_decode(benchmark, iscc_codes):
+    benchmark(lambda: [utils.iscc_decode(code) for code in iscc_codes])
+
+
+@pytest.fixture(scope="module")
+def coblo_entries():
+    """1000 verbose `iscc` stream items"""
+    node = FakeMultiChain(1000)
+    node.server_close()
+    return node.items
+
+
+@pytest.fixture(scope="module")
+def bloxberg_events():
+    """1000 decoded ISCC contract events"""
+    web3 = pytest.importorskip("web3")
+    from isccr.observers import bloxberg
+
+    node = FakeEthereumNode(500, bloxberg.W3_CONTRACT, events_per_block=2).start()
+    try:
+        w3 = web3.Web3(web3.Web3.HTTPProvider(node.url))
+        contract = w3.eth.contract(bloxberg.W3_CONTRACT, abi=bloxberg.W3_ABI)
+        events = contract.events.ISCC().getLogs(fromBlock=0, toBlock="latest")
+    finally:
+        node.shutdown()
+    return bloxberg, list(events)
+
+
+@pytest.mark.benchmark(group="declaration")
+def test_bench_coblo_build_declaration(benchmark, coblo_entries):
+    def build():
+        return [
+            coblo.build_declaration(None, entry, idx)
+            for idx, entry in enumerate(coblo_entries)
+        ]
+
+    assert len(benchmark(build)) == 1000
+
+
+@pytest.mark.benchmark(group="declaration")
+def test_bench_bloxberg_build_declaration(benchmark, bloxberg_events):
+    bloxberg, events = bloxberg_events
+
+    def build():
+        return [bloxberg.build_declaration(None, event, 0) for event in events]
+
+    assert len(benchmark(build)) == 1000
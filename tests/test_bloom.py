@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from isccr.core.bloom import BloomFilter
+
+
+def test_bloom_filter_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"28{i:011d}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_error_rate():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"known-{i}")
+    false_positives = sum(f"unknown-{i}" in bloom for i in range(10000))
+    assert false_positives < 200
+    assert 0.005 < bloom.error_rate < 0.02
+
+
+def test_bloom_filter_memory_budget():
+    bloom = BloomFilter(capacity=10 ** 6, error_rate=0.001, max_bytes=1024)
+    assert len(bloom) == 1024
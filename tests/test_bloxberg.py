@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+web3 = pytest.importorskip("web3")
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from isccr.core.models import Chain, Checkpoint, IsccID
+from isccr.observers import bloxberg, notify
+from isccr.observers.adaptive import AdaptiveBatcher
+from isccr.observers.testing import FakeEthereumNode
+from isccr.synthetic import synthetic_isccids
+
+
+@pytest.fixture
+def node():
+    node = FakeEthereumNode(100, bloxberg.W3_CONTRACT, events_per_block=2).start()
+    yield node
+    node.shutdown()
+
+
+def test_block_timestamps_one_request_per_block(node):
+    w3 = web3.Web3(web3.Web3.HTTPProvider(node.url))
+    timestamps = bloxberg.BlockTimestamps(maxsize=50, batch_size=10)
+    numbers = [int(log["blockNumber"], 16) for log in node.logs[:60]]
+    result = timestamps.get_many(w3, numbers)
+    assert len(result) == len(set(numbers)) == 30
+    assert result[7] == int(node.blocks[7]["timestamp"], 16)
+    assert node.calls["eth_getBlockByNumber"] == 30
+    timestamps.get_many(w3, numbers)
+    assert node.calls["eth_getBlockByNumber"] == 30
+
+
+def test_block_timestamps_without_batch_support():
+    node = FakeEthereumNode(20, bloxberg.W3_CONTRACT, batch=False).start()
+    w3 = web3.Web3(web3.Web3.HTTPProvider(node.url))
+    timestamps = bloxberg.BlockTimestamps(batch_size=5)
+    result = timestamps.get_many(w3, range(10))
+    assert result[7] == int(node.blocks[7]["timestamp"], 16)
+    # Single requests after the first rejected batch
+    assert node.calls["eth_getBlockByNumber"] == 10
+    node.shutdown()
+
+
+def test_build_declaration(node):
+    w3 = web3.Web3(web3.Web3.HTTPProvider(node.url))
+    co = w3.eth.contract(bloxberg.W3_CONTRACT, abi=bloxberg.W3_ABI)
+    event = co.events.ISCC().getLogs(fromBlock=0, toBlock=0)[0]
+    declaration = bloxberg.build_declaration(None, event, 1598918400)
+    assert declaration["iscc_code"].count("-") >= 1
+    assert declaration["src_tx_hash"] == node.logs[0]["transactionHash"]
+    assert declaration["src_time"].year == 2020
+
+
+def test_scan_in_order_with_split_windows(node, monkeypatch):
+    monkeypatch.setattr(bloxberg, "W3_URL", node.url)
+    monkeypatch.setattr(bloxberg, "WORKER_CLIENTS", threading.local())
+    node.max_logs = 15
+    batcher = AdaptiveBatcher("test", 10, 2, 10)
+    with ThreadPoolExecutor(4) as pool:
+        windows = list(bloxberg.scan(0, 99, batcher, pool, in_flight=4))
+    assert windows[0][:2] == (0, 9)
+    assert [w[0] for w in windows] == sorted(w[0] for w in windows)
+    events = [event for _, _, window_events in windows for event in window_events]
+    hashes = [event.transactionHash.hex() for event in events]
+    assert hashes == [log["transactionHash"] for log in node.logs]
+    assert batcher.size < 10
+
+
+def test_update_checkpoints_last_ingested_log(node, db, monkeypatch):
+    monkeypatch.setattr(bloxberg, "W3_URL", node.url)
+    monkeypatch.setattr(bloxberg, "W3_CLIENT", None)
+    monkeypatch.setattr(bloxberg, "WORKER_CLIENTS", threading.local())
+    chain = Chain.objects.create(id=bloxberg.CHAIN_ID_BLOXBERG, slug="bloxberg")
+    batcher = AdaptiveBatcher("test", 5, 1, 5)
+    with ThreadPoolExecutor(1) as pool:
+        position = bloxberg.update(chain, batcher, (0, 1), pool, 1, to_block=9)
+        assert position == (10, 0)
+        assert Checkpoint.objects.get().position == (9, 2)
+        assert IsccID.objects.count() == 19
+        # Resuming from the checkpoint ingests nothing twice
+        position = bloxberg.next_position()
+        position = bloxberg.update(chain, batcher, position, pool, 1, to_block=9)
+        assert position == (10, 0)
+    assert IsccID.objects.count() == 19
+
+
+def test_process_skips_ingested_transactions(db, monkeypatch):
+    node = FakeEthereumNode(300, bloxberg.W3_CONTRACT, events_per_block=2).start()
+    monkeypatch.setattr(bloxberg, "W3_URL", node.url)
+    monkeypatch.setattr(bloxberg, "W3_CLIENT", None)
+    w3 = bloxberg.w3_client()
+    co = w3.eth.contract(bloxberg.W3_CONTRACT, abi=bloxberg.W3_ABI)
+    events = list(co.events.ISCC().getLogs(fromBlock=0, toBlock=299))
+    assert len(events) == 600 > bloxberg.DEDUPE_BATCH_SIZE
+    chain = Chain.objects.create(id=bloxberg.CHAIN_ID_BLOXBERG, slug="bloxberg")
+    seeded = synthetic_isccids(550, chain, b"\x42", random.Random(4))
+    ingested = []
+    for obj, log in zip(seeded, node.logs):
+        obj.src_tx_hash = log["transactionHash"]
+        ingested.append(obj)
+    IsccID.objects.bulk_create(ingested)
+
+    tx_hashes = [event.transactionHash.hex() for event in events]
+    with CaptureQueriesContext(connection) as ctx:
+        found = bloxberg.processed_tx_hashes(chain, tx_hashes)
+    assert found == set(tx_hashes[:550])
+    assert len(ctx.captured_queries) == 2
+
+    stats = bloxberg.process(chain, events, (300, 0))
+    assert stats["created"] == 50 and stats["updated"] == 0
+    assert IsccID.objects.filter(src_chain=chain).count() == 600
+    node.shutdown()
+
+
+def test_reset_clients_closes_websockets(node, monkeypatch):
+    node.serve_websocket()
+    monkeypatch.setattr(bloxberg, "W3_URL", node.ws_url)
+    monkeypatch.setattr(bloxberg, "W3_CLIENT", None)
+    monkeypatch.setattr(bloxberg, "WORKER_CLIENTS", threading.local())
+    monkeypatch.setattr(bloxberg, "CLIENTS", [])
+    assert bloxberg.w3_client().eth.blockNumber == 99
+    with ThreadPoolExecutor(2) as pool:
+        barrier = threading.Barrier(2)
+
+        def block_number():
+            barrier.wait()
+            return bloxberg.worker_client().eth.blockNumber
+
+        assert list(pool.map(lambda _: block_number(), range(2))) == [99, 99]
+    assert len(node.ws_clients) == 3
+    bloxberg.reset_clients()
+    for _ in range(50):
+        if not node.ws_clients:
+            break
+        time.sleep(0.05)
+    assert not node.ws_clients
+    assert bloxberg.CLIENTS == [] and bloxberg.W3_CLIENT is None
+    # Reconnects on next use
+    assert bloxberg.w3_client().eth.blockNumber == 99
+    bloxberg.reset_clients()
+
+
+def test_log_subscription_wakes_observer(node):
+    node.serve_websocket()
+    wakeup = notify.Wakeup("test", fallback=30)
+    bloxberg.LogSubscription(node.ws_url, wakeup, reconnect=0.1).start()
+    assert wakeup.pause(5)
+    assert wakeup.connected
+    threading.Timer(0.2, node.mine, (1,)).start()
+    start = time.perf_counter()
+    assert wakeup.pause(1)
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import time
+from django.core.cache.backends.locmem import LocMemCache
+from isccr.core.cache import MISSING, LRUCache, ResolverCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is MISSING
+    assert lru.get("a") == 1
+    assert len(lru) == 2
+
+
+def test_lru_cache_ttl():
+    lru = LRUCache(maxsize=2, ttl=0.01)
+    lru.set("a", 1)
+    time.sleep(0.02)
+    assert lru.get("a") is MISSING
+
+
+def test_resolver_cache_invalidation_across_workers():
+    shared = LocMemCache("resolver-test", {})
+    worker = ResolverCache(maxsize=10, ttl=60, shared=shared, epoch_interval=0)
+    observer = ResolverCache(maxsize=10, ttl=60, shared=shared, epoch_interval=0)
+    loads = []
+    assert worker.get_or_load("k", lambda: loads.append(1) or "v1") == "v1"
+    assert worker.get_or_load("k", lambda: loads.append(1) or "v2") == "v1"
+    assert len(loads) == 1
+
+    assert worker.get_or_load("other", lambda: "o1") == "o1"
+    observer.invalidate(["k"])
+    assert worker.get_or_load("k", lambda: "v2") == "v2"
+    assert observer.get("k") == "v2"
+    # Other keys stay in the local LRU
+    assert worker.local.get("other") == "o1"
+
+
+def test_resolver_cache_ignores_stale_write_back():
+    shared = LocMemCache("resolver-stale-test", {})
+    worker = ResolverCache(maxsize=10, ttl=60, shared=shared, epoch_interval=0)
+    observer = ResolverCache(maxsize=10, ttl=60, shared=shared, epoch_interval=0)
+
+    def load_during_invalidation():
+        observer.invalidate(["k"])
+        return "stale"
+
+    assert worker.get_or_load("k", load_during_invalidation) == "stale"
+    assert worker.get("k") is MISSING
+    assert observer.get("k") is MISSING
+
+
+def test_resolver_cache_does_not_cache_none():
+    cache = ResolverCache(maxsize=10, ttl=60)
+    assert cache.get_or_load("k", lambda: None) is None
+    assert cache.get("k") is MISSING
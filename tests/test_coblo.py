@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import time
+from isccr.observers import coblo, notify
+from isccr.observers.adaptive import AdaptiveBatcher
+from isccr.observers.testing import FakeMultiChain
+
+
+def test_prefetcher_windows_in_order():
+    node = FakeMultiChain(25).start()
+    api = coblo.SessionRpcClient("127.0.0.1", node.port, "user", "pwd")
+    batcher = AdaptiveBatcher("test", 10, 10, 10, tail_interval=0.01)
+    prefetcher = coblo.Prefetcher(coblo.LazyStream("iscc", api=api), 0, batcher)
+    prefetcher.start()
+    try:
+        windows = [prefetcher.get() for _ in range(3)]
+        assert [(start, len(entries)) for start, entries in windows] == [
+            (0, 10),
+            (10, 10),
+            (20, 5),
+        ]
+        assert windows[1][1][0]["txid"] == node.items[10]["txid"]
+        node.append(3)
+        start, entries = prefetcher.get()
+        assert (start, len(entries)) == (25, 3)
+    finally:
+        prefetcher.stop()
+        node.shutdown()
+
+
+def test_build_declaration():
+    node = FakeMultiChain(1)
+    entry = node.items[0]
+    declaration = coblo.build_declaration(None, entry, 7)
+    assert declaration["iscc_code"] == "-".join(entry["keys"])
+    assert declaration["actor"] == entry["publishers"][0]
+    assert declaration["src_chain_idx"] == 7
+    assert declaration["iscc_seed_title"] == "Title 0"
+    node.server_close()
+
+
+def test_prefetcher_wakes_on_notify():
+    node = FakeMultiChain(5).start()
+    wakeup = notify.Wakeup("test", fallback=30)
+    listener = notify.serve(0, wakeup, host="127.0.0.1")
+    node.notify_url = f"http://127.0.0.1:{listener.server_address[1]}/notify"
+    api = coblo.SessionRpcClient("127.0.0.1", node.port, "user", "pwd")
+    batcher = AdaptiveBatcher("test", 10, 10, 10, tail_interval=30)
+    stream = coblo.LazyStream("iscc", api=api)
+    prefetcher = coblo.Prefetcher(stream, 0, batcher, wakeup=wakeup)
+    prefetcher.start()
+    try:
+        assert prefetcher.get()[0] == 0
+        start = time.perf_counter()
+        node.append(1)
+        assert prefetcher.get()[0] == 5
+        assert wakeup.connected
+        assert time.perf_counter() - start < 5
+    finally:
+        prefetcher.stop()
+        listener.shutdown()
+        node.shutdown()
+
+
+def test_wakeup_disconnects_without_heartbeat():
+    wakeup = notify.Wakeup("test", fallback=30, timeout=0.05)
+    wakeup.heartbeat()
+    assert wakeup.check_connected()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    assert not wakeup.pause(0.01)
+    assert time.perf_counter() - start < 1
+    assert not wakeup.connected
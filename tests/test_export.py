@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import gzip
+import io
+import random
+from datetime import datetime, timezone
+import pytest
+from django.core.management import call_command
+from isccr.core import export
+from isccr.core.models import Chain, IsccID
+from isccr.synthetic import synthetic_isccids
+
+
+def test_cursor_roundtrip():
+    cursor = (datetime(2021, 9, 4, 16, 47, 1, 5, tzinfo=timezone.utc), "27C8iJHKpHH9h")
+    value = export.format_cursor(cursor)
+    assert export.parse_cursor(value) == cursor
+    assert export.parse_cursor(value.replace("+", " ")) == cursor
+
+
+def test_cursor_invalid():
+    with pytest.raises(ValueError):
+        export.parse_cursor("27C8iJHKpHH9h")
+
+
+def test_export_roundtrip():
+    row = dict.fromkeys(export.EXPORT_COLUMNS, "")
+    row.update(
+        iscc_id="27C8iJHKpHH9h",
+        iscc_seed_title='Title, "quoted"\nmultiline',
+        iscc_mutable_metadata={"a": 1},
+        src_time=datetime(2021, 9, 4, tzinfo=timezone.utc),
+    )
+    for fmt, encode in (("ndjson", export.encode_ndjson), ("csv", export.encode_csv)):
+        text = "".join(encode([dict(row), dict(row, iscc_id="27C8iJHKpHH9i")]))
+        last = export.last_row(io.StringIO(text, newline=""), fmt)
+        assert last["iscc_id"] == "27C8iJHKpHH9i"
+        assert last["iscc_seed_title"] == row["iscc_seed_title"]
+        assert last["src_time"] == row["src_time"]
+
+
+def test_gzip_stream():
+    chunks = [f"line {i}\n" for i in range(10000)]
+    data = b"".join(export.gzip_stream(chunks, batch_bytes=1024))
+    assert gzip.decompress(data).decode("utf-8") == "".join(chunks)
+
+
+def test_threaded_reraises():
+    def failing():
+        yield 1
+        raise RuntimeError("boom")
+
+    result = export.threaded(failing())
+    assert next(result) == 1
+    with pytest.raises(RuntimeError):
+        next(result)
+
+
+def test_truncate_partial_csv_record(tmp_path):
+    from isccr.core.management.commands.export_registry import Command
+
+    row = dict.fromkeys(export.EXPORT_COLUMNS, "")
+    row.update(
+        iscc_seed_title='Title, "quoted"\nmultiline',
+        src_time=datetime(2021, 9, 4, tzinfo=timezone.utc),
+    )
+    rows = [dict(row, iscc_id=f"27C8iJHKpHH9{i}") for i in "abc"]
+    complete = "".join(export.encode_csv(rows[:2])).encode("utf-8")
+    last = "".join(export.encode_csv(rows[2:], header=False)).encode("utf-8")
+    path = tmp_path / "export.csv"
+    # Interrupted after the newline within the quoted title of the last row
+    path.write_bytes(complete + last[: last.index(b"\n") + 1])
+    Command.truncate_partial_record(str(path), block_size=16)
+    assert path.read_bytes() == complete
+    path.write_bytes(complete + last)
+    Command.truncate_partial_record(str(path), block_size=7)
+    assert path.read_bytes() == complete + last
+
+
+def test_resume_truncated_gzip_export(db, tmp_path, monkeypatch):
+    chain = Chain.objects.create(id=1, slug="coblo")
+    objs = IsccID.objects.bulk_create(
+        synthetic_isccids(200, chain, b"\x41", random.Random(2))
+    )
+    monkeypatch.setattr(export, "GZIP_MEMBER_BYTES", 4096)
+    path = tmp_path / "export.ndjson.gz"
+    call_command("export_registry", str(path), stdout=io.StringIO())
+    data = path.read_bytes()
+    # Killed while writing a member in the middle of the export
+    path.write_bytes(data[: len(data) // 2])
+    with pytest.raises((EOFError, OSError)):
+        gzip.decompress(path.read_bytes())
+    call_command("export_registry", str(path), resume=True, stdout=io.StringIO())
+    lines = gzip.decompress(path.read_bytes()).decode("utf-8").splitlines()
+    assert len(lines) == len(objs)
+    assert gzip.decompress(path.read_bytes()) == gzip.decompress(data)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from isccr.core import cache
+from isccr.core.models import Chain, Checkpoint, IsccID
+from isccr.observers.ingest import ingest
+from isccr.synthetic import EPOCH, random_actor, random_iscc_code
+from isccr.utils import build_iscc_id
+
+
+HEADER = b"\x41"
+
+
+@pytest.fixture
+def chain(db):
+    return Chain.objects.create(id=1, slug="coblo")
+
+
+@pytest.fixture
+def declare(chain):
+    rnd = random.Random(7)
+
+    def declaration(iscc_code=None, actor=None, idx=0, **fields):
+        return dict(
+            iscc_code=iscc_code or random_iscc_code(rnd),
+            actor=actor or random_actor(rnd),
+            src_chain=chain,
+            src_chain_idx=idx,
+            src_time=EPOCH,
+            **fields,
+        )
+
+    return declaration
+
+
+def test_ingest_counter_collisions(declare):
+    first = declare(idx=0)
+    ingest(HEADER, [first])
+    code = first["iscc_code"]
+    stats = ingest(HEADER, [declare(code, idx=1), declare(code, idx=2)])
+    assert stats["created"] == 2
+    assert stats["retries"] == 3
+    iscc_ids = IsccID.objects.order_by("src_chain_idx").values_list(
+        "iscc_id", flat=True
+    )
+    assert list(iscc_ids) == [build_iscc_id(HEADER, code, n) for n in range(3)]
+
+
+def test_ingest_updates_within_batch(declare):
+    first = declare(idx=0)
+    again = declare(first["iscc_code"], first["actor"], idx=1, src_tx_hash="ab")
+    stats = ingest(HEADER, [first, again])
+    assert stats["created"] == 1 and stats["updated"] == 0
+    obj = IsccID.objects.get()
+    assert obj.revision == 1
+    assert obj.src_chain_idx == 1 and obj.src_tx_hash == "ab"
+
+
+def test_ingest_bumps_revision(declare):
+    first = declare(idx=0)
+    ingest(HEADER, [first])
+    again = declare(first["iscc_code"], first["actor"], idx=5)
+    stats = ingest(HEADER, [again])
+    assert stats["created"] == 0 and stats["updated"] == 1
+    obj = IsccID.objects.get()
+    assert obj.revision == 1 and obj.src_chain_idx == 5
+    assert obj.iscc_id == build_iscc_id(HEADER, first["iscc_code"], 0)
+
+
+def test_ingest_looks_up_bodies_with_one_query(declare):
+    ingest(HEADER, [declare(idx=idx) for idx in range(10)])
+    codes = list(IsccID.objects.values_list("iscc_code", "actor"))
+    batch = [declare(code, actor, idx=20) for code, actor in codes]
+    batch += [declare(idx=30 + idx) for idx in range(10)]
+    with CaptureQueriesContext(connection) as ctx:
+        stats = ingest(HEADER, batch)
+    assert stats["created"] == 10 and stats["updated"] == 10
+    selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+    assert len(selects) == 1
+
+
+def test_ingest_saves_checkpoint_in_transaction(declare, chain, monkeypatch):
+    checkpoint = Checkpoint(chain=chain, height=10)
+    ingest(HEADER, [declare(idx=9)], checkpoint)
+    assert Checkpoint.objects.get().height == 10
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("checkpoint write failed")
+
+    monkeypatch.setattr(Checkpoint, "save", fail)
+    checkpoint.height = 11
+    with pytest.raises(RuntimeError):
+        ingest(HEADER, [declare(idx=10)], checkpoint)
+    assert IsccID.objects.count() == 1
+
+
+def test_ingest_saves_checkpoint_only_when_advanced(declare, chain):
+    ingest(HEADER, [declare(idx=0)], Checkpoint(chain=chain, height=1))
+    modified = Checkpoint.objects.get().modified
+    ingest(HEADER, [], Checkpoint(chain=chain, height=1))
+    assert Checkpoint.objects.get().modified == modified
+    ingest(HEADER, [], Checkpoint(chain=chain, height=1, log_index=2))
+    checkpoint = Checkpoint.objects.get()
+    assert checkpoint.position == (1, 2) and checkpoint.modified > modified
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ingest_invalidates_cache_on_commit(declare, chain, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(cache, "invalidate", invalidated.append)
+    declaration = declare(idx=0)
+    ingest(HEADER, [declaration])
+    assert [[obj.iscc_id for obj in objs] for objs in invalidated] == [
+        [IsccID.objects.get().iscc_id]
+    ]
+    # Nothing is published if the transaction rolls back
+    monkeypatch.setattr(Checkpoint, "save", lambda self: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        ingest(HEADER, [declaration], Checkpoint(chain=chain))
+    assert len(invalidated) == 1
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from isccr import metrics
+
+
+def test_histogram_exposition():
+    hist = metrics.histogram("test_latency_seconds", "Test", ("stage",), (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        hist.observe(value, stage="rpc")
+    assert hist.get(stage="rpc") == 4
+    lines = metrics.render().splitlines()
+    assert "# TYPE test_latency_seconds histogram" in lines
+    assert 'test_latency_seconds_bucket{stage="rpc",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="rpc",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="rpc",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_sum{stage="rpc"} 3.65' in lines
+    assert 'test_latency_seconds_count{stage="rpc"} 4' in lines
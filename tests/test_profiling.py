@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import TemplateResponse
+from django.test import RequestFactory, override_settings
+from isccr.core.profiling import ProfilingMiddleware
+
+
+def view(request):
+    template = engines["django"].from_string("{% for i in items %}{{ i }}{% endfor %}")
+    return TemplateResponse(request, template, {"items": range(100)})
+
+
+def test_server_timing_header():
+    def get_response(request):
+        # Template response handling as done by Django's request handler
+        response = middleware.process_template_response(request, view(request))
+        return response.render()
+
+    middleware = ProfilingMiddleware(get_response)
+    response = middleware(RequestFactory().get("/browse/"))
+    timing = dict(part.split(";", 1) for part in response["Server-Timing"].split(", "))
+    assert set(timing) == {"total", "db", "count", "render"}
+    assert timing["db"] == 'dur=0.0;desc="0 queries"'
+    assert float(timing["render"][4:]) > 0
+
+
+def test_slowest_profiles_are_kept(tmp_path):
+    with override_settings(
+        RESOLVER_PROFILE_SAMPLE_RATE=1.0,
+        RESOLVER_PROFILE_DIR=str(tmp_path),
+        RESOLVER_PROFILE_KEEP=2,
+    ):
+        middleware = ProfilingMiddleware(lambda r: HttpResponse("ok"))
+        for _ in range(5):
+            middleware(RequestFactory().get("/"))
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+    assert len(middleware.slowest.heap) == 2
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+web3 = pytest.importorskip("web3")
+
+from isccr.observers import bloxberg, coblo, replay
+from isccr.observers.testing import FakeEthereumNode, FakeMultiChain
+
+
+def test_replay_coblo_fixture(tmp_path):
+    node = FakeMultiChain(25)
+    path = str(tmp_path / "coblo.json.gz")
+    replay.save_fixture(replay.node_fixture(node), path)
+    node.server_close()
+    replayed = replay.load_node(replay.load_fixture(path))
+    stream = coblo.LazyStream("iscc", api=replay.ReplayRpcClient(replayed))
+    assert len(stream) == 25
+    entries = stream[10:20]
+    assert [e["txid"] for e in entries] == [i["txid"] for i in node.items[10:20]]
+    replayed.server_close()
+
+
+def test_replay_bloxberg_recording():
+    node = FakeEthereumNode(50, bloxberg.W3_CONTRACT, events_per_block=0.2)
+    w3 = web3.Web3(replay.ReplayProvider(node))
+    fixture = replay.record_bloxberg(w3, bloxberg.W3_CONTRACT, 0, 49, window=20)
+    assert fixture["logs"] == node.logs
+    assert len(fixture["blocks"]) < 50
+    replayed = replay.load_node(fixture)
+    w3 = web3.Web3(replay.ReplayProvider(replayed))
+    assert w3.eth.blockNumber == 49
+    # Headers of blocks without events are derived from recorded ones
+    numbers = [10, 33, 49]
+    calls = [("eth_getBlockByNumber", [hex(n), False]) for n in numbers]
+    blocks = bloxberg.rpc_batch(w3, calls)
+    assert [b["timestamp"] for b in blocks] == [
+        node.blocks[n]["timestamp"] for n in numbers
+    ]
+    co = w3.eth.contract(bloxberg.W3_CONTRACT, abi=bloxberg.W3_ABI)
+    assert len(co.events.ISCC().getLogs(fromBlock=0, toBlock=49)) == len(node.logs)
+    node.server_close()
+    replayed.server_close()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from django.db import connection
+from isccr.core import snapshot
+from isccr.core.models import BulkLoad, Chain, Checkpoint, IsccID
+from isccr.synthetic import synthetic_isccids
+
+
+@pytest.fixture
+def registry(db):
+    coblo = Chain.objects.create(id=1, slug="coblo")
+    bloxberg = Chain.objects.create(id=2, slug="bloxberg")
+    rnd = random.Random(11)
+    IsccID.objects.bulk_create(synthetic_isccids(30, coblo, b"\x41", rnd))
+    IsccID.objects.bulk_create(synthetic_isccids(20, bloxberg, b"\x42", rnd))
+    Checkpoint.objects.create(chain=bloxberg, height=40, log_index=3)
+
+
+def reload(path, method):
+    IsccID.objects.all().delete()
+    Checkpoint.objects.all().delete()
+    return snapshot.load(str(path), method)
+
+
+@pytest.mark.parametrize(
+    "method",
+    [
+        "orm",
+        pytest.param(
+            "copy",
+            marks=pytest.mark.skipif(
+                connection.vendor != "postgresql", reason="COPY requires PostgreSQL"
+            ),
+        ),
+    ],
+)
+def test_dump_load_round_trip(registry, tmp_path, method):
+    iscc_ids = set(IsccID.objects.values_list("iscc_id", flat=True))
+    meta = snapshot.dump(str(tmp_path))
+    assert meta["rows"] == 50
+    stats = reload(tmp_path, method)
+    assert stats["rows"] == 50
+    assert set(IsccID.objects.values_list("iscc_id", flat=True)) == iscc_ids
+    # Coblo had no checkpoint, it resumes after its last stream item
+    assert snapshot.checkpoints() == {"coblo": (30, 0), "bloxberg": (40, 3)}
+    assert BulkLoad.objects.get().rows == 50
+
+
+def test_load_requires_checkpoints(registry, tmp_path):
+    meta = snapshot.dump(str(tmp_path))
+    for chain in meta["chains"]:
+        chain["checkpoint"] = None
+    (tmp_path / snapshot.META_FILE).write_text(json.dumps(meta))
+    with pytest.raises(ValueError):
+        reload(tmp_path, "orm")
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+import iscc
+from isccr.core.models import Chain
+from isccr.synthetic import synthetic_registry
+from isccr.utils import build_iscc_id, build_iscc_id_body, iscc_verify
+
+
+CHAINS = [
+    (Chain(id=1, slug="coblo"), b"\x41", 0.3),
+    (Chain(id=2, slug="bloxberg"), b"\x42", 0.7),
+]
+
+
+def test_synthetic_registry():
+    batches = list(synthetic_registry(5000, CHAINS, actors=1000, batch_size=2000))
+    assert [len(batch) for batch in batches] == [2000, 2000, 1000]
+    rows = [row for batch in batches for row in batch]
+    assert len({row["iscc_id"] for row in rows}) == len(rows)
+    headers = {chain.id: header for chain, header, _ in CHAINS}
+    counters = Counter()
+    for row in rows:
+        header = headers[row["src_chain_id"]]
+        counter = iscc.decode(row["iscc_id"])[8]
+        counters[counter] += 1
+        assert iscc_verify(row["iscc_code"])
+        assert build_iscc_id(header, row["iscc_code"], counter) == row["iscc_id"]
+        body = build_iscc_id_body(header, row["iscc_code"])
+        assert row["iscc_id_body"] == body.hex()
+    # Re-declarations collide and increment counters
+    assert 0 < counters[1] < counters[0]
+    # Few actors declare most
+    top = Counter(row["actor"] for row in rows).most_common(10)
+    assert sum(n for _, n in top) > len(rows) * 0.1
+    coblo = [row["src_chain_idx"] for row in rows if row["src_chain_id"] == 1]
+    assert coblo == list(range(len(coblo)))
+
+
+def test_synthetic_registry_continues_counters():
+    first = [row for batch in synthetic_registry(3000, CHAINS) for row in batch]
+    registered = Counter(row["iscc_id_body"] for row in first)
+
+    def next_counters(bodies):
+        return {body: registered[body] for body in bodies if body in registered}
+
+    again = synthetic_registry(3000, CHAINS, next_counters=next_counters)
+    second = [row for batch in again for row in batch]
+    assert len({row["iscc_id"] for row in first + second}) == 6000
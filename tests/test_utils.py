@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import iscc
+import pytest
+from isccr import utils
+
+
+HEADER = b"\x41"
+
+
+def test_decode_components(iscc_codes):
+    components = [c for code in iscc_codes[:50] for c in utils.iscc_split(code)]
+    decoded = utils.decode_components(components)
+    for component, (header, body) in zip(components, decoded):
+        assert iscc.decode(component) == bytes([header]) + int(body).to_bytes(8, "big")
+
+
+def test_decode_components_illegal_char():
+    with pytest.raises(ValueError):
+        utils.decode_components(["CCl2X8A5uqeqQ"])
+
+
+def test_encode_components_roundtrip(iscc_codes):
+    components = [c for code in iscc_codes[:50] for c in utils.iscc_split(code)]
+    decoded = utils.decode_components(components)
+    assert utils.encode_components(decoded[:, 0], decoded[:, 1]) == components
+
+
+def test_build_iscc_ids_matches_scalar(iscc_codes):
+    counters = [idx % 128 for idx in range(len(iscc_codes))]
+    expected = [
+        utils.build_iscc_id(HEADER, code, counter)
+        for code, counter in zip(iscc_codes, counters)
+    ]
+    assert utils.build_iscc_ids(HEADER, iscc_codes, counters) == expected
+
+
+def test_build_iscc_ids_scalar_counter(iscc_codes):
+    expected = [utils.build_iscc_id(b"\x42", code, 0) for code in iscc_codes[:10]]
+    assert utils.build_iscc_ids(b"\x42", iscc_codes[:10], 0) == expected
+    assert utils.build_iscc_ids(b"\x42", [], 0) == []
+
+
+def test_iscc_parse(iscc_codes):
+    code = iscc_codes[1]
+    parsed = utils.iscc_parse(code)
+    assert parsed.code == utils.iscc_clean(code)
+    assert "".join(parsed.components) == parsed.code
+    assert all(len(c) == 13 for c in parsed.components)
+    assert utils.iscc_parse(code) is parsed
+
+
+def test_iscc_parse_invalid():
+    with pytest.raises(ValueError, match='Illegal character "l"'):
+        utils.iscc_parse("CCl2X8A5uqeqQ")
+    with pytest.raises(ValueError, match="Illegal component length"):
+        utils.iscc_parse("CC2X8A5uqeqQ")
+    with pytest.raises(ValueError, match="Illegal component header"):
+        utils.iscc_parse("CX2X8A5uqeqQa")
+
+
+def test_iscc_split(iscc_codes):
+    for code in iscc_codes[:50]:
+        assert utils.iscc_split(code) == list(utils.iscc_parse(code).components)
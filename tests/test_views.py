@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import random
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from isccr.core import views
+from isccr.core.models import Chain, IsccID
+from isccr.synthetic import synthetic_isccids
+from isccr.utils import build_iscc_id
+
+
+@pytest.fixture
+def isccids(db, settings):
+    settings.RESOLVER_BLOOM = False
+    chain = Chain.objects.create(id=1, slug="coblo")
+    objs = list(synthetic_isccids(1200, chain, b"\x41", random.Random(5)))
+    return IsccID.objects.bulk_create(objs)
+
+
+def post_json(client, path, data):
+    return client.post(path, json.dumps(data), content_type="application/json")
+
+
+def test_resolve_json(client, isccids):
+    obj = isccids[0]
+    response = client.get(f"/{obj.iscc_id}.json")
+    assert response.status_code == 200
+    assert response.json()["iscc_code"] == obj.iscc_code
+    assert response.json()["src_chain"] == "coblo"
+    assert "Accept" in response["Vary"]
+    response = client.get(f"/{obj.iscc_id}", HTTP_ACCEPT="application/json")
+    assert response.status_code == 200
+    assert response.json()["iscc_id"] == obj.iscc_id
+    assert "Accept" in response["Vary"]
+
+
+def test_resolve_redirects_browsers(client, isccids):
+    obj = isccids[0]
+    accept = "text/html,application/xhtml+xml,application/json;q=0.9"
+    response = client.get(f"/{obj.iscc_id}", HTTP_ACCEPT=accept)
+    assert response.status_code == 302
+    assert response["Location"] == views.admin_url(obj.iscc_id)
+    assert "Accept" in response["Vary"]
+
+
+def test_resolve_not_found(client, isccids):
+    response = client.get("/MAAAAAAAAAAAAAAA.json")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "ISCC-ID not found"}
+    response = client.get("/MAAAAAAAAAAAAAAA", HTTP_ACCEPT="application/json")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "ISCC-ID not found"}
+    response = client.get("/MAAAAAAAAAAAAAAA")
+    assert response.status_code == 404
+    assert response["Content-Type"].startswith("text/html")
+
+
+def test_resolve_batch(client, isccids):
+    iscc_ids = [obj.iscc_id for obj in isccids[:3]]
+    response = post_json(client, "/resolve", iscc_ids + ["MAAAAAAAAAAAAAAA"])
+    assert response.status_code == 200
+    result = response.json()
+    assert list(result) == iscc_ids + ["MAAAAAAAAAAAAAAA"]
+    assert result["MAAAAAAAAAAAAAAA"] is None
+    record = result[iscc_ids[0]]
+    assert record["iscc_code"] == isccids[0].iscc_code
+    assert record["actor"] == isccids[0].actor
+    assert record["src_chain"] == "coblo"
+    assert record["revision"] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_resolve_batch_streams_large_batches(client, isccids):
+    iscc_ids = [obj.iscc_id for obj in isccids[:1001]] + ["MAAAAAAAAAAAAAAA"]
+    response = post_json(client, "/resolve", iscc_ids)
+    assert response.status_code == 200
+    assert response.streaming
+    result = json.loads(b"".join(response.streaming_content))
+    assert set(result) == set(iscc_ids)
+    assert result["MAAAAAAAAAAAAAAA"] is None
+    assert result[iscc_ids[1000]]["iscc_code"] == isccids[1000].iscc_code
+
+
+def test_resolve_batch_limit(client, isccids, settings):
+    settings.RESOLVER_BATCH_MAX = 5
+    response = post_json(client, "/resolve", [obj.iscc_id for obj in isccids[:6]])
+    assert response.status_code == 413
+    response = post_json(client, "/resolve", [obj.iscc_id for obj in isccids[:5]])
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("body", ["[", '{"a": 1}', "[1, 2]"])
+def test_resolve_batch_malformed(client, body):
+    response = client.post("/resolve", body, content_type="application/json")
+    assert response.status_code == 400
+    assert "detail" in response.json()
+
+
+def test_lookup_batch(client, isccids):
+    first, second = isccids[:2]
+    pairs = [
+        [first.iscc_code, first.actor],
+        [second.iscc_code, second.actor],
+        [first.iscc_code, second.actor],
+    ]
+    response = post_json(client, "/lookup", pairs)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"iscc_code": first.iscc_code, "actor": first.actor, "iscc_id": first.iscc_id},
+        {
+            "iscc_code": second.iscc_code,
+            "actor": second.actor,
+            "iscc_id": second.iscc_id,
+        },
+        {"iscc_code": first.iscc_code, "actor": second.actor, "iscc_id": None},
+    ]
+
+
+def test_lookup_batch_limit(client, isccids, settings):
+    settings.RESOLVER_BATCH_MAX = 1
+    pairs = [[obj.iscc_code, obj.actor] for obj in isccids[:2]]
+    assert post_json(client, "/lookup", pairs).status_code == 413
+
+
+@pytest.mark.parametrize("body", ["{", '"abc"', '[["a"]]', '[["a", 1]]', '["ab"]'])
+def test_lookup_batch_malformed(client, body):
+    response = client.post("/lookup", body, content_type="application/json")
+    assert response.status_code == 400
+    assert "detail" in response.json()
+
+
+def test_lookup_iscc_ids_matches_pairs(isccids):
+    first, second = isccids[:2]
+    cross = IsccID.objects.create(
+        iscc_id=build_iscc_id(b"\x41", first.iscc_code, 1),
+        iscc_id_body=first.iscc_id_body,
+        iscc_code=first.iscc_code,
+        actor=second.actor,
+        src_chain=first.src_chain,
+        src_chain_idx=10000,
+        src_time=first.src_time,
+    )
+    pairs = [(obj.iscc_code, obj.actor) for obj in isccids]
+    with CaptureQueriesContext(connection) as ctx:
+        found = views.lookup_iscc_ids(pairs)
+    assert found == {(obj.iscc_code, obj.actor): obj.iscc_id for obj in isccids}
+    assert (cross.iscc_code, cross.actor) not in found
+    batch_size = connection.ops.bulk_batch_size(["iscc_code", "actor"], pairs)
+    assert len(ctx.captured_queries) == math.ceil(len(pairs) / batch_size)